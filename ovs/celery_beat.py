@@ -26,7 +26,7 @@ from celery import current_app
 from celery.schedules import crontab
 from ovs.extensions.storage.persistentfactory import PersistentFactory
 from ovs.extensions.storage.exceptions import KeyNotFoundException
-from ovs.extensions.generic.volatilemutex import VolatileMutex
+from ovs.extensions.generic.persistentmutex import PersistentMutex
 from ovs.plugin.provider.configuration import Configuration
 from ovs.log.logHandler import LogHandler
 
@@ -47,7 +47,7 @@ class DistributedScheduler(Scheduler):
         """
         self._persistent = PersistentFactory.get_client()
         self._namespace = 'ovs_celery_beat'
-        self._mutex = VolatileMutex('celery_beat')
+        self._mutex = PersistentMutex('celery_beat')
         self._has_lock = False
         super(DistributedScheduler, self).__init__(*args, **kwargs)
         logger.debug('DS init')
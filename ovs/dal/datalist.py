@@ -19,9 +19,9 @@ DataList module
 import hashlib
 import json
 import copy
+from operator import attrgetter
 from random import randint
-from ovs.dal.helpers import Descriptor, Toolbox, HybridRunner
-from ovs.dal.exceptions import ObjectNotFoundException
+from ovs.dal.helpers import Descriptor, Toolbox, HybridRunner, LRUCache
 from ovs.extensions.storage.volatilefactory import VolatileFactory
 from ovs.extensions.storage.persistentfactory import PersistentFactory
 from ovs.extensions.generic.volatilemutex import VolatileMutex
@@ -67,7 +67,12 @@ class DataList(object):
     operator = Operator()
     namespace = 'ovs_list'
     cachelink = 'ovs_listcache'
+    indexlink = 'ovs_index'
+    indexstate = 'ovs_indexstate'
+    reverseindexlink = 'ovs_reverseindex'
     partsize_pks = 5000
+    partsize_objects = 500
+    _plans = LRUCache(1000)  # Compiled query plans
 
     def __init__(self, query, key=None, load=True):
         """
@@ -92,83 +97,194 @@ class DataList(object):
         if load is True:
             self._load()
 
-    def _exec_and(self, instance, items):
+    @staticmethod
+    def _get_plan(query_object, query_type, items):
         """
-        Executes a given set of query items against the instance in an "AND" scope
-        This means the first False will cause the scope to return False
+        Returns the compiled plan for a given query. Plans are compiled once and cached per process
         """
+        try:
+            plan_key = '{0}.{1}_{2}_{3}'.format(query_object.__module__, query_object.__name__, query_type,
+                                                json.dumps(items, sort_keys=True))
+        except TypeError:
+            plan_key = None  # Queries with values that can't be serialized aren't cached
+        plan = DataList._plans.get(plan_key) if plan_key is not None else None
+        if plan is None:
+            state = {'can_cache': True}
+            raw = DataList._can_project(query_object, items)
+            plan = {'match': DataList._compile_group(query_object, query_type, items, raw, state),
+                    'raw': raw,
+                    'can_cache': state['can_cache']}
+            if plan_key is not None:
+                DataList._plans.set(plan_key, plan)
+        return plan
+
+    @staticmethod
+    def _can_project(query_object, items):
+        """
+        Checks whether a query can be executed on the raw data of the objects, which is the case when
+        it only filters on simple properties, relation guids or the guid itself
+        """
+        properties = [prop.name for prop in query_object._properties]
+        relations = ['{0}_guid'.format(relation.name) for relation in query_object._relations]
         for item in items:
             if isinstance(item, dict):
-                # Recursive
-                if item['type'] == DataList.where_operator.AND:
-                    result = self._exec_and(instance, item['items'])
-                else:
-                    result = self._exec_or(instance, item['items'])
-                if result is False:
-                    return False
-            else:
-                if self._evaluate(instance, item) is False:
+                if not DataList._can_project(query_object, item['items']):
                     return False
+            elif item[0] != 'guid' and item[0] not in properties and item[0] not in relations:
+                return False
         return True
 
-    def _exec_or(self, instance, items):
+    @staticmethod
+    def _compile_group(query_object, query_type, items, raw, state):
         """
-        Executes a given set of query items against the instance in an "OR" scope
-        This means the first True will cause the scope to return True
+        Compiles a query(group) into a function evaluating the group against a given object, or against a
+        (guid, data) tuple for raw plans
         """
+        predicates = []
         for item in items:
             if isinstance(item, dict):
-                # Recursive
-                if item['type'] == DataList.where_operator.AND:
-                    result = self._exec_and(instance, item['items'])
-                else:
-                    result = self._exec_or(instance, item['items'])
-                if result is True:
-                    return True
+                predicates.append(DataList._compile_group(query_object, item['type'], item['items'], raw, state))
             else:
-                if self._evaluate(instance, item) is True:
-                    return True
-        return False
+                predicates.append(DataList._compile_filter(query_object, item, raw, state))
+
+        if query_type == DataList.where_operator.AND:
+            def match(record):
+                """
+                Matches if all predicates match, stopping at the first one that doesn't
+                """
+                for predicate in predicates:
+                    if not predicate(record):
+                        return False
+                return True
+        elif query_type == DataList.where_operator.OR:
+            def match(record):
+                """
+                Matches if any predicate matches, stopping at the first one that does
+                """
+                for predicate in predicates:
+                    if predicate(record):
+                        return True
+                return False
+        else:
+            raise NotImplementedError('The given operator is not yet implemented.')
+        return match
 
-    def _evaluate(self, instance, item):
+    @staticmethod
+    def _compile_filter(query_object, item, raw, state):
         """
-        Evaluates a single query item comparing a given value with a given instance property
-        It will keep track of which properties are used, making sure the query result
-        will get invalidated when such property is updated
+        Compiles a single filter into a function evaluating it. The path is resolved upfront, keeping track
+        of whether it passes a dynamic property, in which case the result can't be cached
         """
         path = item[0].split('.')
-        value = instance
-        if value is None:
-            return False
-        itemcounter = 0
+        compare = DataList._compile_operator(item[1], item[2])
+
+        if raw is True:
+            field = path[0]
+            if field == 'guid':
+                return lambda record: compare(record[0])
+            if field in (prop.name for prop in query_object._properties):
+                default = [prop.default for prop in query_object._properties if prop.name == field][0]
+                return lambda record: compare(record[1].get(field, default))
+            relation = field[:-5]  # Strips the _guid suffix
+            return lambda record: compare((record[1].get(relation) or {}).get('guid'))
+
+        current_class = query_object
         for pitem in path:
-            itemcounter += 1
-            if pitem in (dynamic.name for dynamic in value.__class__._dynamics):
-                self._can_cache = False
-            value = getattr(value, pitem)
-            if value is None and itemcounter != len(path):
-                return False  # Fail the filter
-
-        # Apply operators
-        if item[1] == DataList.operator.NOT_EQUALS:
-            return value != item[2]
-        if item[1] == DataList.operator.EQUALS:
-            return value == item[2]
-        if item[1] == DataList.operator.GT:
-            return value > item[2]
-        if item[1] == DataList.operator.LT:
-            return value < item[2]
-        if item[1] == DataList.operator.IN:
-            return value in item[2]
-        raise NotImplementedError('The given operator {} is not yet implemented.'.format(item[1]))
+            if current_class is None:
+                state['can_cache'] = False  # Unknown type, it might be dynamic
+                break
+            if pitem in (dynamic.name for dynamic in current_class._dynamics):
+                state['can_cache'] = False
+                break
+            relations = [relation for relation in current_class._relations if relation.name == pitem]
+            if len(relations) == 1:
+                foreign_type = relations[0].foreign_type
+                current_class = current_class if foreign_type is None else foreign_type
+            elif pitem in (prop.name for prop in current_class._properties) or pitem.endswith('_guid'):
+                current_class = None
+            else:
+                foreign_relations = RelationMapper.load_foreign_relations(current_class) or {}
+                if pitem in foreign_relations:
+                    current_class = Descriptor().load(foreign_relations[pitem]['class']).get_object()
+                else:
+                    current_class = None
+
+        getters = [attrgetter(pitem) for pitem in path]
+        if len(getters) == 1:
+            getter = getters[0]
+            return lambda instance: compare(getter(instance))
+        path_getters = getters[:-1]
+        last_getter = getters[-1]
+
+        def evaluate(instance):
+            """
+            Evaluates the filter against a given object, failing the filter if the path is interrupted
+            """
+            value = instance
+            for path_getter in path_getters:
+                value = path_getter(value)
+                if value is None:
+                    return False
+            return compare(last_getter(value))
+        return evaluate
+
+    @staticmethod
+    def _compile_operator(operator_name, operand):
+        """
+        Returns a function comparing a given value with the operand
+        """
+        if operator_name == DataList.operator.EQUALS:
+            return lambda value: value == operand
+        if operator_name == DataList.operator.NOT_EQUALS:
+            return lambda value: value != operand
+        if operator_name == DataList.operator.GT:
+            return lambda value: value > operand
+        if operator_name == DataList.operator.LT:
+            return lambda value: value < operand
+        if operator_name == DataList.operator.IN:
+            try:
+                values = frozenset(operand)
+            except TypeError:
+                return lambda value: value in operand  # Unhashable operand values
+
+            def contains(value):
+                """
+                Checks whether the value is in the operand, falling back to a list lookup for unhashable values
+                """
+                try:
+                    return value in values
+                except TypeError:
+                    return value in operand
+            return contains
+        raise NotImplementedError('The given operator {} is not yet implemented.'.format(operator_name))
 
     def _load(self):
         """
         Tries to load the result for the given key from the volatile cache, or executes the query
         if not yet available. Afterwards (if a key is given), the result will be (re)cached
         """
-        self.data = self._volatile.get(self._key) if self._key is not None else None
-        if self.data is None:
+        hybrid_structure = HybridRunner.get_hybrids()
+        query_object = self._query['object']
+        query_object_id = Descriptor(query_object).descriptor['identifier']
+        if query_object_id in hybrid_structure and query_object_id != hybrid_structure[query_object_id]['identifier']:
+            query_object = Descriptor().load(hybrid_structure[query_object_id]).get_object()
+        items = self._query['query']['items']
+
+        invalidations = {query_object.__name__.lower(): ['__all']}
+        DataList._build_invalidations(invalidations, query_object, items)
+        generation_keys = DataList._get_generation_keys(invalidations)
+
+        # The cached result and the current generations of all fields it depends on are loaded at once. A cached
+        # result is only valid if none of these fields changed since it was cached
+        cached = None
+        if self._key is not None:
+            values = self._volatile.get_multi([self._key] + generation_keys)
+            cached = values.pop(self._key, None)
+            if not isinstance(cached, dict) or 'generations' not in cached:
+                cached = None  # Results cached by older versions can't be validated
+            elif cached['generations'] != values:
+                cached = None
+        if cached is None:
             # The query should be a dictionary:
             #     {'object': Disk,  # Object on which the query should be executed
             #      'data'  : DataList.select.XYZ,  # The requested result
@@ -184,82 +300,202 @@ class DataList(object):
             # in any possible combination
 
             Toolbox.log_cache_hit('datalist', False)
-            hybrid_structure = HybridRunner.get_hybrids()
-
-            items = self._query['query']['items']
             query_type = self._query['query']['type']
             query_data = self._query['data']
-            query_object = self._query['object']
-            query_object_id = Descriptor(query_object).descriptor['identifier']
-            if query_object_id in hybrid_structure and query_object_id != hybrid_structure[query_object_id]['identifier']:
-                query_object = Descriptor().load(hybrid_structure[query_object_id]).get_object()
 
-            invalidations = {query_object.__name__.lower(): ['__all']}
-            DataList._build_invalidations(invalidations, query_object, items)
+            # The generations are read before executing the query. If any of them changes while the query is
+            # executing, the result will be outdated when it's cached, and the next load will ignore it
+            generations = DataList._get_generations(generation_keys)
 
-            for class_name in invalidations:
-                key = '{0}_{1}'.format(DataList.cachelink, class_name)
-                mutex = VolatileMutex('listcache_{0}'.format(class_name))
-                try:
-                    mutex.acquire(60)
-                    cache_list = Toolbox.try_get(key, {})
-                    current_fields = cache_list.get(self._key, [])
-                    current_fields = list(set(current_fields + ['__all'] + invalidations[class_name]))
-                    cache_list[self._key] = current_fields
-                    self._volatile.set(key, cache_list)
-                    self._persistent.set(key, cache_list)
-                finally:
-                    mutex.release()
+            plan = DataList._get_plan(query_object, query_type, items)
+            if plan['can_cache'] is False:
+                self._can_cache = False
+            match = plan['match']
 
             self.from_cache = False
             namespace = query_object()._namespace
             name = query_object.__name__.lower()
-            guids = DataList.get_pks(namespace, name)
+            guids = DataList._get_indexed_guids(query_object, query_type, items)
+            if guids is None:
+                guids = DataList.iter_pks(namespace, name)
 
             if query_data == DataList.select.COUNT:
                 self.data = 0
             else:
                 self.data = []
 
-            for guid in guids:
-                try:
-                    instance = query_object(guid)
-                    if query_type == DataList.where_operator.AND:
-                        include = self._exec_and(instance, items)
-                    elif query_type == DataList.where_operator.OR:
-                        include = self._exec_or(instance, items)
-                    else:
-                        raise NotImplementedError('The given operator is not yet implemented.')
-                    if include:
+            scanned = 0
+            for chunk in DataList.chunks(guids, DataList.partsize_objects):
+                scanned += len(chunk)
+                if plan['raw'] is True:
+                    # Only the raw data is loaded, without building the objects
+                    data = query_object.load_data_many(chunk)
+                    records = [(guid, data[guid]) for guid in chunk if guid in data]
+                else:
+                    records = query_object.load_many(chunk)
+                for record in records:
+                    if match(record):
                         if query_data == DataList.select.COUNT:
                             self.data += 1
                         elif query_data == DataList.select.GUIDS:
-                            self.data.append(guid)
+                            self.data.append(record[0] if plan['raw'] is True else record.guid)
                         else:
                             raise NotImplementedError('The given selector type is not implemented')
-                except ObjectNotFoundException:
-                    pass
 
             if 'post_query' in DataList.test_hooks:
                 DataList.test_hooks['post_query'](self)
 
-            if self._key is not None and len(guids) > 0 and self._can_cache:
-                invalidated = False
-                for class_name in invalidations:
-                    key = '{0}_{1}'.format(DataList.cachelink, class_name)
-                    cache_list = Toolbox.try_get(key, {})
-                    if self._key not in cache_list:
-                        invalidated = True
-                # If the key under which the list should be saved was already invalidated since the invalidations
-                # were saved, the returned list is most likely outdated. This is OK for this result, but the list
-                # won't get cached
-                if invalidated is False:
-                    self._volatile.set(self._key, self.data, 300 + randint(0, 300))  # Cache between 5 and 10 minutes
+            if self._key is not None and scanned > 0 and self._can_cache:
+                self._volatile.set(self._key, {'data': self.data,
+                                               'generations': generations}, 300 + randint(0, 300))  # Cache between 5 and 10 minutes
         else:
             Toolbox.log_cache_hit('datalist', True)
+            self.data = cached['data']
             self.from_cache = True
         return self
 
+    @staticmethod
+    def _get_generation_key(class_name, field):
+        """
+        Returns the key of the generation of a given field of a given object type. The generation changes
+        every time the field is changed on any object of that type
+        """
+        return '{0}_{1}_{2}'.format(DataList.cachelink, class_name, field)
+
+    @staticmethod
+    def _get_generation_keys(invalidations):
+        """
+        Returns the generation keys of all fields in a given invalidation set
+        """
+        keys = []
+        for class_name, fields in invalidations.iteritems():
+            for field in set(fields + ['__all']):
+                keys.append(DataList._get_generation_key(class_name, field))
+        return keys
+
+    @staticmethod
+    def _get_generations(keys):
+        """
+        Returns the current generations for a given set of generation keys. Generations that don't
+        exist (yet or anymore) are started with a new token, so they never match an earlier generation
+        """
+        volatile = VolatileFactory.get_client()
+        generations = volatile.get_multi(keys)
+        for key in keys:
+            if key not in generations:
+                volatile.add(key, DataList._new_generation())
+                generations[key] = volatile.get(key)
+        return generations
+
+    @staticmethod
+    def _new_generation():
+        """
+        Returns a new generation token
+        """
+        return randint(0, 2 ** 62)
+
+    @staticmethod
+    def invalidate_lists(class_name, fields):
+        """
+        Invalidates all cached lists that depend on any of the given fields of a given object type, by
+        moving these fields to a new generation. The special field '__all' covers adding and removing objects.
+        Every generation is a new random token instead of an incremented counter, so concurrent saves never
+        need to be serialized: whichever token is written last, it differs from all cached generations
+        """
+        volatile = VolatileFactory.get_client()
+        volatile.set_multi(dict((DataList._get_generation_key(class_name, field), DataList._new_generation())
+                                for field in fields))
+
+    @staticmethod
+    def _get_indexed_guids(object_type, query_type, items):
+        """
+        Tries to resolve the candidate guids for a query by means of the secondary indexes of the given object type.
+        Returns None if the indexes can't narrow down the query, in which case all objects need to be scanned.
+        The candidates are still evaluated against the full query afterwards.
+        """
+        indexed = [prop.name for prop in object_type._properties if prop.indexed]
+        if len(indexed) == 0:
+            return None
+        name = object_type.__name__.lower()
+
+        def lookup(item):
+            """
+            Returns the guids matching a single filter through its index, or None if no index can be used
+            """
+            if isinstance(item, dict) or item[0] not in indexed:
+                return None
+            if item[1] == DataList.operator.EQUALS:
+                values = [item[2]]
+            elif item[1] == DataList.operator.IN:
+                values = item[2]
+            else:
+                return None
+            DataList._ensure_index(object_type, item[0])
+            guids = set()
+            for value in values:
+                guids.update(DataList.get_index_guids(name, item[0], value))
+            return guids
+
+        if query_type == DataList.where_operator.AND:
+            # A single indexed filter is sufficient to narrow down an AND scope
+            for item in items:
+                guids = lookup(item)
+                if guids is not None:
+                    return guids
+            return None
+        if query_type == DataList.where_operator.OR and len(items) > 0:
+            # An OR scope can only be narrowed down if every filter is indexed
+            guids = set()
+            for item in items:
+                item_guids = lookup(item)
+                if item_guids is None:
+                    return None
+                guids.update(item_guids)
+            return guids
+        return None
+
+    @staticmethod
+    def _ensure_index(object_type, field):
+        """
+        Makes sure the secondary index for a given field is complete. Objects saved before the field was indexed
+        aren't in the index yet, so the index is built once by scanning all objects of the given type.
+        """
+        name = object_type.__name__.lower()
+        state_key = '{0}_{1}_{2}'.format(DataList.indexstate, name, field)
+        if Toolbox.try_get(state_key, False) is True:
+            return
+        persistent = PersistentFactory.get_client()
+        volatile = VolatileFactory.get_client()
+        for chunk in DataList.chunks(DataList.iter_pks(object_type()._namespace, name), DataList.partsize_objects):
+            results = []
+            with persistent.batch() as batch:
+                for instance in object_type.load_many(chunk):
+                    results.append(batch.set(DataList.get_index_key(name, field, instance._data.get(field), instance.guid), 0))
+            for result in results:
+                result.result()  # The index is only marked complete when all keys were written
+        persistent.set(state_key, True)
+        volatile.set(state_key, True)
+
+    @staticmethod
+    def get_index_key(name, field, value, guid=''):
+        """
+        Returns the secondary index key linking a given field value to an object. Without guid, the
+        resulting key can be used as prefix to find all objects with the given value
+        """
+        if isinstance(value, (int, long, float)):
+            value = float(value)  # Make sure e.g. 1 and 1.0 end up in the same index entry, like 1 == 1.0
+        digest = hashlib.sha1(json.dumps(value)).hexdigest()
+        return '{0}_{1}_{2}_{3}_{4}'.format(DataList.indexlink, name, field, digest, guid)
+
+    @staticmethod
+    def get_index_guids(name, field, value):
+        """
+        Returns the guids of all objects of a given type that have a given value for an indexed field
+        """
+        persistent = PersistentFactory.get_client()
+        prefix = DataList.get_index_key(name, field, value)
+        return set([key.replace(prefix, '') for key in persistent.iter_prefix(prefix)])
+
     @staticmethod
     def _build_invalidations(invalidations, object_type, items):
         """
@@ -320,8 +556,8 @@ class DataList(object):
     def get_relation_set(remote_class, remote_key, own_class, own_key, own_guid):
         """
         This method will get a DataList for a relation.
-        On a cache miss, the relation DataList will be rebuild and due to the nature of the full table scan, it will
-        update all relations in the mean time.
+        On a cache miss, the relation DataList will be loaded from the persistent reverse index using a single
+        prefix scan.
         """
 
         # Example:
@@ -346,78 +582,94 @@ class DataList(object):
             return datalist
 
         Toolbox.log_cache_hit('datalist', False)
-        mutex = VolatileMutex('reverseindex')
-        remote_name = remote_class.__name__.lower()
-        blueprint_object = remote_class()  # vDisk object
-        foreign_guids = {}
-
-        remote_namespace = blueprint_object._namespace
-        remote_keys = DataList.get_pks(remote_namespace, remote_name)
-        handled_flows = []
-        for guid in remote_keys:
-            try:
-                instance = remote_class(guid)
-                for relation in blueprint_object._relations:  # E.g. vmachine or vpool relation
-                    if relation.foreign_type is None:
-                        classname = remote_name
-                        foreign_namespace = blueprint_object._namespace
-                    else:
-                        classname = relation.foreign_type.__name__.lower()
-                        foreign_namespace = relation.foreign_type()._namespace
-                    if classname not in foreign_guids:
-                        foreign_guids[classname] = DataList.get_pks(foreign_namespace, classname)
-                    flow = '{0}_{1}'.format(classname, relation.foreign_key)
-                    if flow not in handled_flows:
-                        handled_flows.append(flow)
-                        try:
-                            mutex.acquire(60)
-                            for foreign_guid in foreign_guids[classname]:
-                                reverse_key = 'ovs_reverseindex_{0}_{1}'.format(classname, foreign_guid)
-                                reverse_index = volatile.get(reverse_key)
-                                if reverse_index is None:
-                                    reverse_index = {}
-                                if relation.foreign_key not in reverse_index:
-                                    reverse_index[relation.foreign_key] = []
-                                    volatile.set(reverse_key, reverse_index)
-                        finally:
-                            mutex.release()
-                    key = getattr(instance, '{0}_guid'.format(relation.name))
-                    if key is not None:
-                        try:
-                            mutex.acquire(60)
-                            reverse_index = volatile.get('ovs_reverseindex_{0}_{1}'.format(classname, key))
-                            if reverse_index is None:
-                                reverse_index = {}
-                            if relation.foreign_key not in reverse_index:
-                                reverse_index[relation.foreign_key] = []
-                            if guid not in reverse_index[relation.foreign_key]:
-                                reverse_index[relation.foreign_key].append(guid)
-                                volatile.set('ovs_reverseindex_{0}_{1}'.format(classname, key), reverse_index)
-                        finally:
-                            mutex.release()
-            except ObjectNotFoundException:
-                pass
+        relation = [relation for relation in remote_class._relations if relation.name == remote_key][0]
+        DataList._ensure_reverse_index(remote_class, relation)
 
+        persistent = PersistentFactory.get_client()
+        prefix = DataList.get_reverse_index_key(own_name, own_guid, own_key)
+        mutex = VolatileMutex('reverseindex_{0}_{1}'.format(own_name, own_guid))
         try:
             mutex.acquire(60)
-            reverse_key = 'ovs_reverseindex_{0}_{1}'.format(own_name, own_guid)
+            Toolbox.log_lock('reverseindex', mutex.contended)
+            guids = [key.replace(prefix, '') for key in persistent.iter_prefix(prefix)]
+            guids = [guid for guid in guids if '_' not in guid]  # Skips relations starting with the same name
             reverse_index = volatile.get(reverse_key)
             if reverse_index is None:
                 reverse_index = {}
-            if own_key not in reverse_index:
-                reverse_index[own_key] = []
-                volatile.set(reverse_key, reverse_index)
-            datalist.data = reverse_index[own_key]
+            reverse_index[own_key] = guids
+            volatile.set(reverse_key, reverse_index)
+            datalist.data = guids
             datalist.from_cache = False
         finally:
             mutex.release()
         return datalist
 
+    @staticmethod
+    def _ensure_reverse_index(remote_class, relation):
+        """
+        Makes sure the persistent reverse index for a given relation is complete. Objects saved before reverse
+        indexes were persisted aren't in the index yet, so the index is built once by scanning all objects.
+        """
+        remote_name = remote_class.__name__.lower()
+        state_key = '{0}_reverse_{1}_{2}'.format(DataList.indexstate, remote_name, relation.name)
+        if Toolbox.try_get(state_key, False) is True:
+            return
+        if relation.foreign_type is None:
+            foreign_name = remote_name
+        else:
+            foreign_name = relation.foreign_type.__name__.lower()
+        persistent = PersistentFactory.get_client()
+        volatile = VolatileFactory.get_client()
+        for chunk in DataList.chunks(DataList.iter_pks(remote_class()._namespace, remote_name), DataList.partsize_objects):
+            results = []
+            with persistent.batch() as batch:
+                for instance in remote_class.load_many(chunk):
+                    foreign_guid = instance._data[relation.name]['guid']
+                    if foreign_guid is not None:
+                        results.append(batch.set(DataList.get_reverse_index_key(foreign_name, foreign_guid,
+                                                                                relation.foreign_key, instance.guid), 0))
+            for result in results:
+                result.result()  # The index is only marked complete when all keys were written
+        persistent.set(state_key, True)
+        volatile.set(state_key, True)
+
+    @staticmethod
+    def get_reverse_index_key(name, guid, key, remote_guid=''):
+        """
+        Returns the reverse index key linking an object to a remote object pointing to it through a given relation
+        (e.g. a vPool and one of its vDisks). Without remote guid, the resulting key can be used as prefix to find
+        all remote objects for that relation
+        """
+        return '{0}_{1}_{2}_{3}_{4}'.format(DataList.reverseindexlink, name, guid, key, remote_guid)
+
     @staticmethod
     def get_pks(namespace, name):
         """
         This method will load the primary keys for a given namespace and name
         """
+        return set(DataList.iter_pks(namespace, name))
+
+    @staticmethod
+    def iter_pks(namespace, name):
+        """
+        Iterates the primary keys for a given namespace and name. The keys are fetched page by page,
+        so all keys of a type can be walked without loading them all at once
+        """
         persistent = PersistentFactory.get_client()
         prefix = '{0}_{1}_'.format(namespace, name)
-        return set([key.replace(prefix, '') for key in persistent.prefix(prefix, max_elements=-1)])
+        for key in persistent.iter_prefix(prefix):
+            yield key.replace(prefix, '')
+
+    @staticmethod
+    def chunks(items, size):
+        """
+        Splits a given iterable in lists of (at most) a given size
+        """
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if len(chunk) > 0:
+            yield chunk
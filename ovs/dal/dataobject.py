@@ -16,19 +16,19 @@
 DataObject module
 """
 import uuid
-import copy
 import re
 import json
 import inspect
 from ovs.dal.exceptions import (ObjectNotFoundException, ConcurrencyException, LinkedObjectException,
                                 MissingMandatoryFieldsException, SaveRaceConditionException, InvalidRelationException,
                                 VolatileObjectException)
-from ovs.dal.helpers import Descriptor, Toolbox, HybridRunner
+from ovs.dal.helpers import Descriptor, Toolbox, HybridRunner, LRUCache
 from ovs.dal.relations import RelationMapper
 from ovs.dal.dataobjectlist import DataObjectList
 from ovs.dal.datalist import DataList
 from ovs.extensions.generic.volatilemutex import VolatileMutex
-from ovs.extensions.storage.exceptions import KeyNotFoundException
+from ovs.extensions.storage.consistency import Consistency
+from ovs.extensions.storage.exceptions import KeyNotFoundException, AssertException
 from ovs.extensions.storage.persistentfactory import PersistentFactory
 from ovs.extensions.storage.volatilefactory import VolatileFactory
 
@@ -124,6 +124,15 @@ class DataObject(object):
     _properties = []  # Blueprint data of the objec type
     _dynamics = []    # Timeout of readonly object properties cache
     _relations = []   # Blueprint for relations
+    _read_consistency = Consistency.CONSISTENT  # Consistency hint for loading objects from the persistent store
+
+    # Process-local cache of loaded object data, validated against the object's version in the volatile store
+    _object_cache = LRUCache(5000)
+
+    # Process-local information per type, built on first use
+    _hybrid_types = {}
+    _type_info = {}
+    _guid_regex = re.compile('^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$')
 
     #######################
     ## Constructor
@@ -133,14 +142,20 @@ class DataObject(object):
         """
         Initializes the class
         """
-        hybrid_structure = HybridRunner.get_hybrids()
-        identifier = Descriptor(cls).descriptor['identifier']
-        if identifier in hybrid_structure and identifier != hybrid_structure[identifier]['identifier']:
-            new_class = Descriptor().load(hybrid_structure[identifier]).get_object()
+        HybridRunner.refresh()
+        if cls not in DataObject._hybrid_types:
+            hybrid_structure = HybridRunner.get_hybrids()
+            identifier = Descriptor(cls).descriptor['identifier']
+            if identifier in hybrid_structure and identifier != hybrid_structure[identifier]['identifier']:
+                DataObject._hybrid_types[cls] = Descriptor().load(hybrid_structure[identifier]).get_object()
+            else:
+                DataObject._hybrid_types[cls] = cls
+        new_class = DataObject._hybrid_types[cls]
+        if new_class is not cls:
             return super(cls, new_class).__new__(new_class, *args, **kwargs)
         return super(DataObject, cls).__new__(cls)
 
-    def __init__(self, guid=None, data=None, datastore_wins=False, volatile=False):
+    def __init__(self, guid=None, data=None, datastore_wins=False, volatile=False, prefetched=None, consistency=None):
         """
         Loads an object with a given guid. If no guid is given, a new object
         is generated with a new guid.
@@ -149,6 +164,9 @@ class DataObject(object):
         ** True: when saving, external modified fields will not be saved
         ** False: when saving, all changed data will be saved, regardless of external updates
         ** None: in case changed field were also changed externally, an error will be raised
+        * prefetched: Optional data that was already loaded for the given guid (see load_many)
+        * consistency: Optional consistency hint for loading the object from the persistent store,
+          overruling the type's _read_consistency
         """
 
         # Initialize super class
@@ -170,16 +188,11 @@ class DataObject(object):
         # Worker fields/objects
         self._name = self.__class__.__name__.lower()
         self._namespace = 'ovs_data'   # Namespace of the object
-        self._mutex_listcache = VolatileMutex('listcache_{0}'.format(self._name))
-        self._mutex_reverseindex = VolatileMutex('reverseindex')
 
-        # Rebuild _relation types
-        hybrid_structure = HybridRunner.get_hybrids()
-        for relation in self._relations:
-            if relation.foreign_type is not None:
-                identifier = Descriptor(relation.foreign_type).descriptor['identifier']
-                if identifier in hybrid_structure and identifier != hybrid_structure[identifier]['identifier']:
-                    relation.foreign_type = Descriptor().load(hybrid_structure[identifier]).get_object()
+        # Type information is built once per type
+        type_info = DataObject._type_info.get(self.__class__)
+        if type_info is None:
+            type_info = self._build_type_info()
 
         # Init guid
         self._new = False
@@ -188,7 +201,7 @@ class DataObject(object):
             self._new = True
         else:
             guid = str(guid).lower()
-            if re.match('^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$', guid) is not None:
+            if DataObject._guid_regex.match(guid) is not None:
                 self._guid = str(guid)
             else:
                 raise ValueError('The given guid is invalid: {0}'.format(guid))
@@ -196,27 +209,38 @@ class DataObject(object):
         # Build base keys
         self._key = '{0}_{1}_{2}'.format(self._namespace, self._name, self._guid)
 
-        # Version mutex
-        self._mutex_version = VolatileMutex('ovs_dataversion_{0}_{1}'.format(self._name, self._guid))
+        self._version_key = 'ovs_dataversion_{0}_{1}'.format(self._name, self._guid)
 
         # Load data from cache or persistent backend where appropriate
         self._volatile = VolatileFactory.get_client()
         self._persistent = PersistentFactory.get_client()
         self._metadata['cache'] = None
+        cached = None
         if self._new:
             self._data = {}
+        elif prefetched is not None:
+            self._data = prefetched
         else:
-            self._data = self._volatile.get(self._key)
+            cached = DataObject._object_cache.get(self._key)
+            if cached is not None and self._volatile.get(self._version_key) != cached['_version']:
+                cached = None
+            if cached is not None:
+                self._data = DataObject._copy_data(cached)
+                self._metadata['cache'] = True
+            else:
+                self._data = self._volatile.get(self._key)
             if self._data is None:
                 Toolbox.log_cache_hit('object_load', False)
                 self._metadata['cache'] = False
+                if consistency is None:
+                    consistency = self._read_consistency
                 try:
-                    self._data = self._persistent.get(self._key)
+                    self._data = self._persistent.get(self._key, consistency=consistency)
                 except KeyNotFoundException:
                     raise ObjectNotFoundException('{0} with guid \'{1}\' could not be found'.format(
                         self.__class__.__name__, self._guid
                     ))
-            else:
+            elif cached is None:
                 Toolbox.log_cache_hit('object_load', True)
                 self._metadata['cache'] = True
 
@@ -224,36 +248,27 @@ class DataObject(object):
         for prop in self._properties:
             if prop.name not in self._data:
                 self._data[prop.name] = prop.default
-            self._add_property(prop)
 
         # Load relations
         for relation in self._relations:
             if relation.name not in self._data:
-                if relation.foreign_type is None:
-                    cls = self.__class__
-                else:
-                    cls = relation.foreign_type
-                self._data[relation.name] = Descriptor(cls).descriptor
-            self._add_relation_property(relation)
-
-        # Add wrapped properties
-        for dynamic in self._dynamics:
-            self._add_dynamic_property(dynamic)
+                self._data[relation.name] = dict(type_info['relation_descriptors'][relation.name])
 
         # Load foreign keys
-        relations = RelationMapper.load_foreign_relations(self.__class__)
-        if relations is not None:
-            for key, info in relations.iteritems():
-                self._objects[key] = {'info': info,
-                                      'data': None}
-                self._add_list_property(key, info['list'])
+        for key, info in type_info['foreign_relations'].iteritems():
+            self._objects[key] = {'info': info,
+                                  'data': None}
 
         # Store original data
-        self._original = copy.deepcopy(self._data)
+        self._original = DataObject._copy_data(self._data)
 
         if not self._new:
-            # Re-cache the object
-            self._volatile.set(self._key, self._data)
+            if prefetched is None and cached is None and consistency != Consistency.DIRTY:
+                # Re-cache the object. The version is only added, so it never overrules a newer saved version.
+                # Dirty reads can be outdated for an unknown time, so they aren't cached
+                self._volatile.set(self._key, self._data)
+                self._volatile.add(self._version_key, self._data.get('_version'))
+            DataObject._object_cache.set(self._key, self._original)
 
         # Freeze property creation
         self._frozen = True
@@ -263,6 +278,110 @@ class DataObject(object):
             for field, value in data.iteritems():
                 setattr(self, field, value)
 
+    def _build_type_info(self):
+        """
+        Builds the information shared by all objects of this object's type: it resolves the (possibly extended)
+        relation types, installs the properties on the class and loads the relations pointing to this type
+        """
+        hybrid_structure = HybridRunner.get_hybrids()
+        for relation in self._relations:
+            if relation.foreign_type is not None:
+                identifier = Descriptor(relation.foreign_type).descriptor['identifier']
+                if identifier in hybrid_structure and identifier != hybrid_structure[identifier]['identifier']:
+                    relation.foreign_type = Descriptor().load(hybrid_structure[identifier]).get_object()
+
+        for prop in self._properties:
+            self._add_property(prop)
+        relation_descriptors = {}
+        for relation in self._relations:
+            cls = self.__class__ if relation.foreign_type is None else relation.foreign_type
+            relation_descriptors[relation.name] = Descriptor(cls).descriptor
+            self._add_relation_property(relation)
+        for dynamic in self._dynamics:
+            self._add_dynamic_property(dynamic)
+        foreign_relations = RelationMapper.load_foreign_relations(self.__class__) or {}
+        for key, info in foreign_relations.iteritems():
+            self._add_list_property(key, info['list'])
+
+        type_info = {'relation_descriptors': relation_descriptors,
+                     'foreign_relations': foreign_relations}
+        DataObject._type_info[self.__class__] = type_info
+        return type_info
+
+    @staticmethod
+    def _clear_type_info():
+        """
+        Clears the information built per type, e.g. when the hybrid structure changed
+        """
+        DataObject._hybrid_types.clear()
+        DataObject._type_info.clear()
+
+    @staticmethod
+    def _copy_data(data):
+        """
+        Copies object data. Only containers are copied, all other values are immutable and can be shared
+        """
+        if isinstance(data, dict):
+            return dict((key, DataObject._copy_data(value)) for key, value in data.iteritems())
+        if isinstance(data, list):
+            return [DataObject._copy_data(value) for value in data]
+        if isinstance(data, set):
+            return set(data)
+        return data
+
+    @classmethod
+    def load_many(cls, guids, consistency=None):
+        """
+        Loads a set of objects of this type, fetching their data in bulk instead of one by one.
+        The objects are returned in the order of the given guids. Objects that don't exist are skipped
+        """
+        guids = [str(guid).lower() for guid in guids]
+        if len(guids) == 0:
+            return []
+        blueprint = cls()  # Makes sure the key is built for the correct (possibly extended) hybrid
+        data = blueprint._load_data_many(guids, consistency)
+        return [blueprint.__class__(guid, prefetched=data[guid]) for guid in guids if guid in data]
+
+    @classmethod
+    def load_data_many(cls, guids, consistency=None):
+        """
+        Loads the raw data of a set of objects of this type in bulk, without building the objects.
+        Returns a dictionary mapping the guids of the existing objects on their data
+        """
+        guids = [str(guid).lower() for guid in guids]
+        if len(guids) == 0:
+            return {}
+        return cls()._load_data_many(guids, consistency)
+
+    def _load_data_many(self, guids, consistency=None):
+        """
+        Fetches the data of a set of objects of this object's type, from the process-local cache, the volatile
+        store or the persistent store (using the given consistency hint, or the type's _read_consistency)
+        """
+        if consistency is None:
+            consistency = self._read_consistency
+        keys = dict((guid, '{0}_{1}_{2}'.format(self._namespace, self._name, guid)) for guid in guids)
+        volatile = VolatileFactory.get_client()
+        data = {}
+        cached = dict((guid, DataObject._object_cache.get(keys[guid])) for guid in guids)
+        cached = dict((guid, entry) for guid, entry in cached.iteritems() if entry is not None)
+        if len(cached) > 0:
+            version_keys = dict((guid, 'ovs_dataversion_{0}_{1}'.format(self._name, guid)) for guid in cached)
+            versions = volatile.get_multi(version_keys.values())
+            for guid, entry in cached.iteritems():
+                if versions.get(version_keys[guid]) == entry['_version']:
+                    data[keys[guid]] = DataObject._copy_data(entry)
+        missing = [key for key in keys.values() if key not in data]
+        if len(missing) > 0:
+            data.update(volatile.get_multi(missing))
+        missing = [key for key in keys.values() if key not in data]
+        if len(missing) > 0:
+            loaded = PersistentFactory.get_client().get_multi(missing, consistency=consistency)
+            if len(loaded) > 0 and consistency != Consistency.DIRTY:
+                volatile.set_multi(loaded)
+            data.update(loaded)
+        return dict((guid, data[keys[guid]]) for guid in guids if keys[guid] in data)
+
     #######################
     # Helper methods for dynamic getting and setting
     #######################
@@ -447,15 +566,7 @@ class DataObject(object):
         tries = 0
         successful = False
         while successful is False:
-            invalid_fields = []
-            for prop in self._properties:
-                if prop.mandatory is True and self._data[prop.name] is None:
-                    invalid_fields.append(prop.name)
-            for relation in self._relations:
-                if relation.mandatory is True and self._data[relation.name]['guid'] is None:
-                    invalid_fields.append(relation.name)
-            if len(invalid_fields) > 0:
-                raise MissingMandatoryFieldsException('Missing fields on {0}: {1}'.format(self._name, ', '.join(invalid_fields)))
+            self._check_mandatory_fields()
 
             if recursive:
                 # Save objects that point to us (e.g. disk.vmachine - if this is disk)
@@ -466,146 +577,147 @@ class DataObject(object):
                             item.save(recursive=True, skip=relation.foreign_key)
 
                 # Save object we point at (e.g. machine.disks - if this is machine)
-                relations = RelationMapper.load_foreign_relations(self.__class__)
-                if relations is not None:
-                    for key, info in relations.iteritems():
-                        if key != skip:  # machine will be skipped
-                            if info['list'] is True:
-                                for item in getattr(self, key).iterloaded():
-                                    item.save(recursive=True, skip=info['key'])
-                            else:
-                                item = getattr(self, key)
-                                if item is not None:
-                                    item.save(recursive=True, skip=info['key'])
-
-            try:
-                data = self._persistent.get(self._key)
-            except KeyNotFoundException:
-                if self._new:
-                    data = {'_version': 0}
-                else:
-                    raise ObjectNotFoundException('{0} with guid \'{1}\' was deleted'.format(
-                        self.__class__.__name__, self._guid
-                    ))
-            changed_fields = []
-            data_conflicts = []
-            for attribute in self._data.keys():
-                if attribute == '_version':
-                    continue
-                if self._data[attribute] != self._original[attribute]:
-                    # We changed this value
-                    changed_fields.append(attribute)
-                    if attribute in data and self._original[attribute] != data[attribute]:
-                        # Some other process also wrote to the database
-                        if self._datastore_wins is None:
-                            # In case we didn't set a policy, we raise the conflicts
-                            data_conflicts.append(attribute)
-                        elif self._datastore_wins is False:
-                            # If the datastore should not win, we just overwrite the data
-                            data[attribute] = self._data[attribute]
-                        # If the datastore should win, we discard/ignore our change
-                    else:
-                        # Normal scenario, saving data
+                for key, info in DataObject._type_info[self.__class__]['foreign_relations'].iteritems():
+                    if key != skip:  # machine will be skipped
+                        if info['list'] is True:
+                            for item in getattr(self, key).iterloaded():
+                                item.save(recursive=True, skip=info['key'])
+                        else:
+                            item = getattr(self, key)
+                            if item is not None:
+                                item.save(recursive=True, skip=info['key'])
+
+            transaction = self._persistent.begin_transaction()
+            data, changed_fields = self._prepare_save(transaction)
+            changes = {self._name: [(self._new, changed_fields)]}
+            successful = DataObject._apply_save(transaction)
+            if successful is False:
+                tries += 1
+                if tries > 5:
+                    raise SaveRaceConditionException()
+
+        self._finish_save(data)
+        DataObject._invalidate_lists(changes)
+
+    def _check_mandatory_fields(self):
+        """
+        Validates whether all mandatory properties and relations are set
+        """
+        invalid_fields = []
+        for prop in self._properties:
+            if prop.mandatory is True and self._data[prop.name] is None:
+                invalid_fields.append(prop.name)
+        for relation in self._relations:
+            if relation.mandatory is True and self._data[relation.name]['guid'] is None:
+                invalid_fields.append(relation.name)
+        if len(invalid_fields) > 0:
+            raise MissingMandatoryFieldsException('Missing fields on {0}: {1}'.format(self._name, ', '.join(invalid_fields)))
+
+    def _prepare_save(self, transaction):
+        """
+        Merges the changes of this object with the stored data, adding the object and its index entries
+        to a given transaction. The transaction asserts the stored data, so it can only be applied if nobody
+        saved the object in between. Returns the merged data and the changed fields
+        """
+        try:
+            data = self._persistent.get(self._key, transaction=transaction)
+            stored_index_keys = self._get_index_keys(data)
+        except KeyNotFoundException:
+            if self._new:
+                data = {'_version': 0}
+                stored_index_keys = set()
+            else:
+                raise ObjectNotFoundException('{0} with guid \'{1}\' was deleted'.format(
+                    self.__class__.__name__, self._guid
+                ))
+        changed_fields = []
+        data_conflicts = []
+        for attribute in self._data.keys():
+            if attribute == '_version':
+                continue
+            if self._data[attribute] != self._original[attribute]:
+                # We changed this value
+                changed_fields.append(attribute)
+                if attribute in data and self._original[attribute] != data[attribute]:
+                    # Some other process also wrote to the database
+                    if self._datastore_wins is None:
+                        # In case we didn't set a policy, we raise the conflicts
+                        data_conflicts.append(attribute)
+                    elif self._datastore_wins is False:
+                        # If the datastore should not win, we just overwrite the data
                         data[attribute] = self._data[attribute]
-                elif attribute not in data:
+                    # If the datastore should win, we discard/ignore our change
+                else:
+                    # Normal scenario, saving data
                     data[attribute] = self._data[attribute]
-            if data_conflicts:
-                raise ConcurrencyException('Got field conflicts while saving {0}. Conflicts: {1}'.format(
-                    self._name, ', '.join(data_conflicts)
-                ))
+            elif attribute not in data:
+                data[attribute] = self._data[attribute]
+        if data_conflicts:
+            raise ConcurrencyException('Got field conflicts while saving {0}. Conflicts: {1}'.format(
+                self._name, ', '.join(data_conflicts)
+            ))
+
+        data['_version'] += 1
+        self._persistent.set(self._key, data, transaction=transaction)
+        index_keys = self._get_index_keys(data)
+        for index_key in index_keys - stored_index_keys:
+            self._persistent.set(index_key, 0, transaction=transaction)
+        for index_key in stored_index_keys - index_keys:
+            self._persistent.delete(index_key, transaction=transaction)
+        return data, changed_fields
+
+    @staticmethod
+    def _apply_save(transaction):
+        """
+        Applies a save transaction. Returns False if the transaction could not be applied due to a concurrent save
+        """
+        try:
+            PersistentFactory.get_client().apply_transaction(transaction)
+        except AssertException:
+            return False
+        return True
 
-            # Refresh internal data structure
-            self._data = copy.deepcopy(data)
+    @staticmethod
+    def _invalidate_lists(changes):
+        """
+        Invalidates the cached lists affected by the given changes, a dict mapping each object type name on a list
+        of (new, changed fields) tuples. This should only happen after the saved objects were refreshed in the
+        volatile caches, or a list query in between could cache outdated objects under the new generations
+        """
+        for name, object_changes in changes.iteritems():
+            fields = set()
+            for new, changed_fields in object_changes:
+                fields.update(changed_fields)
+                if new is True:
+                    fields.add('__all')
+            if len(fields) > 0:
+                DataList.invalidate_lists(name, fields)
 
-            # First, update reverse index
-            try:
-                self._mutex_reverseindex.acquire(60)
-                for relation in self._relations:
-                    key = relation.name
-                    original_guid = self._original[key]['guid']
-                    new_guid = self._data[key]['guid']
-                    if original_guid != new_guid:
-                        if relation.foreign_type is None:
-                            classname = self.__class__.__name__.lower()
-                        else:
-                            classname = relation.foreign_type.__name__.lower()
-                        if original_guid is not None:
-                            reverse_key = 'ovs_reverseindex_{0}_{1}'.format(classname, original_guid)
-                            reverse_index = self._volatile.get(reverse_key)
-                            if reverse_index is not None:
-                                if relation.foreign_key in reverse_index:
-                                    entries = reverse_index[relation.foreign_key]
-                                    if self.guid in entries:
-                                        entries.remove(self.guid)
-                                        reverse_index[relation.foreign_key] = entries
-                                        self._volatile.set(reverse_key, reverse_index)
-                        if new_guid is not None:
-                            reverse_key = 'ovs_reverseindex_{0}_{1}'.format(classname, new_guid)
-                            reverse_index = self._volatile.get(reverse_key)
-                            if reverse_index is not None:
-                                if relation.foreign_key in reverse_index:
-                                    entries = reverse_index[relation.foreign_key]
-                                    if self.guid not in entries:
-                                        entries.append(self.guid)
-                                        reverse_index[relation.foreign_key] = entries
-                                        self._volatile.set(reverse_key, reverse_index)
-                                else:
-                                    reverse_index[relation.foreign_key] = [self.guid]
-                                    self._volatile.set(reverse_key, reverse_index)
-                            else:
-                                reverse_index = {relation.foreign_key: [self.guid]}
-                                self._volatile.set(reverse_key, reverse_index)
-                reverse_key = 'ovs_reverseindex_{0}_{1}'.format(self._name, self.guid)
-                reverse_index = self._volatile.get(reverse_key)
-                if reverse_index is None:
-                    reverse_index = {}
-                    relations = RelationMapper.load_foreign_relations(self.__class__)
-                    if relations is not None:
-                        for key, _ in relations.iteritems():
-                            reverse_index[key] = []
-                    self._volatile.set(reverse_key, reverse_index)
-            finally:
-                self._mutex_reverseindex.release()
-
-            # Second, invalidate property lists
-            try:
-                self._mutex_listcache.acquire(60)
-                cache_key = '{0}_{1}'.format(DataList.cachelink, self._name)
-                cache_list = Toolbox.try_get(cache_key, {})
-                change = False
-                for list_key in cache_list.keys():
-                    fields = cache_list[list_key]
-                    if ('__all' in fields and self._new) or list(set(fields) & set(changed_fields)):
-                        change = True
-                        self._volatile.delete(list_key)
-                        del cache_list[list_key]
-                if change is True:
-                    self._volatile.set(cache_key, cache_list)
-                    self._persistent.set(cache_key, cache_list)
-            finally:
-                self._mutex_listcache.release()
-
-            # Save the data
-            try:
-                self._mutex_version.acquire(5)
-                this_version = self._data['_version']
-                try:
-                    store_version = self._persistent.get(self._key)['_version']
-                except KeyNotFoundException:
-                    store_version = 0
-                if this_version == store_version:
-                    self._data['_version'] = this_version + 1
-                    self._persistent.set(self._key, self._data)
-                    self._volatile.delete(self._key)
-                    successful = True
+    def _finish_save(self, data):
+        """
+        Refreshes the object and the volatile caches after its data was saved
+        """
+        self._data = DataObject._copy_data(data)
+        self._volatile.set(self._version_key, self._data['_version'])
+        self._volatile.delete(self._key)
+
+        # Update the cached reverse indexes
+        for relation in self._relations:
+            key = relation.name
+            original_guid = self._original[key]['guid']
+            new_guid = self._data[key]['guid']
+            if original_guid != new_guid:
+                if relation.foreign_type is None:
+                    classname = self.__class__.__name__.lower()
                 else:
-                    tries += 1
-            finally:
-                self._mutex_version.release()
-            if tries > 5:
-                raise SaveRaceConditionException()
+                    classname = relation.foreign_type.__name__.lower()
+                if original_guid is not None:
+                    self._update_reverse_index(classname, original_guid, relation.foreign_key, add=False)
+                if new_guid is not None:
+                    self._update_reverse_index(classname, new_guid, relation.foreign_key, add=True)
 
-        self._original = copy.deepcopy(self._data)
+        self._original = DataObject._copy_data(self._data)
+        DataObject._object_cache.set(self._key, self._original)
 
         self.dirty = False
         self._new = False
@@ -622,84 +734,68 @@ class DataObject(object):
             raise VolatileObjectException()
 
         # Check foreign relations
-        relations = RelationMapper.load_foreign_relations(self.__class__)
-        if relations is not None:
-            for key, info in relations.iteritems():
-                items = getattr(self, key)
-                if info['list'] is True:
-                    if len(items) > 0:
-                        if abandon is True:
-                            for item in items.itersafe():
-                                setattr(item, info['key'], None)
-                                try:
-                                    item.save()
-                                except ObjectNotFoundException:
-                                    pass
-                        else:
-                            raise LinkedObjectException('There are {0} items left in self.{1}'.format(len(items), key))
-                elif items is not None:
-                    # No list (so a 1-to-1 relation), so there should be an object, or None
-                    item = items  # More clear naming
+        for key, info in DataObject._type_info[self.__class__]['foreign_relations'].iteritems():
+            items = getattr(self, key)
+            if info['list'] is True:
+                if len(items) > 0:
                     if abandon is True:
-                        setattr(item, info['key'], None)
-                        try:
-                            item.save()
-                        except ObjectNotFoundException:
-                            pass
+                        for item in items.itersafe():
+                            setattr(item, info['key'], None)
+                            try:
+                                item.save()
+                            except ObjectNotFoundException:
+                                pass
                     else:
-                        raise LinkedObjectException('There is still an item linked in self.{0}'.format(key))
+                        raise LinkedObjectException('There are {0} items left in self.{1}'.format(len(items), key))
+            elif items is not None:
+                # No list (so a 1-to-1 relation), so there should be an object, or None
+                item = items  # More clear naming
+                if abandon is True:
+                    setattr(item, info['key'], None)
+                    try:
+                        item.save()
+                    except ObjectNotFoundException:
+                        pass
+                else:
+                    raise LinkedObjectException('There is still an item linked in self.{0}'.format(key))
 
-        # Delete the object out of the persistent store
+        # Delete the object and its index entries out of the persistent store in a single transaction
+        index_keys = self._get_index_keys(self._original)
         try:
-            self._persistent.delete(self._key)
+            index_keys.update(self._get_index_keys(self._persistent.get(self._key)))
         except KeyNotFoundException:
             pass
+        transaction = self._persistent.begin_transaction()
+        self._persistent.delete(self._key, transaction=transaction)
+        for index_key in index_keys:
+            self._persistent.delete(index_key, transaction=transaction)
+        self._persistent.apply_transaction(transaction)
 
         # First, update reverse index
+        for relation in self._relations:
+            key = relation.name
+            original_guid = self._original[key]['guid']
+            if original_guid is not None:
+                if relation.foreign_type is None:
+                    classname = self.__class__.__name__.lower()
+                else:
+                    classname = relation.foreign_type.__name__.lower()
+                self._update_reverse_index(classname, original_guid, relation.foreign_key, add=False)
+        mutex = VolatileMutex('reverseindex_{0}_{1}'.format(self._name, self.guid))
         try:
-            self._mutex_reverseindex.acquire(60)
-            for relation in self._relations:
-                key = relation.name
-                original_guid = self._original[key]['guid']
-                if original_guid is not None:
-                    if relation.foreign_type is None:
-                        classname = self.__class__.__name__.lower()
-                    else:
-                        classname = relation.foreign_type.__name__.lower()
-                    reverse_key = 'ovs_reverseindex_{0}_{1}'.format(classname, original_guid)
-                    reverse_index = self._volatile.get(reverse_key)
-                    if reverse_index is not None:
-                        if relation.foreign_key in reverse_index:
-                            entries = reverse_index[relation.foreign_key]
-                            if self.guid in entries:
-                                entries.remove(self.guid)
-                                reverse_index[relation.foreign_key] = entries
-                                self._volatile.set(reverse_key, reverse_index)
+            mutex.acquire(60)
+            Toolbox.log_lock('reverseindex', mutex.contended)
             self._volatile.delete('ovs_reverseindex_{0}_{1}'.format(self._name, self.guid))
         finally:
-            self._mutex_reverseindex.release()
+            mutex.release()
 
-        # Second, invalidate property lists
-        try:
-            self._mutex_listcache.acquire(60)
-            cache_key = '{0}_{1}'.format(DataList.cachelink, self._name)
-            cache_list = Toolbox.try_get(cache_key, {})
-            change = False
-            for list_key in cache_list.keys():
-                fields = cache_list[list_key]
-                if '__all' in fields:
-                    change = True
-                    self._volatile.delete(list_key)
-                    del cache_list[list_key]
-            if change is True:
-                self._volatile.set(cache_key, cache_list)
-                self._persistent.set(cache_key, cache_list)
-        finally:
-            self._mutex_listcache.release()
+        # Second, delete the object and its properties out of the volatile store
+        self._volatile.delete_multi(['{0}_{1}'.format(self._key, dynamic.name) for dynamic in self._dynamics] +
+                                    [self._key, self._version_key])
+        DataObject._object_cache.delete(self._key)
 
-        # Delete the object and its properties out of the volatile store
-        self.invalidate_dynamics()
-        self._volatile.delete(self._key)
+        # Last, invalidate property lists
+        DataList.invalidate_lists(self._name, ['__all'])
 
     # Discard all pending changes
     def discard(self):
@@ -714,9 +810,9 @@ class DataObject(object):
         Invalidates all dynamic property caches. Use with caution, as this action can introduce
         a short performance hit.
         """
-        for dynamic in self._dynamics:
-            if properties is None or dynamic.name in properties:
-                self._volatile.delete('{0}_{1}'.format(self._key, dynamic.name))
+        self._volatile.delete_multi(['{0}_{1}'.format(self._key, dynamic.name)
+                                     for dynamic in self._dynamics
+                                     if properties is None or dynamic.name in properties])
 
     def export(self):
         """
@@ -808,6 +904,48 @@ class DataObject(object):
     # Helper methods
     #######################
 
+    def _update_reverse_index(self, classname, guid, key, add):
+        """
+        Adds or removes this object in the cached reverse index of a given object. Only the reverse index
+        of that object is locked, so saves touching unrelated relations don't block each other.
+        Uncached relations are loaded from the persistent reverse index when required
+        """
+        reverse_key = 'ovs_reverseindex_{0}_{1}'.format(classname, guid)
+        mutex = VolatileMutex('reverseindex_{0}_{1}'.format(classname, guid))
+        try:
+            mutex.acquire(60)
+            Toolbox.log_lock('reverseindex', mutex.contended)
+            reverse_index = self._volatile.get(reverse_key)
+            if reverse_index is not None and key in reverse_index:
+                entries = reverse_index[key]
+                if add is True and self.guid not in entries:
+                    entries.append(self.guid)
+                elif add is False and self.guid in entries:
+                    entries.remove(self.guid)
+                else:
+                    return
+                reverse_index[key] = entries
+                self._volatile.set(reverse_key, reverse_index)
+        finally:
+            mutex.release()
+
+    def _get_index_keys(self, data):
+        """
+        Returns the secondary and reverse index keys pointing to this object, given a set of data
+        """
+        index_keys = set(DataList.get_index_key(self._name, prop.name, data.get(prop.name), self._guid)
+                         for prop in self._properties if prop.indexed)
+        for relation in self._relations:
+            descriptor = data.get(relation.name)
+            if descriptor is not None and descriptor['guid'] is not None:
+                if relation.foreign_type is None:
+                    classname = self._name
+                else:
+                    classname = relation.foreign_type.__name__.lower()
+                index_keys.add(DataList.get_reverse_index_key(classname, descriptor['guid'],
+                                                              relation.foreign_key, self._guid))
+        return index_keys
+
     def _backend_property(self, function, dynamic):
         """
         Handles the internal caching of dynamic properties
@@ -866,3 +1004,6 @@ class DataObject(object):
         if not isinstance(other, DataObject):
             return True
         return not self.__eq__(other)
+
+
+HybridRunner.register_invalidation_hook(DataObject._clear_type_info)
@@ -24,6 +24,8 @@ class DataObjectList(object):
     descriptor metadata to provide a list-alike experience
     """
 
+    partsize = 500  # Amount of objects loaded in bulk
+
     def __init__(self, query_result, cls, reduced=False):
         """
         Initializes a DataObjectList object, using a query result and a class type
@@ -133,12 +135,24 @@ class DataObjectList(object):
         """
         Loads all objects (to use on e.g. sorting), but not caring about objects that doesn't exist
         """
-        for guid in self._guids:
-            if guid not in self._objects:
-                try:
-                    self._get_object(guid)
-                except ObjectNotFoundException:
-                    pass
+        for index in xrange(0, len(self._guids), DataObjectList.partsize):
+            self._load_many(self._guids[index:index + DataObjectList.partsize])
+
+    def _load_many(self, guids):
+        """
+        Loads and caches all objects for the given guids that aren't loaded yet in bulk.
+        Returns the guids that were loaded
+        """
+        guids = [guid for guid in guids if guid not in self._objects]
+        if self._reduced:
+            for guid in guids:
+                self._get_object(guid)
+            return guids
+        loaded = []
+        for instance in self.type.load_many(guids):
+            self._objects[instance.guid] = instance
+            loaded.append(instance.guid)
+        return loaded
 
     def load(self):
         """
@@ -185,11 +199,17 @@ class DataObjectList(object):
         """
         Yields object instances, but not caring about objects that doesn't exist
         """
-        for guid in self._guids:
-            try:
-                yield self._get_object(guid)
-            except ObjectNotFoundException:
-                pass
+        for index in xrange(0, len(self._guids), DataObjectList.partsize):
+            guids = self._guids[index:index + DataObjectList.partsize]
+            loaded = set(self._load_many(guids))
+            for guid in guids:
+                if guid in loaded:
+                    yield self._objects[guid]  # Just loaded, so no need to check for updates
+                elif guid in self._objects:
+                    try:
+                        yield self._get_object(guid)
+                    except ObjectNotFoundException:
+                        pass
 
     def __iter__(self):
         """
@@ -18,9 +18,10 @@ Module containing certain helper classes providing various logic
 import inspect
 import os
 import imp
-import copy
-import re
+import time
 import hashlib
+from collections import OrderedDict
+from threading import Lock
 from ovs.extensions.storage.volatilefactory import VolatileFactory
 from ovs.extensions.storage.persistentfactory import PersistentFactory
 
@@ -35,6 +36,7 @@ class Descriptor(object):
     """
 
     object_cache = {}
+    _descriptors = {}
 
     def __init__(self, object_type=None, guid=None):
         """
@@ -50,28 +52,24 @@ class Descriptor(object):
         else:
             self.initialized = True
 
-            key = 'ovs_descriptor_{0}'.format(re.sub('[\W_]+', '', str(object_type)))
-            self._volatile = VolatileFactory.get_client()
-            self._descriptor = self._volatile.get(key)
-            if self._descriptor is None:
-                Toolbox.log_cache_hit('descriptor', False)
+            descriptor = Descriptor._descriptors.get(object_type)
+            if descriptor is None:
                 filename = inspect.getfile(object_type).replace('.pyc', '.py')
                 name = filename.replace(os.path.dirname(filename) + os.path.sep, '').replace('.py', '')
                 source = os.path.relpath(filename, os.path.dirname(__file__))
-                self._descriptor = {'name': name,
-                                    'source': source,
-                                    'type': object_type.__name__,
-                                    'identifier': name + '_' + hashlib.sha256(name + source + object_type.__name__).hexdigest()}
-                self._volatile.set(key, self._descriptor)
-            else:
-                Toolbox.log_cache_hit('descriptor', True)
+                descriptor = {'name': name,
+                              'source': source,
+                              'type': object_type.__name__,
+                              'identifier': name + '_' + hashlib.sha256(name + source + object_type.__name__).hexdigest()}
+                Descriptor._descriptors[object_type] = descriptor
+            self._descriptor = dict(descriptor)
             self._descriptor['guid'] = guid
 
     def load(self, descriptor):
         """
         Loads an instance from a descriptor dictionary representation
         """
-        self._descriptor = copy.deepcopy(descriptor)
+        self._descriptor = dict(descriptor)
         self.initialized = True
         return self
 
@@ -81,7 +79,7 @@ class Descriptor(object):
         Returns a dictionary representation of the descriptor class
         """
         if self.initialized:
-            return copy.deepcopy(self._descriptor)
+            return dict(self._descriptor)
         else:
             raise RuntimeError('Descriptor not yet initialized')
 
@@ -116,74 +114,136 @@ class Descriptor(object):
 class HybridRunner(object):
     """
     The HybridRunner provides access to generic properties from the hybrid object by means
-    of dynamic code reflection
+    of dynamic code reflection. The hybrid structure is kept in a process-wide registry, which is
+    rebuilt when the hybrid files change (or when it's explicitly invalidated, e.g. after installing
+    a plugin)
     """
 
+    check_interval = 5
+    _hybrid_structure = None
+    _fingerprint = None
+    _last_check = 0
+    _invalidation_hooks = []
+    _lock = Lock()
+
     @staticmethod
     def get_hybrids():
         """
         Yields all hybrid classes
         """
-        key = 'ovs_hybrid_structure'
-        volatile = VolatileFactory.get_client()
-        hybrid_structure = volatile.get(key)
-        if hybrid_structure is None:
-            Toolbox.log_cache_hit('hybrid_structure', False)
-            base_hybrids = []
-            inherit_table = {}
-            translation_table = {}
-            path = os.path.join(os.path.dirname(__file__), 'hybrids')
-            for filename in os.listdir(path):
-                if os.path.isfile(os.path.join(path, filename)) and filename.endswith('.py'):
-                    name = filename.replace('.py', '')
-                    module = imp.load_source(name, os.path.join(path, filename))
-                    for member in inspect.getmembers(module):
-                        if inspect.isclass(member[1]) \
-                                and member[1].__module__ == name:
-                            current_class = member[1]
-                            current_descriptor = Descriptor(current_class).descriptor
-                            current_identifier = current_descriptor['identifier']
-                            if current_identifier not in translation_table:
-                                translation_table[current_identifier] = current_descriptor
-                            if 'DataObject' in current_class.__base__.__name__:
-                                if current_identifier not in base_hybrids:
-                                    base_hybrids.append(current_identifier)
-                                else:
-                                    raise RuntimeError('Duplicate base hybrid found: {0}'.format(current_identifier))
-                            elif 'DataObject' not in current_class.__name__:
-                                structure = []
-                                this_class = None
-                                for this_class in current_class.__mro__:
-                                    if 'DataObject' in this_class.__name__:
-                                        break
-                                    try:
-                                        structure.append(Descriptor(this_class).descriptor['identifier'])
-                                    except TypeError:
-                                        break  # This means we reached one of the built-in classes.
+        HybridRunner.refresh()
+        hybrid_structure = HybridRunner._hybrid_structure
+        if hybrid_structure is not None:
+            return hybrid_structure
+        with HybridRunner._lock:
+            if HybridRunner._hybrid_structure is None:
+                Toolbox.log_cache_hit('hybrid_structure', False)
+                HybridRunner._fingerprint = HybridRunner._get_fingerprint()
+                HybridRunner._last_check = time.time()
+                HybridRunner._hybrid_structure = HybridRunner._build_hybrids()
+            return HybridRunner._hybrid_structure
+
+    @staticmethod
+    def refresh():
+        """
+        Invalidates the registry when the hybrid files changed. The files are checked at most once
+        every `check_interval` seconds
+        """
+        if HybridRunner._hybrid_structure is None or time.time() - HybridRunner._last_check < HybridRunner.check_interval:
+            return
+        HybridRunner._last_check = time.time()
+        if HybridRunner._get_fingerprint() != HybridRunner._fingerprint:
+            HybridRunner.invalidate()
+
+    @staticmethod
+    def invalidate():
+        """
+        Drops the hybrid registry and all caches derived from it
+        """
+        with HybridRunner._lock:
+            HybridRunner._hybrid_structure = None
+            Descriptor.object_cache.clear()
+            for hook in HybridRunner._invalidation_hooks:
+                hook()
+
+    @staticmethod
+    def register_invalidation_hook(hook):
+        """
+        Registers a callable to be executed when the hybrid registry is invalidated
+        """
+        HybridRunner._invalidation_hooks.append(hook)
+
+    @staticmethod
+    def _get_fingerprint():
+        """
+        Returns the names and modification times of all hybrid files
+        """
+        path = os.path.join(os.path.dirname(__file__), 'hybrids')
+        fingerprint = []
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith('.py'):
+                try:
+                    fingerprint.append((filename, os.stat(os.path.join(path, filename)).st_mtime))
+                except OSError:
+                    pass  # The file was removed in the meantime
+        return fingerprint
+
+    @staticmethod
+    def _build_hybrids():
+        """
+        Builds the hybrid structure by loading all hybrid modules
+        """
+        base_hybrids = []
+        inherit_table = {}
+        translation_table = {}
+        path = os.path.join(os.path.dirname(__file__), 'hybrids')
+        for filename in os.listdir(path):
+            if os.path.isfile(os.path.join(path, filename)) and filename.endswith('.py'):
+                name = filename.replace('.py', '')
+                module = imp.load_source(name, os.path.join(path, filename))
+                for member in inspect.getmembers(module):
+                    if inspect.isclass(member[1]) \
+                            and member[1].__module__ == name:
+                        current_class = member[1]
+                        current_descriptor = Descriptor(current_class).descriptor
+                        current_identifier = current_descriptor['identifier']
+                        if current_identifier not in translation_table:
+                            translation_table[current_identifier] = current_descriptor
+                        if 'DataObject' in current_class.__base__.__name__:
+                            if current_identifier not in base_hybrids:
+                                base_hybrids.append(current_identifier)
+                            else:
+                                raise RuntimeError('Duplicate base hybrid found: {0}'.format(current_identifier))
+                        elif 'DataObject' not in current_class.__name__:
+                            structure = []
+                            this_class = None
+                            for this_class in current_class.__mro__:
                                 if 'DataObject' in this_class.__name__:
-                                    for index in reversed(range(1, len(structure))):
-                                        if structure[index] in inherit_table:
-                                            raise RuntimeError('Duplicate hybrid inheritance: {0}({1})'.format(structure[index - 1], structure[index]))
-                                        inherit_table[structure[index]] = structure[index - 1]
-            items_replaced = True
-            hybrids = {hybrid: None for hybrid in base_hybrids[:]}
-            while items_replaced is True:
-                items_replaced = False
-                for hybrid, replacement in inherit_table.iteritems():
-                    if hybrid in hybrids.keys() and hybrids[hybrid] is None:
-                        hybrids[hybrid] = replacement
-                        items_replaced = True
-                    if hybrid in hybrids.values():
-                        for item in hybrids.keys():
-                            if hybrids[item] == hybrid:
-                                hybrids[item] = replacement
-                        items_replaced = True
-            hybrid_structure = {hybrid: translation_table[replacement] if replacement is not None else translation_table[hybrid]
-                                for hybrid, replacement in hybrids.iteritems()}
-            volatile.set(key, hybrid_structure)
-        else:
-            Toolbox.log_cache_hit('hybrid_structure', True)
-        return hybrid_structure
+                                    break
+                                try:
+                                    structure.append(Descriptor(this_class).descriptor['identifier'])
+                                except TypeError:
+                                    break  # This means we reached one of the built-in classes.
+                            if 'DataObject' in this_class.__name__:
+                                for index in reversed(range(1, len(structure))):
+                                    if structure[index] in inherit_table:
+                                        raise RuntimeError('Duplicate hybrid inheritance: {0}({1})'.format(structure[index - 1], structure[index]))
+                                    inherit_table[structure[index]] = structure[index - 1]
+        items_replaced = True
+        hybrids = {hybrid: None for hybrid in base_hybrids[:]}
+        while items_replaced is True:
+            items_replaced = False
+            for hybrid, replacement in inherit_table.iteritems():
+                if hybrid in hybrids.keys() and hybrids[hybrid] is None:
+                    hybrids[hybrid] = replacement
+                    items_replaced = True
+                if hybrid in hybrids.values():
+                    for item in hybrids.keys():
+                        if hybrids[item] == hybrid:
+                            hybrids[item] = replacement
+                    items_replaced = True
+        return {hybrid: translation_table[replacement] if replacement is not None else translation_table[hybrid]
+                for hybrid, replacement in hybrids.iteritems()}
 
 
 class Toolbox(object):
@@ -191,6 +251,12 @@ class Toolbox(object):
     Generic class for various methods
     """
 
+    lock_flush_interval = 10
+
+    _lock_counters = {}
+    _lock_counters_lock = Lock()
+    _lock_last_flush = time.time()
+
     @staticmethod
     def try_get(key, fallback):
         """
@@ -251,8 +317,93 @@ class Toolbox(object):
         volatile = VolatileFactory.get_client()
         key = 'ovs_stats_cache_{0}_{1}'.format(cache_type, 'hit' if hit else 'miss')
         try:
-            successfull = volatile.incr(key)
-            if not successfull:
-                volatile.set(key, 1)
+            volatile.incr(key)
         except:
             pass
+
+    @staticmethod
+    def log_lock(lock_type, contended):
+        """
+        Registers whether acquiring a lock of a specific type had to wait for another holder. The registrations
+        are counted in process memory, and periodically added to the statistics in the volatile store
+        """
+        key = 'ovs_stats_lock_{0}_{1}'.format(lock_type, 'contended' if contended else 'uncontended')
+        with Toolbox._lock_counters_lock:
+            Toolbox._lock_counters[key] = Toolbox._lock_counters.get(key, 0) + 1
+            if time.time() - Toolbox._lock_last_flush < Toolbox.lock_flush_interval:
+                return
+            counters = Toolbox._lock_counters
+            Toolbox._lock_counters = {}
+            Toolbox._lock_last_flush = time.time()
+        Toolbox.flush_lock_statistics(counters)
+
+    @staticmethod
+    def flush_lock_statistics(counters=None):
+        """
+        Adds the registered lock counters to the statistics in the volatile store
+        """
+        if counters is None:
+            with Toolbox._lock_counters_lock:
+                counters = Toolbox._lock_counters
+                Toolbox._lock_counters = {}
+                Toolbox._lock_last_flush = time.time()
+        volatile = VolatileFactory.get_client()
+        for key, count in counters.iteritems():
+            try:
+                volatile.incr(key, count)
+            except:
+                pass
+
+
+class LRUCache(object):
+    """
+    A process-local cache with a bounded size, evicting the least recently used entries
+    """
+
+    def __init__(self, size):
+        """
+        Initializes the cache, keeping at most `size` entries
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value for a given key, marking it as recently used
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Sets the value for a given key, evicting the least recently used entry when full
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Removes a given key from the cache
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Empties the cache
+        """
+        with self._lock:
+            self._entries.clear()
@@ -24,8 +24,8 @@ class BearerToken(DataObject):
     """
     The Bearer Token class represents the Bearer tokens used by the API by means of OAuth 2.0
     """
-    __properties = [Property('access_token', str, mandatory=False, doc='Access token'),
-                    Property('refresh_token', str, mandatory=False, doc='Refresh token'),
+    __properties = [Property('access_token', str, mandatory=False, indexed=True, doc='Access token'),
+                    Property('refresh_token', str, mandatory=False, indexed=True, doc='Refresh token'),
                     Property('expiration', int, doc='Expiration timestamp')]
     __relations = [Relation('client', Client, 'tokens')]
     __dynamics = []
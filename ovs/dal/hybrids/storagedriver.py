@@ -33,7 +33,7 @@ class StorageDriver(DataObject):
                     Property('ports', list, doc='Ports on which the Storage Driver is listening [mgmt, xmlrpc, foc].'),
                     Property('cluster_ip', str, doc='IP address on which the Storage Driver is listening.'),
                     Property('storage_ip', str, doc='IP address on which the vpool is shared to hypervisor'),
-                    Property('storagedriver_id', str, doc='ID of the Storage Driver as known by the Storage Drivers.'),
+                    Property('storagedriver_id', str, indexed=True, doc='ID of the Storage Driver as known by the Storage Drivers.'),
                     Property('mountpoint', str, doc='Mountpoint from which the Storage Driver serves data'),
                     Property('mountpoint_temp', str, doc='Mountpoint for temporary workload (scrubbing etc)'),
                     Property('mountpoint_bfs', str, doc='Mountpoint for the backend filesystem (used for local and distributed fs)'),
@@ -20,6 +20,7 @@ from ovs.extensions.storageserver.storagedriver import StorageDriverClient
 from ovs.dal.dataobject import DataObject
 from ovs.dal.structures import Property, Relation, Dynamic
 from ovs.dal.hybrids.pmachine import PMachine
+from ovs.extensions.storage.consistency import Consistency
 
 
 class StorageRouter(DataObject):
@@ -28,7 +29,7 @@ class StorageRouter(DataObject):
     """
     __properties = [Property('name', str, doc='Name of the vMachine.'),
                     Property('description', str, mandatory=False, doc='Description of the vMachine.'),
-                    Property('machine_id', str, mandatory=False, doc='The hardware identifier of the vMachine'),
+                    Property('machine_id', str, mandatory=False, indexed=True, doc='The hardware identifier of the vMachine'),
                     Property('ip', str, doc='IP Address of the vMachine, if available'),
                     Property('heartbeats', dict, default={}, doc='Heartbeat information of various monitors'),
                     Property('node_type', ['MASTER', 'EXTRA'], default='EXTRA', doc='Indicates the node\'s type')]
@@ -40,6 +41,7 @@ class StorageRouter(DataObject):
                   Dynamic('vpools_guids', list, 15),
                   Dynamic('vdisks_guids', list, 15),
                   Dynamic('status', str, 10)]
+    _read_consistency = Consistency.BOUNDED  # Read-mostly, so loads can be served by the local Arakoon node
 
     def _statistics(self):
         """
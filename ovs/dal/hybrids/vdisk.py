@@ -35,10 +35,10 @@ class VDisk(DataObject):
     __properties = [Property('name', str, mandatory=False, doc='Name of the vDisk.'),
                     Property('description', str, mandatory=False, doc='Description of the vDisk.'),
                     Property('size', int, doc='Size of the vDisk in Bytes.'),
-                    Property('devicename', str, doc='The name of the container file (e.g. the VMDK-file) describing the vDisk.'),
+                    Property('devicename', str, indexed=True, doc='The name of the container file (e.g. the VMDK-file) describing the vDisk.'),
                     Property('order', int, mandatory=False, doc='Order with which vDisk is attached to a vMachine. None if not attached to a vMachine.'),
-                    Property('volume_id', str, mandatory=False, doc='ID of the vDisk in the Open vStorage Volume Driver.'),
-                    Property('parentsnapshot', str, mandatory=False, doc='Points to a parent voldrvsnapshotid. None if there is no parent Snapshot'),
+                    Property('volume_id', str, mandatory=False, indexed=True, doc='ID of the vDisk in the Open vStorage Volume Driver.'),
+                    Property('parentsnapshot', str, mandatory=False, indexed=True, doc='Points to a parent voldrvsnapshotid. None if there is no parent Snapshot'),
                     Property('cinder_id', str, mandatory=False, doc='Cinder Volume ID, for volumes managed through Cinder')]
     __relations = [Relation('vmachine', VMachine, 'vdisks', mandatory=False),
                    Relation('vpool', VPool, 'vdisks'),
@@ -34,7 +34,7 @@ class VMachine(DataObject):
     __properties = [Property('name', str, mandatory=False, doc='Name of the vMachine.'),
                     Property('description', str, mandatory=False, doc='Description of the vMachine.'),
                     Property('hypervisor_id', str, mandatory=False, doc='The identifier of the vMachine on the Hypervisor.'),
-                    Property('devicename', str, doc='The name of the container file (e.g. the VMX-file) describing the vMachine.'),
+                    Property('devicename', str, indexed=True, doc='The name of the container file (e.g. the VMX-file) describing the vMachine.'),
                     Property('is_vtemplate', bool, default=False, doc='Indicates whether this vMachine is a vTemplate.'),
                     Property('status', ['OK', 'NOK', 'CREATED', 'SYNC', 'SYNC_NOK'], default='OK', doc='Internal status of the vMachine')]
     __relations = [Relation('pmachine', PMachine, 'vmachines'),
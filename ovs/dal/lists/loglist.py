@@ -35,3 +35,13 @@ class LogList(object):
                          'query': {'type': DataList.where_operator.AND,
                                    'items': []}}).data
         return DataObjectList(logs, Log)
+
+    @staticmethod
+    def iter_logs():
+        """
+        Iterates all Logs, loading them in chunks so all Logs can be walked in constant memory
+        """
+        blueprint = Log()
+        for chunk in DataList.chunks(DataList.iter_pks(blueprint._namespace, blueprint._name), DataList.partsize_objects):
+            for log in Log.load_many(chunk):
+                yield log
@@ -16,7 +16,6 @@
 RelationMapper module
 """
 from ovs.dal.helpers import HybridRunner, Descriptor, Toolbox
-from ovs.extensions.storage.volatilefactory import VolatileFactory
 
 
 class RelationMapper(object):
@@ -25,15 +24,16 @@ class RelationMapper(object):
     of the hybrid objects.
     """
 
+    _relations = {}
+
     @staticmethod
     def load_foreign_relations(object_type):
         """
         This method will return a mapping of all relations towards a certain hybrid object type.
-        The resulting mapping will be stored in volatile storage so it can be fetched faster
+        The resulting mapping is kept in the process as long as the hybrid structure doesn't change
         """
-        relation_key = 'ovs_relations_{0}'.format(object_type.__name__.lower())
-        volatile = VolatileFactory.get_client()
-        relation_info = volatile.get(relation_key)
+        relation_key = object_type.__name__.lower()
+        relation_info = RelationMapper._relations.get(relation_key)
         if relation_info is None:
             Toolbox.log_cache_hit('relations', False)
             relation_info = {}
@@ -54,7 +54,10 @@ class RelationMapper(object):
                         relation_info[relation.foreign_key] = {'class': Descriptor(cls).descriptor,
                                                                'key': relation.name,
                                                                'list': not relation.onetoone}
-            volatile.set(relation_key, relation_info)
+            RelationMapper._relations[relation_key] = relation_info
         else:
             Toolbox.log_cache_hit('relations', True)
         return relation_info
+
+
+HybridRunner.register_invalidation_hook(RelationMapper._relations.clear)
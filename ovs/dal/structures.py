@@ -22,13 +22,15 @@ class Property(object):
     Property
     """
 
-    def __init__(self, name, property_type, mandatory=True, default=None, doc=None):
+    def __init__(self, name, property_type, mandatory=True, default=None, indexed=False, doc=None):
         """
         Initializes a property
+        An indexed property is tracked in a secondary index, so EQUALS/IN queries on it don't require a full scan
         """
         self.name = name
         self.property_type = property_type
         self.default = default
+        self.indexed = indexed
         self.docstring = doc
         self.mandatory = mandatory
 
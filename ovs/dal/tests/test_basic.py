@@ -16,6 +16,7 @@
 """
 Basic test module
 """
+import os
 import uuid
 import time
 from unittest import TestCase
@@ -25,13 +26,17 @@ from ovs.extensions.generic import fakesleep
 from ovs.extensions.storage.persistent.dummystore import DummyPersistentStore
 from ovs.extensions.storage.volatile.dummystore import DummyVolatileStore
 from ovs.extensions.storage.persistentfactory import PersistentFactory
+from ovs.extensions.storage.exceptions import KeyNotFoundException, AssertException
+from ovs.extensions.storage.consistency import Consistency
 from ovs.extensions.storage.volatilefactory import VolatileFactory
 from ovs.dal.hybrids.t_testmachine import TestMachine
 from ovs.dal.hybrids.t_testdisk import TestDisk
 from ovs.dal.hybrids.t_testemachine import TestEMachine
 from ovs.dal.datalist import DataList
-from ovs.dal.helpers import Descriptor
-from ovs.extensions.generic.volatilemutex import VolatileMutex
+from ovs.dal.dataobject import DataObject
+from ovs.dal.unitofwork import UnitOfWork
+from ovs.dal.helpers import Descriptor, HybridRunner, Toolbox
+from ovs.dal.relations import RelationMapper
 
 
 class Basic(TestCase):
@@ -242,6 +247,7 @@ class Basic(TestCase):
         disk = TestDisk()
         disk.name = 'test'
         disk.save()
+        DataObject._object_cache.clear()  # The process-local cache is validated in test_objectcache
         # Right after a save, the cache is invalidated
         disk2 = TestDisk(disk.guid)
         self.assertFalse(disk2._metadata['cache'], 'Object should be retreived from persistent backend')
@@ -250,6 +256,7 @@ class Basic(TestCase):
         self.assertTrue(disk3._metadata['cache'], 'Object should be retreived from cache')
         # After the object expiry passed, it will be retreived from backend again
         DummyVolatileStore().delete(disk._key)  # We clear the entry
+        DataObject._object_cache.clear()
         disk4 = TestDisk(disk.guid)
         self.assertFalse(disk4._metadata['cache'], 'Object should be retreived from persistent backend')
 
@@ -519,6 +526,71 @@ class Basic(TestCase):
             self.assertFalse(list_cache.from_cache, 'List should not be loaded from cache (mode: {0})'.format(key))
             self.assertEqual(list_cache.data, 0, 'List should have no matches (mode: {0})'.format(key))
 
+    def test_listcache_fields(self):
+        """
+        Validates whether cached lists are only invalidated by changes to the fields they depend on
+        """
+        disk = TestDisk()
+        disk.name = 'disk'
+        disk.size = 1
+        disk.save()
+        query = {'object': TestDisk,
+                 'data': DataList.select.COUNT,
+                 'query': {'type': DataList.where_operator.AND,
+                           'items': [('size', DataList.operator.GT, 0)]}}
+        self.assertFalse(DataList(query).from_cache, 'List should not be loaded from cache')
+        self.assertTrue(DataList(query).from_cache, 'List should be loaded from cache')
+        disk.description = 'changed'
+        disk.save()
+        self.assertTrue(DataList(query).from_cache, 'An unrelated change should not invalidate the list')
+        disk.size = 0
+        disk.save()
+        datalist = DataList(query)
+        self.assertFalse(datalist.from_cache, 'A related change should invalidate the list')
+        self.assertEqual(datalist.data, 0, 'The list should be reloaded')
+        VolatileFactory.store.delete(DataList._get_generation_key('testdisk', 'size'))
+        self.assertFalse(DataList(query).from_cache, 'A lost generation should invalidate the list')
+
+    def test_queryplans(self):
+        """
+        Validates whether queries are compiled into plans, executed on raw data where possible
+        """
+        machine = TestMachine()
+        machine.name = 'machine'
+        machine.save()
+        disks = []
+        for i in xrange(0, 5):
+            disk = TestDisk()
+            disk.name = 'disk_{0}'.format(i)
+            disk.size = i
+            if i < 3:
+                disk.machine = machine
+            disk.save()
+            disks.append(disk)
+        load_many = TestDisk.load_many
+        try:
+            TestDisk.load_many = classmethod(lambda cls, guids: self.fail('Objects should not be built'))
+            query = {'object': TestDisk,
+                     'data': DataList.select.GUIDS,
+                     'query': {'type': DataList.where_operator.AND,
+                               'items': [('machine_guid', DataList.operator.EQUALS, machine.guid),
+                                         {'type': DataList.where_operator.OR,
+                                          'items': [('size', DataList.operator.IN, [0, 2]),
+                                                    ('guid', DataList.operator.EQUALS, disks[4].guid)]}]}}
+            self.assertListEqual(sorted(DataList(query).data), sorted([disks[0].guid, disks[2].guid]), 'Raw query should match')
+        finally:
+            TestDisk.load_many = load_many
+        query = {'object': TestDisk,
+                 'data': DataList.select.COUNT,
+                 'query': {'type': DataList.where_operator.AND,
+                           'items': [('machine.name', DataList.operator.IN, [['machine'], 'machine'])]}}
+        self.assertEqual(DataList(query).data, 3, 'Unhashable IN values should be supported')
+        plan = DataList._get_plan(TestDisk, DataList.where_operator.AND, [('used_size', DataList.operator.GT, 0)])
+        self.assertFalse(plan['can_cache'], 'Plans using dynamic properties should not be cached')
+        self.assertFalse(plan['raw'], 'Plans using dynamic properties need the objects')
+        self.assertIs(plan, DataList._get_plan(TestDisk, DataList.where_operator.AND, [('used_size', DataList.operator.GT, 0)]),
+                      'Plans should be compiled once')
+
     def test_emptyquery(self):
         """
         Validates whether an certain query returns an empty set
@@ -651,22 +723,20 @@ class Basic(TestCase):
             print item.name
         self.assertEqual(item.guid, disk.guid, 'The guid should be available')
 
-    def test_volatiemutex(self):
+    def test_lockstatistics(self):
         """
-        Validates the volatile mutex
+        Validates whether lock contention is counted in memory, and only periodically stored
         """
-        mutex = VolatileMutex('test')
-        mutex.acquire()
-        mutex.acquire()  # Should not raise errors
-        mutex.release()
-        mutex.release()  # Should not raise errors
-        mutex._volatile.add(mutex.key(), 1, 10)
-        with self.assertRaises(RuntimeError):
-            mutex.acquire(wait=1)
-        mutex._volatile.delete(mutex.key())
-        mutex.acquire()
-        time.sleep(0.5)
-        mutex.release()
+        key = 'ovs_stats_lock_test_contended'
+        Toolbox.flush_lock_statistics()
+        for _ in xrange(3):
+            Toolbox.log_lock('test', True)
+        self.assertIsNone(VolatileFactory.store.get(key), 'Contention should be counted in memory')
+        Toolbox.flush_lock_statistics()
+        self.assertEqual(VolatileFactory.store.get(key), 3, 'Contention should be stored when flushed')
+        Toolbox._lock_last_flush -= Toolbox.lock_flush_interval
+        Toolbox.log_lock('test', True)
+        self.assertEqual(VolatileFactory.store.get(key), 4, 'Contention should be stored periodically')
 
     def test_typesafety(self):
         """
@@ -935,6 +1005,50 @@ class Basic(TestCase):
         self.assertEqual(len(disks), 1, 'One disk should be found ({0})'.format(len(disks)))
         _ = disk_z  # Ignore this object not being used
 
+    def test_list_build_during_invalidation(self):
+        """
+        Validates whether a list built while a save invalidates the lists doesn't cache the outdated object
+        """
+        def query(name):
+            """
+            Returns the guids of the disks with a given name
+            """
+            return DataList({'object': TestDisk,
+                             'data': DataList.select.GUIDS,
+                             'query': {'type': DataList.where_operator.AND,
+                                       'items': [('name', DataList.operator.EQUALS, name)]}}).data
+
+        def inject_update(datalist_object):
+            """
+            Updates an object
+            """
+            _ = datalist_object
+            del DataList.test_hooks['post_query']
+            disk.name = 'x'
+            disk.save()
+
+        def invalidate_lists(class_name, fields):
+            """
+            Builds (and caches) a list right after the generations changed
+            """
+            invalidate(class_name, fields)
+            built.append(query('x'))
+
+        disk = TestDisk()
+        disk.name = 'test'
+        disk.save()
+        self.assertListEqual(query('x'), [], 'No disk should be found')
+        built = []
+        invalidate = DataList.invalidate_lists
+        DataList.test_hooks['post_query'] = inject_update
+        try:
+            DataList.invalidate_lists = staticmethod(invalidate_lists)
+            self.assertListEqual(query('test'), [disk.guid], 'The disk should be found under its old name')
+        finally:
+            DataList.invalidate_lists = staticmethod(invalidate)
+        self.assertListEqual(built, [[disk.guid]], 'The list built during the invalidation should contain the saved disk')
+        self.assertListEqual(query('x'), [disk.guid], 'The cached list should contain the saved disk')
+
     def test_guid_query(self):
         """
         Validates whether queries can use the _guid fields
@@ -1153,6 +1267,382 @@ class Basic(TestCase):
         with self.assertRaises(InvalidRelationException):
             _ = machine.one
 
+    def test_indexedquery(self):
+        """
+        Validates whether queries on indexed properties are answered by the secondary index
+        """
+        disk1 = TestDisk()
+        disk1.name = 'disk1'
+        disk1.save()
+        disk2 = TestDisk()
+        disk2.name = 'disk2'
+        disk2.save()
+        query = {'object': TestDisk,
+                 'data': DataList.select.GUIDS,
+                 'query': {'type': DataList.where_operator.OR,
+                           'items': [('name', DataList.operator.EQUALS, 'disk1'),
+                                     ('name', DataList.operator.IN, ['disk2', 'disk3'])]}}
+        self.assertListEqual(sorted(DataList(query).data), sorted([disk1.guid, disk2.guid]), 'Both disks should be found')
+        # Once the index is built, the query should no longer scan all objects
+        iter_pks = DataList.iter_pks
+        try:
+            DataList.iter_pks = staticmethod(lambda namespace, name: self.fail('No full scan should be executed'))
+            disk2.name = 'disk3'
+            disk2.save()
+            data = DataList({'object': TestDisk,
+                             'data': DataList.select.GUIDS,
+                             'query': {'type': DataList.where_operator.AND,
+                                       'items': [('name', DataList.operator.EQUALS, 'disk3')]}}).data
+            self.assertListEqual(data, [disk2.guid], 'Renamed disk should be found')
+            data = DataList({'object': TestDisk,
+                             'data': DataList.select.GUIDS,
+                             'query': {'type': DataList.where_operator.AND,
+                                       'items': [('name', DataList.operator.EQUALS, 'disk2')]}}).data
+            self.assertListEqual(data, [], 'No disk should be found under its old name')
+        finally:
+            DataList.iter_pks = staticmethod(iter_pks)
+        self.assertListEqual(list(DataList.get_index_guids('testdisk', 'name', 'disk3')), [disk2.guid], 'Index should be updated')
+        disk2.delete()
+        self.assertEqual(len(DataList.get_index_guids('testdisk', 'name', 'disk3')), 0, 'Index should be cleaned')
+
+    def test_load_many(self):
+        """
+        Validates whether objects can be loaded in bulk
+        """
+        guids = []
+        for i in xrange(0, 5):
+            disk = TestDisk()
+            disk.name = 'disk_{0}'.format(i)
+            disk.save()
+            guids.append(disk.guid)
+        VolatileFactory.store.delete('ovs_data_testdisk_{0}'.format(guids[0]))
+        missing_guid = str(uuid.uuid4())
+        disks = TestDisk.load_many([guids[3], missing_guid] + guids[:3])
+        self.assertListEqual([disk.guid for disk in disks], [guids[3]] + guids[:3], 'Existing disks should be loaded in order')
+        self.assertListEqual([disk.name for disk in disks], ['disk_3', 'disk_0', 'disk_1', 'disk_2'], 'Disks should contain their data')
+        disks[0].name = 'disk_x'
+        disks[0].save()
+        self.assertEqual(TestDisk(guids[3]).name, 'disk_x', 'Bulk loaded disks should be saveable')
+
+    def test_objectcache(self):
+        """
+        Validates whether the process-local object cache is used and invalidated correctly
+        """
+        disk = TestDisk()
+        disk.name = 'disk'
+        disk.save()
+        VolatileFactory.store.delete(disk._key)
+        disk2 = TestDisk(disk.guid)
+        self.assertTrue(disk2._metadata['cache'], 'Object should be retreived from the process-local cache')
+        self.assertEqual(disk2.name, 'disk', 'Object should contain the saved data')
+        disk2.name = 'changed'
+        self.assertEqual(TestDisk(disk.guid).name, 'disk', 'Unsaved changes should not leak into the cache')
+        # A save by another process bumps the version, invalidating the cached entry
+        data = PersistentFactory.store.get(disk._key)
+        data['name'] = 'external'
+        data['_version'] += 1
+        PersistentFactory.store.set(disk._key, data)
+        VolatileFactory.store.set(disk._version_key, data['_version'])
+        disk3 = TestDisk(disk.guid)
+        self.assertFalse(disk3._metadata['cache'], 'Object should be retreived from persistent backend')
+        self.assertEqual(disk3.name, 'external', 'Object should contain the externally saved data')
+        self.assertEqual(TestDisk.load_many([disk.guid])[0].name, 'external', 'Bulk loads should use the valid cache')
+        disk3.delete()
+        self.assertRaises(ObjectNotFoundException, TestDisk, disk.guid)
+
+    def test_reverseindex(self):
+        """
+        Validates whether relations are loaded from the persistent reverse index, without scanning all objects
+        """
+        machine = TestMachine()
+        machine.name = 'machine'
+        machine.save()
+        machine2 = TestMachine()
+        machine2.name = 'machine2'
+        machine2.save()
+        disks = []
+        for i in xrange(0, 3):
+            disk = TestDisk()
+            disk.name = 'disk_{0}'.format(i)
+            disk.machine = machine
+            disk.save()
+            disks.append(disk)
+        # Simulate indexes that were never persisted, requiring a single build
+        for key in PersistentFactory.store.prefix('{0}_'.format(DataList.reverseindexlink), max_elements=-1):
+            PersistentFactory.store.delete(key)
+        VolatileFactory.store.delete('ovs_reverseindex_testmachine_{0}'.format(machine.guid))
+        self.assertListEqual(sorted(machine.disks_guids), sorted(disk.guid for disk in disks), 'Index should be built')
+        iter_pks = DataList.iter_pks
+        try:
+            DataList.iter_pks = staticmethod(lambda namespace, name: self.fail('No full scan should be executed'))
+            disks[0].machine = machine2
+            disks[0].save()
+            VolatileFactory.store.delete('ovs_reverseindex_testmachine_{0}'.format(machine.guid))
+            VolatileFactory.store.delete('ovs_reverseindex_testmachine_{0}'.format(machine2.guid))
+            self.assertListEqual(sorted(TestMachine(machine.guid).disks_guids), sorted([disks[1].guid, disks[2].guid]), 'Moved disk should be removed')
+            self.assertListEqual(TestMachine(machine2.guid).disks_guids, [disks[0].guid], 'Moved disk should be added')
+        finally:
+            DataList.iter_pks = staticmethod(iter_pks)
+        disks[1].delete()
+        VolatileFactory.store.delete('ovs_reverseindex_testmachine_{0}'.format(machine.guid))
+        self.assertListEqual(TestMachine(machine.guid).disks_guids, [disks[2].guid], 'Deleted disk should be removed')
+
+    def test_failedindexbuild(self):
+        """
+        Validates whether an index is not marked complete when writing part of it failed
+        """
+        disk = TestDisk()
+        disk.name = 'disk'
+        disk.save()
+        query = {'object': TestDisk,
+                 'data': DataList.select.GUIDS,
+                 'query': {'type': DataList.where_operator.AND,
+                           'items': [('name', DataList.operator.EQUALS, 'disk')]}}
+        state_key = '{0}_testdisk_name'.format(DataList.indexstate)
+
+        def _execute_batch(operations):
+            for _, _, result in operations:
+                result.set_exception(RuntimeError('Write failed'))
+
+        persistent = PersistentFactory.store
+        persistent._execute_batch = _execute_batch
+        try:
+            self.assertRaises(RuntimeError, lambda: DataList(query).data)
+        finally:
+            del persistent._execute_batch
+        self.assertFalse(persistent.exists(state_key), 'The index should not be marked complete')
+        self.assertNotEqual(VolatileFactory.store.get(state_key), True, 'The index should not be marked complete')
+        self.assertListEqual(DataList(query).data, [disk.guid], 'The index should be built on the next query')
+        self.assertTrue(persistent.get(state_key), 'The index should be marked complete')
+
+    def test_transactions(self):
+        """
+        Validates whether persistent transactions are applied atomically and assert the values read in them
+        """
+        persistent = PersistentFactory.get_client()
+        persistent.set('key_1', {'value': 1})
+        transaction = persistent.begin_transaction()
+        self.assertDictEqual(persistent.get('key_1', transaction=transaction), {'value': 1}, 'Value should be read')
+        with self.assertRaises(KeyNotFoundException):
+            persistent.get('key_2', transaction=transaction)
+        persistent.set('key_1', {'value': 2}, transaction=transaction)
+        persistent.set('key_2', {'value': 2}, transaction=transaction)
+        persistent.delete('key_3', transaction=transaction)
+        self.assertDictEqual(persistent.get('key_1'), {'value': 1}, 'Transaction should not be applied yet')
+        persistent.apply_transaction(transaction)
+        self.assertDictEqual(persistent.get('key_1'), {'value': 2}, 'Transaction should be applied')
+        self.assertDictEqual(persistent.get('key_2'), {'value': 2}, 'Transaction should be applied')
+        transaction = persistent.begin_transaction()
+        persistent.get('key_1', transaction=transaction)
+        persistent.delete('key_2', transaction=transaction)
+        persistent.set('key_1', {'value': 3})
+        with self.assertRaises(AssertException):
+            persistent.apply_transaction(transaction)
+        self.assertDictEqual(persistent.get('key_2'), {'value': 2}, 'A failed transaction should not be applied')
+        disk = TestDisk()
+        disk.name = 'disk'
+        disk.save()
+        disk2 = TestDisk(disk.guid)
+        disk2.name = 'disk2'
+        disk2.save()
+        disk.description = 'changed'
+        disk.save()
+        self.assertEqual(disk.name, 'disk2', 'A save should merge externally saved data')
+        self.assertEqual(disk._data['_version'], 3, 'Version should be 3')
+
+    def test_unitofwork(self):
+        """
+        Validates whether a unit of work saves all its objects at once
+        """
+        machine = TestMachine()
+        machine.name = 'machine'
+        machine.save()
+        self.assertEqual(len(machine.disks), 0, 'There should be no disks yet')
+        disks = DataList({'object': TestDisk,
+                          'data': DataList.select.GUIDS,
+                          'query': {'type': DataList.where_operator.AND,
+                                    'items': [('size', DataList.operator.GT, 1)]}}).data
+        self.assertEqual(len(disks), 0, 'There should be no disks yet')
+        with UnitOfWork() as uow:
+            for i in xrange(0, 3):
+                disk = TestDisk()
+                disk.name = 'disk_{0}'.format(i)
+                disk.size = i
+                disk.machine = machine
+                uow.save(disk)
+            machine.name = 'machine_x'
+            uow.save(machine)
+            self.assertEqual(len(DataList.get_pks(disk._namespace, disk._name)), 0, 'Nothing should be saved yet')
+        self.assertEqual(len(TestMachine(machine.guid).disks), 3, 'All disks should be saved')
+        self.assertEqual(TestMachine(machine.guid).name, 'machine_x', 'The machine should be saved')
+        disks = DataList({'object': TestDisk,
+                          'data': DataList.select.GUIDS,
+                          'query': {'type': DataList.where_operator.AND,
+                                    'items': [('size', DataList.operator.GT, 1)]}}).data
+        self.assertEqual(len(disks), 1, 'Cached lists should be invalidated')
+        disk = TestDisk()
+        disk.name = 'disk_3'
+        disk.machine = machine
+        disk2 = TestDisk()
+        with self.assertRaises(MissingMandatoryFieldsException):
+            with UnitOfWork() as uow:
+                uow.save(disk)
+                uow.save(disk2)
+        self.assertEqual(len(TestMachine(machine.guid).disks), 3, 'No disk should be saved if one of them fails')
+
+    def test_typeinfo(self):
+        """
+        Validates whether the type information is built once and the object data is still copied
+        """
+        disk = TestDisk()
+        disk.name = 'disk'
+        disk.save()
+        type_info = DataObject._type_info[TestDisk]
+        disk = TestDisk(disk.guid)
+        self.assertIs(DataObject._type_info[TestDisk], type_info, 'The type information should be reused')
+        self.assertIn('machine', type_info['relation_descriptors'], 'The relation descriptors should be known')
+        self.assertIsNot(disk._data['machine'], disk._original['machine'], 'Relation data should be copied')
+        data = {'a': [1, {'b': set([2])}], 'c': 'd'}
+        copied = DataObject._copy_data(data)
+        self.assertDictEqual(copied, data, 'The copied data should be equal')
+        copied['a'][1]['b'].add(3)
+        self.assertEqual(data['a'][1]['b'], set([2]), 'Nested containers should be copied')
+
+    def test_hybridregistry(self):
+        """
+        Validates whether the hybrid registry is kept in the process until the hybrid files change
+        """
+        hybrid_structure = HybridRunner.get_hybrids()
+        self.assertIs(HybridRunner.get_hybrids(), hybrid_structure, 'The hybrid structure should be reused')
+        RelationMapper.load_foreign_relations(TestMachine)
+        self.assertIn('testmachine', RelationMapper._relations, 'The relations should be cached')
+        HybridRunner.refresh()
+        self.assertIs(HybridRunner.get_hybrids(), hybrid_structure, 'The registry should only be checked periodically')
+        HybridRunner._fingerprint = []
+        HybridRunner._last_check = 0
+        HybridRunner.refresh()
+        self.assertNotIn('testmachine', RelationMapper._relations, 'The relations should be invalidated')
+        self.assertDictEqual(DataObject._type_info, {}, 'The type information should be invalidated')
+        self.assertIsNot(HybridRunner.get_hybrids(), hybrid_structure, 'The hybrid structure should be rebuilt')
+        self.assertDictEqual(HybridRunner.get_hybrids(), hybrid_structure, 'The rebuilt structure should be equal')
+        machine = TestMachine()
+        machine.name = 'machine'
+        machine.save()
+        self.assertEqual(len(TestMachine(machine.guid).disks), 0, 'Objects should work after invalidation')
+
+    def test_volatileupdates(self):
+        """
+        Validates the atomic update primitives of the volatile store
+        """
+        volatile = VolatileFactory.get_client()
+        volatile.incr('ovs_counter')
+        volatile.incr('ovs_counter', 2)
+        self.assertEqual(volatile.get('ovs_counter'), 3, 'Counters should be created when incremented')
+        value = volatile.update('ovs_list', lambda items: items + [1], [])
+        self.assertListEqual(value, [1], 'The default should be used for new keys')
+        volatile.update('ovs_list', lambda items: items + [2], [])
+        self.assertListEqual(volatile.get('ovs_list'), [1, 2], 'The updated value should be stored')
+        self.assertIsNone(volatile.update('ovs_list', lambda items: None), 'Returning None should skip the update')
+        self.assertListEqual(volatile.get('ovs_list'), [1, 2], 'Nothing should be stored when skipping the update')
+        volatile.delete_multi(['ovs_counter', 'ovs_list', 'ovs_unknown'])
+        self.assertDictEqual(volatile.get_multi(['ovs_counter', 'ovs_list']), {}, 'All keys should be deleted')
+
+    def test_prefixiteration(self):
+        """
+        Validates whether keys can be iterated page by page
+        """
+        persistent = PersistentFactory.get_client()
+        keys = ['ovs_pages_{0:03d}'.format(i) for i in xrange(25)]
+        for key in keys:
+            persistent.set(key, 0)
+        persistent.set('ovs_pagesx', 0)
+        self.assertListEqual(list(persistent.iter_prefix('ovs_pages_', page_size=10)), keys, 'All keys should be found in order')
+        self.assertListEqual(list(persistent.iter_prefix('ovs_pages_', page_size=5)), keys, 'Full last pages should be handled')
+        self.assertListEqual(list(persistent.iter_prefix('ovs_nopages_')), [], 'No keys should be found')
+        for key in persistent.iter_prefix('ovs_pages', page_size=10):
+            persistent.delete(key)
+        self.assertListEqual(persistent.prefix('ovs_pages'), [], 'Keys can be deleted while iterating')
+        disk = TestDisk()
+        disk.name = 'disk'
+        disk.save()
+        self.assertListEqual(list(DataList.iter_pks(disk._namespace, disk._name)), [disk.guid], 'The primary key should be found')
+        disk.delete()
+
+    def test_batch(self):
+        """
+        Validates whether independent operations can be batched
+        """
+        persistent = PersistentFactory.get_client()
+        persistent.set('ovs_batch_existing', 1)
+        with persistent.batch() as batch:
+            existing = batch.get('ovs_batch_existing')
+            missing = batch.get('ovs_batch_missing')
+            batch.set('ovs_batch_new', 2)
+            exists = batch.exists('ovs_batch_new')
+            delete = batch.delete('ovs_batch_missing')
+            self.assertFalse(existing.done(), 'The batch should only be executed when the context is left')
+        self.assertEqual(existing.result(), 1, 'The existing key should be loaded')
+        self.assertRaises(KeyNotFoundException, missing.result)
+        self.assertTrue(exists.result(), 'Operations should be executed in order')
+        self.assertRaises(KeyNotFoundException, delete.result)
+        self.assertEqual(persistent.get('ovs_batch_new'), 2, 'The new key should be set')
+        try:
+            with persistent.batch() as batch:
+                batch.set('ovs_batch_failed', 3)
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+        self.assertFalse(persistent.exists('ovs_batch_failed'), 'A batch should not be executed on exceptions')
+
+    def test_dummysnapshots(self):
+        """
+        Validates whether the dummy stores can be saved to and restored from disk
+        """
+        persistent = PersistentFactory.get_client()
+        volatile = VolatileFactory.get_client()
+        persistent.set('ovs_snapshot', {'value': [1, 2]})
+        volatile.set('ovs_snapshot', 1)
+        value = persistent.get('ovs_snapshot')
+        value['value'].append(3)
+        self.assertDictEqual(persistent.get('ovs_snapshot'), {'value': [1, 2]}, 'Loaded values should be copies')
+        path = '/tmp/ovs_test_snapshot_{0}.json'.format(uuid.uuid4())
+        try:
+            persistent.snapshot(path)
+            volatile.snapshot(path + '.volatile')
+            persistent.clean()
+            volatile.clean()
+            self.assertFalse(persistent.exists('ovs_snapshot'), 'The persistent store should be empty')
+            self.assertIsNone(volatile.get('ovs_snapshot'), 'The volatile store should be empty')
+            persistent.restore(path)
+            volatile.restore(path + '.volatile')
+        finally:
+            for filename in [path, path + '.volatile']:
+                if os.path.exists(filename):
+                    os.remove(filename)
+        self.assertDictEqual(persistent.get('ovs_snapshot'), {'value': [1, 2]}, 'The persistent data should be restored')
+        self.assertEqual(volatile.get('ovs_snapshot'), 1, 'The volatile data should be restored')
+
+    def test_readconsistency(self):
+        """
+        Validates whether objects can be loaded with a consistency hint
+        """
+        volatile = VolatileFactory.get_client()
+        persistent = PersistentFactory.get_client()
+        disk = TestDisk()
+        disk.name = 'disk'
+        disk.save()
+        self.assertEqual(persistent.get(disk._key, consistency=Consistency.DIRTY)['name'], 'disk', 'Hints should be accepted')
+        DataObject._object_cache.clear()
+        volatile.delete(disk._key)
+        self.assertEqual(TestDisk(disk.guid, consistency=Consistency.DIRTY).name, 'disk', 'Disk should be loaded')
+        self.assertIsNone(volatile.get(disk._key), 'Dirty reads should not be cached')
+        self.assertEqual(len(TestDisk.load_many([disk.guid], consistency=Consistency.DIRTY)), 1, 'Disk should be loaded')
+        self.assertIsNone(volatile.get(disk._key), 'Dirty bulk reads should not be cached')
+        DataObject._object_cache.clear()
+        self.assertEqual(TestDisk(disk.guid).name, 'disk', 'Disk should be loaded')
+        self.assertIsNotNone(volatile.get(disk._key), 'Consistent reads should be cached')
+        disk.delete()
+
 if __name__ == '__main__':
     import unittest
     suite = unittest.TestLoader().loadTestsFromTestCase(Basic)
@@ -0,0 +1,112 @@
+#!/usr/bin/python2
+#  Copyright 2015 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Serializer performance unittest module
+"""
+import sys
+import time
+import uuid
+from unittest import TestCase
+from ovs.extensions.storage.serializers import Serializer, JSONCodec, MarshalCodec, PickleCodec
+
+
+class SerializerPerformance(TestCase):
+    """
+    Compares the serialized size and the CPU time of the store codecs on values as the DAL stores them
+    """
+
+    @staticmethod
+    def _vdisk(snapshots):
+        """
+        Returns the stored data of a vDisk, with its cached info and a given amount of snapshots
+        """
+        guid = str(uuid.uuid4())
+        info = {'volume_id': guid,
+                'namespace': 'ns-{0}'.format(guid),
+                'parent_namespace': '',
+                'parent_snapshot': '',
+                'volume_size': 53687091200,
+                'lba_size': 512,
+                'lba_count': 104857600,
+                'cluster_multiplier': 8,
+                'sco_multiplier': 1024,
+                'failover_mode': 'OK_SYNC',
+                'failover_ip': '10.100.1.2',
+                'failover_port': 26203,
+                'halted': False,
+                'footprint': 2147483648,
+                'stored': 1073741824,
+                'object_type': 'BASE',
+                'owner_tag': 3,
+                'vrouter_id': 'jhJs8nmt2dXQZrdl',
+                'cluster_cache_hits': 4398046,
+                'cluster_cache_misses': 10995,
+                'metadata_backend_config': [{'ip': '10.100.1.{0}'.format(i), 'port': 26300 + i} for i in xrange(3)]}
+        return {'_version': 42,
+                'name': 'vdisk_{0}'.format(guid[:8]),
+                'description': 'vdisk_{0}'.format(guid[:8]),
+                'size': 53687091200.0,
+                'devicename': '/vm/vdisk_{0}-flat.vmdk'.format(guid[:8]),
+                'order': 0,
+                'volume_id': guid,
+                'parentsnapshot': None,
+                'cinder_id': None,
+                'info': info,
+                'snapshots': [{'guid': str(uuid.uuid4()),
+                               'timestamp': str(1420070400 + i * 3600),
+                               'label': 'Automatic snapshot',
+                               'is_consistent': i % 2 == 0,
+                               'is_automatic': True,
+                               'stored': 104857600 + i} for i in xrange(snapshots)],
+                'vmachine': {'type': 'VMachine', 'guid': str(uuid.uuid4())},
+                'vpool': {'type': 'VPool', 'guid': str(uuid.uuid4())},
+                'parent_vdisk': {'type': 'VDisk', 'guid': None}}
+
+    def test_serializers(self):
+        """
+        Reports the serialized size and the dumps/loads CPU time of every codec
+        """
+        if getattr(SerializerPerformance, 'iterations', None) is None:
+            SerializerPerformance.iterations = 1000
+        iterations = int(SerializerPerformance.iterations)
+        payloads = [('vdisk', SerializerPerformance._vdisk(0)),
+                    ('vdisk, 50 snapshots', SerializerPerformance._vdisk(50)),
+                    ('reverse index', [str(uuid.uuid4()) for _ in xrange(500)])]
+        print ''
+        for name, value in payloads:
+            print '{0}:'.format(name)
+            for codec in [JSONCodec, MarshalCodec, PickleCodec]:
+                serializer = Serializer(codec)
+                data = serializer.dumps(value)
+                self.assertEqual(serializer.loads(data), value, 'Data should survive a roundtrip with {0}'.format(codec.__name__))
+                start = time.clock()
+                for _ in xrange(iterations):
+                    serializer.dumps(value)
+                dumps = (time.clock() - start) / iterations
+                start = time.clock()
+                for _ in xrange(iterations):
+                    serializer.loads(data)
+                loads = (time.clock() - start) / iterations
+                print '* {0}: {1} bytes, dumps {2} us, loads {3} us'.format(codec.__name__.ljust(12), str(len(data)).rjust(6),
+                                                                          str(round(dumps * 1000000, 1)).rjust(7),
+                                                                          str(round(loads * 1000000, 1)).rjust(7))
+
+if __name__ == '__main__':
+    import unittest
+    if len(sys.argv) > 1:
+        SerializerPerformance.iterations = float(sys.argv[1])
+    suite = unittest.TestLoader().loadTestsFromTestCase(SerializerPerformance)
+    unittest.TextTestRunner(verbosity=2).run(suite)
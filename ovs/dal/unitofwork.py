@@ -0,0 +1,90 @@
+# Copyright 2014 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+UnitOfWork module
+"""
+from ovs.dal.dataobject import DataObject
+from ovs.dal.exceptions import SaveRaceConditionException, VolatileObjectException
+from ovs.extensions.storage.persistentfactory import PersistentFactory
+
+
+class UnitOfWork(object):
+    """
+    The UnitOfWork collects objects to be saved, and saves them all at once in a single persistent
+    transaction with a single list cache invalidation pass:
+    > with UnitOfWork() as uow:
+    >     uow.save(vmachine)
+    >     uow.save(vdisk)
+    The objects are saved when the context is left without exceptions. If any of the objects can't be
+    saved, none of them are.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty unit of work
+        """
+        self._objects = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _ = exc_value, traceback
+        if exc_type is None:
+            self.flush()
+        else:
+            self._objects = []
+
+    def save(self, obj):
+        """
+        Registers an object to be saved when the unit of work is flushed
+        """
+        if obj.volatile is True:
+            raise VolatileObjectException()
+        if not any(item is obj for item in self._objects):
+            self._objects.append(obj)
+
+    def flush(self):
+        """
+        Saves all registered objects
+        """
+        objects = self._objects
+        self._objects = []
+        if len(objects) == 0:
+            return
+
+        persistent = PersistentFactory.get_client()
+        tries = 0
+        successful = False
+        while successful is False:
+            transaction = persistent.begin_transaction()
+            changes = {}
+            saved_data = []
+            for obj in objects:
+                obj._check_mandatory_fields()
+                data, changed_fields = obj._prepare_save(transaction)
+                if obj._name not in changes:
+                    changes[obj._name] = []
+                changes[obj._name].append((obj._new, changed_fields))
+                saved_data.append(data)
+            successful = DataObject._apply_save(transaction)
+            if successful is False:
+                tries += 1
+                if tries > 5:
+                    raise SaveRaceConditionException()
+
+        for obj, data in zip(objects, saved_data):
+            obj._finish_save(data)
+        DataObject._invalidate_lists(changes)
@@ -55,13 +55,99 @@ def dump(src, length=8):
 random.seed ( time.time() )
 
 
+class ArakoonMasterCache :
+    """
+    Process-wide cache of the master of each cluster, shared by all clients. When a client notices the
+    master moved, it invalidates the entry, so all other clients re-discover the master as well instead
+    of each running into the old master first. Only one client per cluster re-discovers at a time.
+    """
+
+    _masters = {}
+    _locks = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get( clusterId ):
+        return ArakoonMasterCache._masters.get( clusterId )
+
+    @staticmethod
+    def set( clusterId, masterId ):
+        ArakoonMasterCache._masters[ clusterId ] = masterId
+
+    @staticmethod
+    def invalidate( clusterId, masterId ):
+        """
+        Removes the cached master, if it's still the given (failed) master
+        """
+        with ArakoonMasterCache._lock :
+            if ArakoonMasterCache._masters.get( clusterId ) == masterId :
+                del ArakoonMasterCache._masters[ clusterId ]
+
+    @staticmethod
+    def discoveryLock( clusterId ):
+        with ArakoonMasterCache._lock :
+            if clusterId not in ArakoonMasterCache._locks :
+                ArakoonMasterCache._locks[ clusterId ] = threading.Lock()
+            return ArakoonMasterCache._locks[ clusterId ]
+
+
+class ArakoonNodeBreaker :
+    """
+    Process-wide circuit breakers per node. After a number of consecutive connection failures a node is
+    skipped for a cooldown period (doubling on each failed probe), so calls fail over immediately instead of
+    waiting on connection timeouts. After the cooldown, a single call probes whether the node is back.
+    """
+
+    failureThreshold = 3
+    cooldown = 0.5
+    maxCooldown = 30.0
+
+    _nodes = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def allow( clusterId, nodeId ):
+        with ArakoonNodeBreaker._lock :
+            state = ArakoonNodeBreaker._nodes.get( (clusterId, nodeId) )
+            if state is None or state['openUntil'] is None :
+                return True
+            if time.time() < state['openUntil'] :
+                return False
+            # Half open: let this call probe the node, keeping the others out during the next cooldown
+            state['openUntil'] = time.time() + state['cooldown']
+            return True
+
+    @staticmethod
+    def success( clusterId, nodeId ):
+        with ArakoonNodeBreaker._lock :
+            ArakoonNodeBreaker._nodes.pop( (clusterId, nodeId), None )
+
+    @staticmethod
+    def failure( clusterId, nodeId ):
+        with ArakoonNodeBreaker._lock :
+            state = ArakoonNodeBreaker._nodes.setdefault( (clusterId, nodeId),
+                                                          {'failures': 0,
+                                                           'openUntil': None,
+                                                           'cooldown': ArakoonNodeBreaker.cooldown} )
+            state['failures'] += 1
+            if state['openUntil'] is not None :
+                state['cooldown'] = min( state['cooldown'] * 2, ArakoonNodeBreaker.maxCooldown )
+                state['openUntil'] = time.time() + state['cooldown']
+            elif state['failures'] >= ArakoonNodeBreaker.failureThreshold :
+                state['openUntil'] = time.time() + state['cooldown']
+
+    @staticmethod
+    def isOpen( clusterId, nodeId ):
+        state = ArakoonNodeBreaker._nodes.get( (clusterId, nodeId) )
+        return state is not None and state['openUntil'] is not None and time.time() < state['openUntil']
+
+
 def retryDuringMasterReelection (is_read_only = False):
     def wrap(f):
         @wraps(f)
         def retrying_f (self,*args,**kwargs):
             start = time.time()
-            tryCount = 0.0
-            backoffPeriod = 0.2
+            tryCount = 0
             callSucceeded = False
             retryPeriod = ArakoonClientConfig.getNoMasterRetryPeriod ()
             deadline = start + retryPeriod
@@ -70,17 +156,22 @@ def retryDuringMasterReelection (is_read_only = False):
                     retVal = f(self,*args,**kwargs)
                     callSucceeded = True
                 except (ArakoonNoMaster, ArakoonNodeNotMaster, ArakoonSocketException, ArakoonNotConnected, ArakoonGoingDown) as ex:
+                    if self._consistency.isDirty() :
+                        # Relaxed reads don't depend on the master: let the caller fall back instead of waiting
+                        raise
                     if not is_read_only and \
                        isinstance(ex, (ArakoonSocketException, ArakoonGoingDown)):
                         raise
                     if len( self._config.getNodes().keys()) == 0 :
                         raise ArakoonInvalidConfig( "Empty client configuration" )
+                    if self._masterId is not None :
+                        ArakoonMasterCache.invalidate( self._config.getClusterId(), self._masterId )
                     self._masterId = None
                     self.dropConnections()
-                    sleepPeriod = backoffPeriod * tryCount
+                    sleepPeriod = ArakoonClientConfig.getRetryBackoff( tryCount )
                     if time.time() + sleepPeriod > deadline :
                         raise
-                    tryCount += 1.0
+                    tryCount += 1
                     ArakoonClientLogger.logWarning( "Master not found (%s). Retrying in %0.2f sec." % (ex, sleepPeriod) )
                     time.sleep( sleepPeriod )
             return retVal
@@ -88,7 +179,98 @@ def retryDuringMasterReelection (is_read_only = False):
         return retrying_f
     return wrap
 
-     
+
+class ArakoonFuture :
+    """
+    The result of a pipelined request, available once the pipeline is executed
+    """
+
+    def __init__(self):
+        self._done = False
+        self._value = None
+        self._exception = None
+
+    def _setResult(self, value):
+        self._done = True
+        self._value = value
+        self._exception = None
+
+    def _setException(self, exception):
+        self._done = True
+        self._value = None
+        self._exception = exception
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        """
+        Returns the request's result, or raises the exception the request failed with
+        """
+        if not self._done :
+            raise ArakoonException( "The pipeline was not executed yet" )
+        if self._exception is not None :
+            raise self._exception
+        return self._value
+
+
+class ArakoonPipeline :
+    """
+    Collects requests to be sent to the master in a single write. The responses are read in order when the
+    pipeline is executed, so a batch of independent requests costs a single round trip. Each request returns
+    an ArakoonFuture holding its result (or the exception it failed with). Reads are always consistent.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._requests = []
+
+    def _add(self, msg, decoder):
+        future = ArakoonFuture()
+        self._requests.append( (msg, decoder, future) )
+        return future
+
+    @SignatureValidator( 'string' )
+    def get(self, key):
+        return self._add( ArakoonProtocol.encodeGet( key, Consistent() ), 'decodeStringResult' )
+
+    def multiGetOption(self, keys):
+        return self._add( ArakoonProtocol.encodeMultiGetOption( keys, Consistent() ), 'decodeStringOptionArrayResult' )
+
+    @SignatureValidator( 'string' )
+    def exists(self, key):
+        return self._add( ArakoonProtocol.encodeExists( key, Consistent() ), 'decodeBoolResult' )
+
+    @SignatureValidator( 'string', 'int' )
+    def prefix(self, keyPrefix, maxElements = 1000):
+        return self._add( ArakoonProtocol.encodePrefixKeys( keyPrefix, maxElements, Consistent() ), 'decodeStringListResult' )
+
+    @SignatureValidator( 'string', 'string' )
+    def set(self, key, value):
+        return self._add( ArakoonProtocol.encodeSet( key, value ), 'decodeVoidResult' )
+
+    @SignatureValidator( 'string' )
+    def delete(self, key):
+        return self._add( ArakoonProtocol.encodeDelete( key ), 'decodeVoidResult' )
+
+    @SignatureValidator( 'sequence', 'bool' )
+    def sequence(self, seq, sync = False):
+        return self._add( ArakoonProtocol.encodeSequence( seq, sync ), 'decodeVoidResult' )
+
+    def __len__(self):
+        return len( self._requests )
+
+    def execute(self):
+        """
+        Sends all collected requests and reads their responses. Returns the futures of the requests, in order
+        """
+        requests = self._requests
+        self._requests = []
+        if len( requests ) > 0 :
+            self._client._executePipeline( requests )
+        return [ future for _, _, future in requests ]
+
+
 class ArakoonClient :
 
     def __init__ (self, config=None):
@@ -110,6 +292,8 @@ class ArakoonClient :
         self._masterId = None
         self._connections = dict()
         self._consistency = Consistent()
+        self._connectTimeout = ArakoonClientConfig.getConnectionTimeout()
+        self._readTimeout = ArakoonClientConfig.getConnectionTimeout()
         nodeList = self._config.getNodes().keys()
         if len(nodeList) == 0:
             raise ArakoonInvalidConfig("Node list empty.")
@@ -138,6 +322,18 @@ class ArakoonClient :
         """
         self._consistency = c
 
+    def setTimeouts(self, connectTimeout=None, readTimeout=None):
+        """
+        Sets the timeouts (in seconds) for connecting to a node and for waiting on a node's response,
+        applying to subsequent calls. None keeps the current timeout.
+        """
+        if connectTimeout is not None :
+            self._connectTimeout = connectTimeout
+        if readTimeout is not None :
+            self._readTimeout = readTimeout
+        for connection in self._connections.values() :
+            connection.setTimeouts( self._connectTimeout, self._readTimeout )
+
     def _initialize(self, config ):
         self._config = config
 
@@ -408,6 +604,35 @@ class ArakoonClient :
         """
         return Sequence()
 
+    def makePipeline(self):
+        """
+        Factory method for pipelines, sending a batch of requests in a single round trip
+        """
+        return ArakoonPipeline( self )
+
+    @retryDuringMasterReelection()
+    def _executePipeline(self, requests):
+        """
+        Sends the given pipelined requests to the master, and decodes their responses into their futures.
+        When the first response already fails (e.g. the node is no longer master), the whole pipeline is
+        retried. When the connection breaks halfway, all outstanding requests fail.
+        """
+        conn = self._sendToMaster( ''.join( msg for msg, _, _ in requests ) )
+        for index, (_, decoder, future) in enumerate( requests ) :
+            try :
+                future._setResult( getattr( conn, decoder )() )
+            except (ArakoonSocketException, ArakoonNodeNotMaster, ArakoonNodeNoLongerMaster) as ex :
+                if index == 0 :
+                    raise
+                future._setException( ex )
+                if isinstance( ex, ArakoonSocketException ) :
+                    conn.close()
+                    for _, _, outstanding in requests[index + 1:] :
+                        outstanding._setException( ex )
+                    return
+            except ArakoonException as ex :
+                future._setException( ex )
+
     @utils.update_argspec('self', 'key')
     @retryDuringMasterReelection()
     @SignatureValidator( 'string' )
@@ -669,12 +894,25 @@ class ArakoonClient :
             del self._connections[ key ]
 
     def _determineMaster(self):
+        clusterId = self._config.getClusterId()
+        self._masterId = ArakoonMasterCache.get( clusterId )
+        if self._masterId is None:
+            # Only one client re-discovers the master, the others wait for (and use) its result
+            with ArakoonMasterCache.discoveryLock( clusterId ) :
+                self._masterId = ArakoonMasterCache.get( clusterId )
+                if self._masterId is None:
+                    self._discoverMaster()
+                    ArakoonMasterCache.set( clusterId, self._masterId )
+
+    def _discoverMaster(self):
         nodeIds = []
 
         if self._masterId is None:
-            # Prepare to ask random nodes who is master
+            # Prepare to ask random nodes who is master, asking nodes with an open circuit breaker last
+            clusterId = self._config.getClusterId()
             nodeIds = self._config.getNodes().keys()
             random.shuffle( nodeIds )
+            nodeIds.sort( key = lambda nodeId: not ArakoonNodeBreaker.isOpen( clusterId, nodeId ) )
 
             while self._masterId is None and len(nodeIds) > 0 :
                 node = nodeIds.pop()
@@ -734,6 +972,11 @@ class ArakoonClient :
     def _sendMessage(self, nodeId, msgBuffer, tryCount = -1):
 
         result = None
+        clusterId = self._config.getClusterId()
+
+        if not ArakoonNodeBreaker.allow( clusterId, nodeId ) :
+            # The node failed repeatedly, fail fast instead of waiting on a connection timeout
+            raise ArakoonNotConnected( self._config.getNodeLocations( nodeId ) )
 
         if tryCount == -1 :
             tryCount = self._config.getTryCount()
@@ -741,8 +984,7 @@ class ArakoonClient :
         for i in range(tryCount) :
 
             if i > 0:
-                maxSleep = i * ArakoonClientConfig.getBackoffInterval()
-                self._sleep( random.randint(0, maxSleep) )
+                self._sleep( ArakoonClientConfig.getRetryBackoff( i - 1 ) )
 
             with self.__lock :
 
@@ -753,6 +995,7 @@ class ArakoonClient :
                     # Message sent correctly, return client connection so result
                     # can be read
                     result = connection
+                    ArakoonNodeBreaker.success( clusterId, nodeId )
                     break
 
                 except Exception, ex:
@@ -761,8 +1004,11 @@ class ArakoonClient :
                                                     ex.__class__.__name__, ex )
 
                     # Get rid of the connection in case of an exception
-                    self._connections[nodeId].close()
-                    del self._connections[ nodeId ]
+                    ArakoonNodeBreaker.failure( clusterId, nodeId )
+                    if nodeId in self._connections :
+                        self._connections[nodeId].close()
+                        del self._connections[ nodeId ]
+                    ArakoonMasterCache.invalidate( clusterId, nodeId )
                     self._masterId = None
 
         if result is None:
@@ -781,7 +1027,7 @@ class ArakoonClient :
             nodeLocations = self._config.getNodeLocations( nodeId )
             clusterId = self._config.getClusterId()
             connection = ArakoonClientConnection ( nodeLocations , clusterId,
-                self._config)
+                self._config, self._connectTimeout, self._readTimeout)
             self._connections[ nodeId ] = connection
 
         return connection
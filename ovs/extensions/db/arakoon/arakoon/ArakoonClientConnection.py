@@ -23,7 +23,7 @@ from ArakoonExceptions import *
 
 class ArakoonClientConnection :
 
-    def __init__ (self, nodeLocations, clusterId, config):
+    def __init__ (self, nodeLocations, clusterId, config, connectTimeout = None, readTimeout = None):
         self._clusterId = clusterId
         self._nodeIPs = nodeLocations[0]
         self._nodePort = nodeLocations[1]
@@ -33,6 +33,15 @@ class ArakoonClientConnection :
         self._socket = None
         self._socketInfo = None
         self._config = config
+        self._connectTimeout = connectTimeout
+        self._readTimeout = readTimeout
+        if connectTimeout is None :
+            self._connectTimeout = ArakoonClientConfig.getConnectionTimeout()
+        if readTimeout is None :
+            self._readTimeout = ArakoonClientConfig.getConnectionTimeout()
+        self._readBuffer = bytearray( ARA_CFG_READ_BUFFER_SIZE )
+        self._readStart = 0
+        self._readEnd = 0
         self._reconnect()
 
     def _reconnect(self):
@@ -40,7 +49,8 @@ class ArakoonClientConnection :
         try :
             ip = self._nodeIPs[self._index]
             sock = socket.create_connection((ip , self._nodePort),
-                                                    ArakoonClientConfig.getConnectionTimeout())
+                                                    self._connectTimeout)
+            sock.settimeout( self._readTimeout )
 
             if self._config.tls:
                 kwargs = {
@@ -74,6 +84,16 @@ class ArakoonClientConnection :
             self._index = (self._index + 1) % self._nIPs
 
 
+    def setTimeouts(self, connectTimeout, readTimeout):
+        """
+        Sets the timeout for (re)connecting, and the timeout for waiting on data from the node
+        """
+        self._connectTimeout = connectTimeout
+        if readTimeout != self._readTimeout :
+            self._readTimeout = readTimeout
+            if self._connected and self._socket is not None :
+                self._socket.settimeout( readTimeout )
+
     def send(self, msg):
 
         if not self._connected :
@@ -97,6 +117,8 @@ class ArakoonClientConnection :
                     self._nodeIPs[self._index], self._nodePort, ex.__class__.__name__, ex  )
             self._socketInfo = None
             self._connected = False
+        self._readStart = 0
+        self._readEnd = 0
 
     def decodeStringResult(self) :
         return ArakoonProtocol.decodeStringResult ( self )
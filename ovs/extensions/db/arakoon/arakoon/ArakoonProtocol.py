@@ -27,8 +27,9 @@ import os.path
 import ssl
 import struct
 import logging
-import select
+import socket
 import operator
+import random
 import cStringIO
 import types
 
@@ -38,6 +39,9 @@ ARA_CFG_TRY_CNT = 1
 ARA_CFG_CONN_TIMEOUT = 60
 ARA_CFG_CONN_BACKOFF = 5
 ARA_CFG_NO_MASTER_RETRY = 60
+ARA_CFG_RETRY_BACKOFF_MIN = 0.01
+ARA_CFG_RETRY_BACKOFF_MAX = 0.5
+ARA_CFG_READ_BUFFER_SIZE = 65536
 
 class ArakoonClientConfig :
 
@@ -204,6 +208,20 @@ class ArakoonClientConfig :
         """
         return ARA_CFG_CONN_BACKOFF
 
+    @staticmethod
+    def getRetryBackoff(attempt):
+        """
+        Retrieves a jittered time to wait before retrying a call that failed a given number of times
+
+        The wait is random, up to an exponentially growing (but sub-second) maximum, so clients
+        retrying at the same time (e.g. during a master re-election) spread out.
+        Can be controlled by changing the global variables L{ARA_CFG_RETRY_BACKOFF_MIN} and L{ARA_CFG_RETRY_BACKOFF_MAX}
+
+        @rtype: float
+        @return: The time to wait in seconds
+        """
+        return random.uniform( 0, min( ARA_CFG_RETRY_BACKOFF_MAX, ARA_CFG_RETRY_BACKOFF_MIN * 2 ** attempt ) )
+
     def getClusterId(self):
         return self._clusterId
 
@@ -351,46 +369,34 @@ def sendPrologue(socket, clusterId):
     p += _packString(clusterId)
     socket.sendall(p)
 
-def _readExactNBytes( con, n ):
-
+def _fillBuffer( con, n ):
+    """
+    Makes sure at least n unread bytes are available in the connection's read buffer. Data is received
+    straight into the (reused) buffer, reading ahead as much as the buffer can hold. The buffer only grows
+    as large as a single read needs, and is shrunk to its default size again afterwards
+    """
     if not con._connected :
         raise ArakoonSockRecvClosed()
-    bytesRemaining = n
-    tmpResult = ""
-    timeout = ArakoonClientConfig.getConnectionTimeout()
-
-    if isinstance(con._socket, ssl.SSLSocket):
-        s = con._socket
-        pending = s.pending()
-        if pending > 0:
-            tmpResult = s.recv(min(n, pending))
-            bytesRemaining = bytesRemaining - len(tmpResult)
-
-    while bytesRemaining > 0 :
-
-        tripleList = select.select(  [con._socket] , [] , [] , timeout )
-
-        if ( len ( tripleList [0]) != 0 ) :
-            newChunk = ""
-            try :
-                newChunk =  tripleList [0][0].recv ( bytesRemaining)
-            except Exception, ex:
-                ArakoonClientLogger.logError ("Error while receiving from socket. %s: '%s'" % (ex.__class__.__name__, ex) )
-                con._connected = False
-                raise ArakoonSockRecvError()
-
-            newChunkSize = len( newChunk )
-            if newChunkSize == 0 :
-                try:
-                    con._socket.close()
-                except Exception, ex:
-                    ArakoonClientLogger.logError( "Error while closing socket. %s: %s" % (ex.__class__.__name__,ex))
-                con._connected = False
-                raise ArakoonSockReadNoBytes ()
-            tmpResult = tmpResult + newChunk
-            bytesRemaining = bytesRemaining - newChunkSize
-
+    available = con._readEnd - con._readStart
+    if available >= n :
+        return
+    buf = con._readBuffer
+    if len( buf ) - con._readStart < n :
+        # Not enough room after the unread data: move it to the front, resizing the buffer if needed
+        size = max( n, ARA_CFG_READ_BUFFER_SIZE )
+        if len( buf ) < n or len( buf ) > size :
+            newBuf = bytearray( size )
         else :
+            newBuf = buf
+        newBuf[0:available] = buf[con._readStart:con._readEnd]
+        con._readBuffer = buf = newBuf
+        con._readStart = 0
+        con._readEnd = available
+    view = memoryview( buf )
+    while con._readEnd - con._readStart < n :
+        try :
+            received = con._socket.recv_into( view[con._readEnd:] )
+        except socket.timeout :
             msg = str(con._socketInfo)
             try:
                 con._socket.close()
@@ -398,13 +404,47 @@ def _readExactNBytes( con, n ):
                 ArakoonClientLogger.logError( "Error while closing socket. %s: %s" % (ex.__class__.__name__,ex))
             con._connected = False
             raise ArakoonSockNotReadable(msg = msg)
+        except Exception, ex:
+            ArakoonClientLogger.logError ("Error while receiving from socket. %s: '%s'" % (ex.__class__.__name__, ex) )
+            con._connected = False
+            raise ArakoonSockRecvError()
+        if received == 0 :
+            try:
+                con._socket.close()
+            except Exception, ex:
+                ArakoonClientLogger.logError( "Error while closing socket. %s: %s" % (ex.__class__.__name__,ex))
+            con._connected = False
+            raise ArakoonSockReadNoBytes ()
+        con._readEnd += received
 
-    return tmpResult
+def _readExactNBytes( con, n ):
+    _fillBuffer( con, n )
+    start = con._readStart
+    con._readStart = start + n
+    result = memoryview( con._readBuffer )[start:start + n].tobytes()
+    if con._readStart == con._readEnd and len( con._readBuffer ) > ARA_CFG_READ_BUFFER_SIZE :
+        # Don't keep the memory of a large read around once it's consumed
+        con._readBuffer = bytearray( ARA_CFG_READ_BUFFER_SIZE )
+        con._readStart = 0
+        con._readEnd = 0
+    return result
 
 def _recvString ( con ):
     strLength = _recvInt( con )
-    buf = _readExactNBytes( con, strLength)
-    return struct.unpack( "%ds" % strLength, buf ) [0]
+    return _readExactNBytes( con, strLength )
+
+def _recvStrings ( con, count ):
+    """
+    Receives a given number of length-prefixed strings
+    """
+    result = []
+    append = result.append
+    for i in xrange( count ) :
+        _fillBuffer( con, ARA_TYPE_INT_SIZE )
+        strLength = struct.unpack_from( "I", con._readBuffer, con._readStart )[0]
+        con._readStart += ARA_TYPE_INT_SIZE
+        append( _readExactNBytes( con, strLength ) )
+    return result
 
 def _unpackInt(buf, offset):
     r=struct.unpack_from( "I", buf,offset)
@@ -460,8 +500,9 @@ def _unpackNamedField(buf, offset):
     raise ArakoonException("Cannot decode named field %s. Invalid type: %d" % (name,type) )
 
 def _recvInt ( con ):
-    buf = _readExactNBytes ( con, ARA_TYPE_INT_SIZE )
-    i,o2 = _unpackInt(buf,0)
+    _fillBuffer( con, ARA_TYPE_INT_SIZE )
+    i = struct.unpack_from( "I", con._readBuffer, con._readStart )[0]
+    con._readStart += ARA_TYPE_INT_SIZE
     return i
 
 def _recvInt64 ( con ):
@@ -828,20 +869,15 @@ class ArakoonProtocol :
         retVal = []
 
         arraySize = _recvInt( con )
-
-        for i in xrange( arraySize ) :
-            retVal[:0] = [ _recvString( con ) ]
+        retVal = _recvStrings( con, arraySize )
+        retVal.reverse()
         return retVal
 
     @staticmethod
     def decodeStringArrayResult(con):
         ArakoonProtocol._evaluateErrorCode(con)
-        retVal = []
         size = _recvInt(con)
-        for i in xrange(size):
-            s = _recvString(con)
-            retVal.append(s)
-        return retVal
+        return _recvStrings(con, size)
 
 
     @staticmethod
@@ -901,12 +937,9 @@ class ArakoonProtocol :
         result = []
 
         size = _recvInt( con )
-
-        for i in range(size):
-            k = _recvString ( con )
-            v = _recvString ( con )
-            result [:0] = [(k, v)]
-
+        items = _recvStrings( con, 2 * size )
+        result = zip( items[0::2], items[1::2] )
+        result.reverse()
         return result
 
     @staticmethod
@@ -0,0 +1,133 @@
+# Copyright 2015 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import struct
+import time
+from ovs.extensions.db.arakoon.arakoon.Arakoon import ArakoonClient, ArakoonMasterCache, ArakoonNodeBreaker
+from ovs.extensions.db.arakoon.arakoon.ArakoonClientConnection import ArakoonClientConnection
+from ovs.extensions.db.arakoon.arakoon.ArakoonProtocol import ArakoonClientConfig, ArakoonProtocol
+from ovs.extensions.db.arakoon.arakoon.ArakoonExceptions import ArakoonNotConnected, ArakoonNotFound, ArakoonSockReadNoBytes
+from unittest import TestCase
+
+
+class Connection(ArakoonClientConnection):
+    """
+    Connection reading from one end of a socket pair
+    """
+
+    def __init__(self, sock):
+        self._socket = sock
+        self._socketInfo = None
+        self._connected = True
+        self._readBuffer = bytearray(16)
+        self._readStart = 0
+        self._readEnd = 0
+
+
+class TestArakoonClient(TestCase):
+
+    def setUp(self):
+        ArakoonMasterCache._masters.clear()
+        ArakoonNodeBreaker._nodes.clear()
+
+    tearDown = setUp
+
+    @staticmethod
+    def _closed_port():
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def test_retrybackoff(self):
+        for attempt in xrange(20):
+            backoff = ArakoonClientConfig.getRetryBackoff(attempt)
+            self.assertTrue(0 <= backoff <= 0.5, 'Backoff should be sub-second ({0})'.format(backoff))
+        self.assertTrue(ArakoonClientConfig.getRetryBackoff(0) <= 0.01, 'The first retry should be almost immediate')
+
+    def test_mastercache(self):
+        ArakoonMasterCache.set('cluster', 'node_1')
+        ArakoonMasterCache.invalidate('cluster', 'node_2')
+        self.assertEqual(ArakoonMasterCache.get('cluster'), 'node_1', 'Another node failing should not invalidate the master')
+        ArakoonMasterCache.invalidate('cluster', 'node_1')
+        self.assertIsNone(ArakoonMasterCache.get('cluster'), 'The failed master should be invalidated')
+
+    def test_breaker(self):
+        cooldown = ArakoonNodeBreaker.cooldown
+        try:
+            ArakoonNodeBreaker.cooldown = 0.1
+            for _ in xrange(ArakoonNodeBreaker.failureThreshold - 1):
+                ArakoonNodeBreaker.failure('cluster', 'node')
+            self.assertTrue(ArakoonNodeBreaker.allow('cluster', 'node'), 'A few failures should not open the breaker')
+            ArakoonNodeBreaker.failure('cluster', 'node')
+            self.assertFalse(ArakoonNodeBreaker.allow('cluster', 'node'), 'The breaker should be open')
+            time.sleep(0.15)
+            self.assertTrue(ArakoonNodeBreaker.allow('cluster', 'node'), 'A single probe should be allowed after the cooldown')
+            self.assertFalse(ArakoonNodeBreaker.allow('cluster', 'node'), 'Only a single probe should be allowed')
+            ArakoonNodeBreaker.failure('cluster', 'node')
+            self.assertEqual(ArakoonNodeBreaker._nodes[('cluster', 'node')]['cooldown'], 0.2, 'The cooldown should double')
+            ArakoonNodeBreaker.success('cluster', 'node')
+            self.assertTrue(ArakoonNodeBreaker.allow('cluster', 'node'), 'The breaker should be closed')
+        finally:
+            ArakoonNodeBreaker.cooldown = cooldown
+
+    def test_failfast(self):
+        client = ArakoonClient(ArakoonClientConfig('cluster', {'node_1': (['127.0.0.1'], TestArakoonClient._closed_port())}))
+        client.setTimeouts(connectTimeout=1, readTimeout=1)
+        ArakoonMasterCache.set('cluster', 'node_1')
+        for _ in xrange(ArakoonNodeBreaker.failureThreshold):
+            self.assertRaises(ArakoonNotConnected, client._sendMessage, 'node_1', ArakoonProtocol.encodeWhoMaster())
+        self.assertIsNone(ArakoonMasterCache.get('cluster'), 'The unreachable master should be invalidated')
+        self.assertTrue(ArakoonNodeBreaker.isOpen('cluster', 'node_1'), 'The breaker should be open')
+        start = time.time()
+        self.assertRaises(ArakoonNotConnected, client._sendMessage, 'node_1', ArakoonProtocol.encodeWhoMaster())
+        self.assertLess(time.time() - start, 0.1, 'An open breaker should fail fast')
+
+    def test_pipeline(self):
+        client = ArakoonClient(ArakoonClientConfig('cluster', {'node_1': (['127.0.0.1'], TestArakoonClient._closed_port())}))
+        reader, writer = socket.socketpair()
+        reader.settimeout(5)
+        connection = Connection(reader)
+        messages = []
+        client._sendToMaster = lambda msg: messages.append(msg) or connection
+        try:
+            writer.sendall(struct.pack('II', 0, 5) + 'value' +         # get
+                           struct.pack('II', 5, 3) + 'key' +           # get of a missing key
+                           struct.pack('I', 0) +                       # set
+                           struct.pack('IB', 0, 1))                    # exists
+            pipeline = client.makePipeline()
+            get = pipeline.get('key_1')
+            missing = pipeline.get('key_2')
+            pipeline.set('key_3', 'value')
+            exists = pipeline.exists('key_3')
+            self.assertEqual(len(pipeline.execute()), 4, 'All futures should be returned')
+            self.assertEqual(len(messages), 1, 'All requests should be sent at once')
+            self.assertEqual(messages[0], ArakoonProtocol.encodeGet('key_1', client._consistency) +
+                                          ArakoonProtocol.encodeGet('key_2', client._consistency) +
+                                          ArakoonProtocol.encodeSet('key_3', 'value') +
+                                          ArakoonProtocol.encodeExists('key_3', client._consistency), 'Requests should be sent in order')
+            self.assertEqual(get.result(), 'value', 'The value should be decoded')
+            self.assertRaises(ArakoonNotFound, missing.result)
+            self.assertTrue(exists.result(), 'Later responses should still be decoded')
+            writer.sendall(struct.pack('II', 0, 5) + 'value')
+            writer.close()
+            first, second, third = pipeline.get('key_1'), pipeline.get('key_2'), pipeline.get('key_3')
+            pipeline.execute()
+            self.assertEqual(first.result(), 'value', 'The first response should be decoded')
+            self.assertRaises(ArakoonSockReadNoBytes, second.result)
+            self.assertRaises(ArakoonSockReadNoBytes, third.result)
+        finally:
+            reader.close()
@@ -0,0 +1,89 @@
+# Copyright 2015 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import struct
+import threading
+from ovs.extensions.db.arakoon.arakoon.ArakoonProtocol import ArakoonProtocol, ARA_CFG_READ_BUFFER_SIZE
+from ovs.extensions.db.arakoon.arakoon.ArakoonExceptions import ArakoonSockReadNoBytes
+from unittest import TestCase
+
+
+class Connection(object):
+    """
+    Minimal connection, reading from one end of a socket pair
+    """
+
+    def __init__(self, sock, buffer_size):
+        self._socket = sock
+        self._socketInfo = None
+        self._connected = True
+        self._readBuffer = bytearray(buffer_size)
+        self._readStart = 0
+        self._readEnd = 0
+
+
+class TestArakoonProtocol(TestCase):
+
+    @staticmethod
+    def _encode_strings(strings):
+        data = struct.pack('I', 0) + struct.pack('I', len(strings))
+        for item in strings:
+            data += struct.pack('I', len(item)) + item
+        return data
+
+    def _decode(self, data, decoder, buffer_size=16):
+        reader, writer = socket.socketpair()
+        reader.settimeout(5)
+        sender = threading.Thread(target=lambda: (writer.sendall(data), writer.close()))
+        sender.start()
+        try:
+            connection = Connection(reader, buffer_size)
+            return decoder(connection), connection
+        finally:
+            sender.join()
+            reader.close()
+
+    def test_stringlists(self):
+        strings = ['key_{0}'.format(i) * (i % 7) for i in xrange(10000)] + ['x' * 100000]
+        result, _ = self._decode(TestArakoonProtocol._encode_strings(strings), ArakoonProtocol.decodeStringArrayResult)
+        self.assertListEqual(result, strings)
+        result, _ = self._decode(TestArakoonProtocol._encode_strings(strings), ArakoonProtocol.decodeStringListResult)
+        self.assertListEqual(result, list(reversed(strings)))
+        result, _ = self._decode(TestArakoonProtocol._encode_strings(['k1', 'v1', 'k2', 'v2'])[:4] +
+                                 struct.pack('I', 2) + TestArakoonProtocol._encode_strings(['k1', 'v1', 'k2', 'v2'])[8:],
+                                 ArakoonProtocol.decodeStringPairListResult)
+        self.assertListEqual(result, [('k2', 'v2'), ('k1', 'v1')])
+
+    def test_consecutive_results(self):
+        data = struct.pack('I', 0) + struct.pack('I', 3) + 'abc' + struct.pack('I', 0) + struct.pack('q', 42)
+        connection = []
+
+        def _decode(con):
+            connection.append(con)
+            return ArakoonProtocol.decodeStringResult(con), ArakoonProtocol.decodeInt64Result(con)
+        result, _ = self._decode(data, _decode)
+        self.assertEqual(result, ('abc', 42))
+        self.assertEqual(connection[0]._readStart, connection[0]._readEnd, 'All data should be consumed')
+
+    def test_large_read(self):
+        value = 'x' * (10 * ARA_CFG_READ_BUFFER_SIZE)
+        data = struct.pack('I', 0) + struct.pack('I', len(value)) + value
+        result, connection = self._decode(data, ArakoonProtocol.decodeStringResult, ARA_CFG_READ_BUFFER_SIZE)
+        self.assertEqual(result, value)
+        self.assertEqual(len(connection._readBuffer), ARA_CFG_READ_BUFFER_SIZE, 'The buffer should shrink after a large read')
+
+    def test_closed_connection(self):
+        with self.assertRaises(ArakoonSockReadNoBytes):
+            self._decode(struct.pack('I', 0) + struct.pack('I', 10) + 'abc', ArakoonProtocol.decodeStringResult)
@@ -15,6 +15,7 @@
 import time
 from subprocess import check_output
 from ovs.dal.lists.storagerouterlist import StorageRouterList
+from ovs.dal.unitofwork import UnitOfWork
 from ovs.extensions.generic.system import System
 from ovs.plugin.provider.configuration import Configuration
 
@@ -28,16 +29,17 @@ amqp = '{0}://{1}:{2}@{3}//'.format(Configuration.get('ovs.core.broker.protocol'
 
 worker_states = check_output("/usr/local/bin/celery inspect ping -b {0} 2> /dev/null | grep OK | perl -pe 's/\x1b\[[0-9;]*m//g' || true".format(amqp), shell=True)
 routers = StorageRouterList.get_storagerouters()
-for node in routers:
-    if node.heartbeats is None:
-        node.heartbeats = {}
-    if 'celery@{0}: OK'.format(node.name) in worker_states:
-        node.heartbeats['celery'] = current_time
-    if node.machine_id == machine_id:
-        node.heartbeats['process'] = current_time
-    else:
-        # check timeout of other nodes and clear arp cache
-        if node.heartbeats and 'process' in node.heartbeats:
-            if current_time - node.heartbeats['process'] >= ARP_TIMEOUT:
-                check_output("/usr/sbin/arp -d {0}".format(node.name), shell=True)
-    node.save()
+with UnitOfWork() as uow:
+    for node in routers:
+        if node.heartbeats is None:
+            node.heartbeats = {}
+        if 'celery@{0}: OK'.format(node.name) in worker_states:
+            node.heartbeats['celery'] = current_time
+        if node.machine_id == machine_id:
+            node.heartbeats['process'] = current_time
+        else:
+            # check timeout of other nodes and clear arp cache
+            if node.heartbeats and 'process' in node.heartbeats:
+                if current_time - node.heartbeats['process'] >= ARP_TIMEOUT:
+                    check_output("/usr/sbin/arp -d {0}".format(node.name), shell=True)
+        uow.save(node)
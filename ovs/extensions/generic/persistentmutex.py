@@ -0,0 +1,256 @@
+# Copyright 2014 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Persistent mutex module
+"""
+
+import os
+import time
+import uuid
+import random
+import socket
+from threading import Thread, Event
+
+from ovs.extensions.storage.exceptions import KeyNotFoundException, AssertException
+from ovs.extensions.storage.persistentfactory import PersistentFactory
+from ovs.log.logHandler import LogHandler
+
+logger = LogHandler('extensions', 'persistent mutex')
+
+
+class PersistentMutex(object):
+    """
+    This is a distributed mutex stored in the persistent store, to be used for long critical sections
+    (e.g. sections calling the hypervisor). The lock state is updated using transactions, so it survives
+    volatile store restarts.
+    * The lock is leased for `lease` seconds. While held, a heartbeat thread renews the lease, so the
+      lock is only lost when the holder dies (or can't reach the persistent store anymore)
+    * Waiters queue up, and the lock is handed out in order of arrival
+    * Every acquisition gets a fencing token (`fence`), increasing for every acquisition of the same lock.
+      As free locks are removed, a new lock starts from the current time in milliseconds
+    The lock's lease and queue are based on timestamps, so the nodes' clocks should be in sync.
+    """
+
+    lease = 60
+    queue_timeout = 10
+    backoff_min = 0.01
+    backoff_max = 1
+
+    def __init__(self, name, wait=None, lease=None, heartbeat=True):
+        """
+        Creates a persistent mutex object
+        """
+        self._persistent = PersistentFactory.get_client()
+        self.name = name
+        self._wait = wait
+        self._lease = PersistentMutex.lease if lease is None else lease
+        self._heartbeat = heartbeat
+        self._heartbeat_thread = None
+        self._stop_heartbeat = None
+        self._has_lock = False
+        self._start = 0
+        self._owner = None
+        self.fence = None
+        self.contended = False
+
+    def __call__(self, wait):
+        self._wait = wait
+        return self
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        _ = args, kwargs
+        self.release()
+
+    def acquire(self, wait=None):
+        """
+        Aquire a lock on the mutex, optionally given a maximum wait timeout
+        """
+        if self._has_lock:
+            return True
+        self._start = time.time()
+        if wait is None:
+            wait = self._wait
+        self.contended = False
+        owner = '{0}_{1}_{2}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+        backoff = PersistentMutex.backoff_min
+        while True:
+            now = time.time()
+            fence = self._update(lambda state: PersistentMutex._try_acquire(state, owner, now, self._lease))
+            if fence is not None:
+                break
+            self.contended = True
+            passed = time.time() - self._start
+            if wait is not None and passed > wait:
+                self._update(lambda state: PersistentMutex._dequeue(state, owner))
+                logger.error('Lock for {0} could not be aquired. {1} sec > {2} sec'.format(self.key(), passed, wait))
+                raise RuntimeError('Could not aquire lock %s' % self.key())
+            delay = random.uniform(backoff / 2, backoff)
+            if wait is not None:
+                delay = min(delay, max(wait - passed, 0) + PersistentMutex.backoff_min)
+            time.sleep(delay)
+            backoff = min(backoff * 2, PersistentMutex.backoff_max)
+        passed = time.time() - self._start
+        if passed > 1:
+            logger.warning('Waited {0} sec for lock {1}'.format(passed, self.key()))
+        self.fence = fence
+        self._owner = owner
+        self._start = time.time()
+        self._has_lock = True
+        if self._heartbeat is True:
+            self._stop_heartbeat = Event()
+            self._heartbeat_thread = Thread(target=self._renew_periodically, args=(self._stop_heartbeat,),
+                                            name='persistentmutex_{0}'.format(self.name))
+            self._heartbeat_thread.daemon = True
+            self._heartbeat_thread.start()
+        return True
+
+    def renew(self):
+        """
+        Renews the lease of the lock. Returns False if the lock is no longer owned
+        """
+        if not self._has_lock:
+            return False
+        owner = self._owner
+        now = time.time()
+        renewed = self._update(lambda state: PersistentMutex._renew(state, owner, now, self._lease))
+        if renewed is False:
+            logger.warning('The lock on {0} was lost before it could be renewed'.format(self.key()))
+        return renewed
+
+    def release(self):
+        """
+        Releases the lock
+        """
+        if self._has_lock:
+            if self._stop_heartbeat is not None:
+                self._stop_heartbeat.set()
+                self._stop_heartbeat = None
+                self._heartbeat_thread = None
+            owner = self._owner
+            released = self._update(lambda state: PersistentMutex._release(state, owner))
+            if released is False:
+                logger.warning('The lock on {0} expired while it was held'.format(self.key()))
+            self._has_lock = False
+
+    def key(self):
+        """
+        Lock key
+        """
+        return 'ovs_persistentlock_%s' % self.name
+
+    def _renew_periodically(self, stop):
+        """
+        Renews the lease until the lock is released
+        """
+        while not stop.wait(self._lease / 3.0):
+            try:
+                self.renew()
+            except Exception as exception:
+                logger.warning('Could not renew the lock on {0}: {1}'.format(self.key(), exception))
+
+    def _update(self, function):
+        """
+        Applies a given function on the lock state in a transaction, retrying on concurrent changes.
+        The function returns a tuple of its result and the new state (None if nothing should be written)
+        """
+        while True:
+            transaction = self._persistent.begin_transaction()
+            try:
+                state = self._persistent.get(self.key(), transaction)
+            except KeyNotFoundException:
+                state = {'owner': None,
+                         'expires': 0,
+                         'fence': 0,
+                         'queue': []}
+            result, new_state = function(state)
+            if new_state is None:
+                return result
+            if new_state['owner'] is None and len(new_state['queue']) == 0:
+                # A free lock without waiters is removed, so locks on short-lived names don't pile up
+                self._persistent.delete(self.key(), transaction)
+            else:
+                self._persistent.set(self.key(), new_state, transaction)
+            try:
+                self._persistent.apply_transaction(transaction)
+                return result
+            except AssertException:
+                pass
+
+    @staticmethod
+    def _try_acquire(state, owner, now, lease):
+        """
+        Takes the lock if it's free and the owner is first in line, otherwise (re)registers the owner in the queue.
+        Returns the fencing token if the lock was taken
+        """
+        queue = [waiter for waiter in state['queue'] if waiter[1] > now]
+        waiters = [waiter[0] for waiter in queue]
+        if (state['owner'] is None or state['expires'] < now) and (len(queue) == 0 or waiters[0] == owner):
+            state.update({'owner': owner,
+                          'expires': now + lease,
+                          'fence': max(state['fence'] + 1, int(now * 1000)),
+                          'queue': queue[1:]})
+            return state['fence'], state
+        timeout = PersistentMutex.queue_timeout
+        if owner in waiters:
+            waiter = queue[waiters.index(owner)]
+            if waiter[1] - now > timeout / 2.0 and len(queue) == len(state['queue']):
+                return None, None  # Nothing changed
+            waiter[1] = now + timeout
+        else:
+            queue.append([owner, now + timeout])
+        state['queue'] = queue
+        return None, state
+
+    @staticmethod
+    def _dequeue(state, owner):
+        """
+        Removes the owner from the queue
+        """
+        queue = [waiter for waiter in state['queue'] if waiter[0] != owner]
+        if len(queue) == len(state['queue']):
+            return None, None
+        state['queue'] = queue
+        return None, state
+
+    @staticmethod
+    def _renew(state, owner, now, lease):
+        """
+        Extends the lease if the lock is still owned
+        """
+        if state['owner'] != owner:
+            return False, None
+        state['expires'] = now + lease
+        return True, state
+
+    @staticmethod
+    def _release(state, owner):
+        """
+        Frees the lock if it's still owned
+        """
+        if state['owner'] != owner:
+            return False, None
+        state.update({'owner': None,
+                      'expires': 0})
+        return True, state
+
+    def __del__(self):
+        """
+        __del__ hook, releasing the lock
+        """
+        self.release()
@@ -0,0 +1,172 @@
+# Copyright 2015 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Mutex test module
+"""
+import time
+from threading import Thread
+from unittest import TestCase
+from ovs.extensions.generic.volatilemutex import VolatileMutex
+from ovs.extensions.generic.persistentmutex import PersistentMutex
+from ovs.extensions.storage.persistent.dummystore import DummyPersistentStore
+from ovs.extensions.storage.volatile.dummystore import DummyVolatileStore
+from ovs.extensions.storage.persistentfactory import PersistentFactory
+from ovs.extensions.storage.volatilefactory import VolatileFactory
+
+
+class Mutex(TestCase):
+    """
+    Validates the distributed mutexes against the dummy stores
+    """
+
+    def setUp(self):
+        """
+        (Re)Sets the stores on every test
+        """
+        PersistentFactory.store = DummyPersistentStore()
+        PersistentFactory.store.clean()
+        VolatileFactory.store = DummyVolatileStore()
+        VolatileFactory.store.clean()
+
+    def test_volatilemutex(self):
+        """
+        Validates the volatile mutex
+        """
+        mutex = VolatileMutex('test')
+        mutex.acquire()
+        mutex.acquire()  # Should not raise errors
+        mutex.release()
+        mutex.release()  # Should not raise errors
+        self.assertFalse(mutex.contended, 'An uncontended mutex should not be marked as contended')
+        self.assertIsNone(mutex._volatile.get(mutex._fence_key()), 'Fencing tokens should only be generated when used')
+        with mutex:
+            with self.assertRaises(RuntimeError):
+                VolatileMutex('test').acquire(wait=0.1)
+        mutex.acquire()
+        self.assertFalse(mutex.contended, 'An uncontended mutex should not be marked as contended')
+        mutex.release()
+        other = VolatileMutex('test')
+        other._volatile.add(other.key(), 'someone else', 10)
+        with self.assertRaises(RuntimeError):
+            other.acquire(wait=0.1)
+        self.assertTrue(other.contended, 'A mutex held by someone else should be marked as contended')
+        other._volatile.delete(other.key())
+        VolatileMutex.flush_statistics()
+        self.assertIn('test', mutex._volatile.get('ovs_stats_lock_types'), 'The lock type should be registered')
+        waits = mutex._volatile.get_multi([key for _, key in VolatileMutex.histogram_keys('test', 'wait')])
+        self.assertGreater(sum(waits.values()), 0, 'The wait times should be recorded')
+
+    def test_volatilemutex_fencing(self):
+        """
+        Validates the fencing tokens of the volatile mutex
+        """
+        first = VolatileMutex('test')
+        second = VolatileMutex('test')
+        with first:
+            fence = first.fence
+            self.assertEqual(first.fence, fence, 'The fencing token should not change while the lock is held')
+        with second:
+            self.assertGreater(second.fence, fence, 'Every acquisition should get a higher fencing token')
+        self.assertLess(second._volatile._timeout[second._fence_key()], time.time() + VolatileMutex.fence_timeout + 1,
+                        'Fencing tokens should expire')
+        first.acquire()
+        first._volatile.set(first.key(), 'someone else', 10)  # The lock was taken over
+        self.assertIsNone(first.fence, 'No fencing token should be handed out for a lost lock')
+        first.release()
+
+    def test_volatilemutex_lease(self):
+        """
+        Validates the lease of the volatile mutex: renewing and only releasing owned locks
+        """
+        first = VolatileMutex('test')
+        second = VolatileMutex('test')
+        first.acquire()
+        self.assertTrue(first.renew(), 'An owned lock should be renewable')
+        first._volatile.set(first.key(), 'someone else', 10)
+        self.assertFalse(first.renew(), 'A lock owned by someone else should not be renewed')
+        first._volatile.delete(first.key())
+        first.acquire()
+        first._volatile.set(first.key(), 'someone else', 10)  # The lock was taken over while the lease was valid
+        first.release()
+        self.assertEqual(first._volatile.get(first.key()), 'someone else', 'A lock owned by someone else should not be released')
+        first._volatile.delete(first.key())
+        first = VolatileMutex('test', lease=0.1)
+        first.acquire()
+        time.sleep(0.2)
+        second.acquire(wait=0.1)  # The lease expired
+        first.release()
+        self.assertEqual(second._volatile.get(second.key()), second._owner, 'An expired lock taken by someone else should not be released')
+        second.release()
+        self.assertIsNone(second._volatile.get(second.key()), 'An owned lock should be released')
+
+    def test_persistentmutex(self):
+        """
+        Validates the persistent mutex
+        """
+        first = PersistentMutex('test', heartbeat=False)
+        second = PersistentMutex('test', heartbeat=False)
+        with first:
+            fence = first.fence
+            self.assertTrue(first.renew(), 'An owned lock should be renewable')
+            with self.assertRaises(RuntimeError):
+                second.acquire(wait=0.1)
+            self.assertTrue(second.contended, 'A mutex held by someone else should be marked as contended')
+            self.assertListEqual(PersistentFactory.store.get(first.key())['queue'], [], 'Waiters that gave up should leave the queue')
+        self.assertFalse(first.contended, 'An uncontended mutex should not be marked as contended')
+        self.assertFalse(PersistentFactory.store.exists(first.key()), 'Free locks without waiters should be removed')
+        with second:
+            self.assertGreater(second.fence, fence, 'Every acquisition should get a higher fencing token')
+        first = PersistentMutex('test', lease=0.1, heartbeat=False)
+        first.acquire()
+        time.sleep(0.2)
+        second.acquire(wait=0.1)  # The lease expired
+        self.assertFalse(first.renew(), 'A lock owned by someone else should not be renewed')
+        first.release()
+        self.assertEqual(PersistentFactory.store.get(second.key())['owner'], second._owner, 'A lock owned by someone else should not be released')
+        second.release()
+
+    def test_persistentmutex_queue(self):
+        """
+        Validates whether waiters on the persistent mutex get the lock in order of arrival
+        """
+        def _acquire(mutex):
+            with mutex:
+                order.append(mutex)
+
+        def _wait_for_waiters(count):
+            for _ in xrange(100):
+                if len(PersistentFactory.store.get(holder.key())['queue']) == count:
+                    return
+                time.sleep(0.01)
+            self.fail('The waiters should be queued')
+
+        order = []
+        holder = PersistentMutex('test', heartbeat=False)
+        waiters = [PersistentMutex('test', heartbeat=False) for _ in xrange(2)]
+        threads = [Thread(target=_acquire, args=(waiter,)) for waiter in waiters]
+        backoff_max = PersistentMutex.backoff_max
+        PersistentMutex.backoff_max = 0.05
+        try:
+            holder.acquire()
+            for index, thread in enumerate(threads):
+                thread.start()
+                _wait_for_waiters(index + 1)
+            holder.release()
+            for thread in threads:
+                thread.join(5)
+        finally:
+            PersistentMutex.backoff_max = backoff_max
+        self.assertListEqual(order, waiters, 'The waiters should get the lock in order of arrival')
+        self.assertFalse(PersistentFactory.store.exists(holder.key()), 'Free locks without waiters should be removed')
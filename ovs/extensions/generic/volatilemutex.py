@@ -16,7 +16,12 @@
 Volatile mutex module
 """
 
+import os
 import time
+import uuid
+import random
+import socket
+from threading import Lock
 
 from ovs.extensions.storage.volatilefactory import VolatileFactory
 from ovs.log.logHandler import LogHandler
@@ -29,9 +34,26 @@ class VolatileMutex(object):
     This is a volatile, distributed mutex to provide cross thread, cross process and cross node
     locking. However, this mutex is volatile and thus can fail. You want to make sure you don't
     lock for longer than a few hundred milliseconds to prevent this.
+    * Waiters poll with an exponential, jittered backoff
+    * The lock is leased for `lease` seconds, long holders can renew the lease
+    * Every acquisition can get a fencing token (`fence`), increasing for every acquisition of the same lock.
+      The token is only generated when it's used
+    * A lock is only released by its owner
+    * Wait and hold times are recorded in histograms per lock type (the first part of the lock name)
     """
 
-    def __init__(self, name, wait=None):
+    lease = 60
+    fence_timeout = 86400
+    backoff_min = 0.001
+    backoff_max = 0.1
+    histogram_buckets = [0.001, 0.01, 0.1, 1, 10]
+    flush_interval = 10
+
+    _histograms = {}
+    _histograms_lock = Lock()
+    _last_flush = time.time()
+
+    def __init__(self, name, wait=None, lease=None):
         """
         Creates a volatile mutex object
         """
@@ -40,6 +62,11 @@ class VolatileMutex(object):
         self._has_lock = False
         self._start = 0
         self._wait = wait
+        self._lease = VolatileMutex.lease if lease is None else lease
+        self._lease_start = 0
+        self._owner = None
+        self._fence = None
+        self.contended = False
 
     def __call__(self, wait):
         self._wait = wait
@@ -62,28 +89,79 @@ class VolatileMutex(object):
         self._start = time.time()
         if wait is None:
             wait = self._wait
-        while not self._volatile.add(self.key(), 1, 60):
-            time.sleep(0.005)
+        self.contended = False
+        owner = '{0}_{1}_{2}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+        backoff = VolatileMutex.backoff_min
+        while not self._volatile.add(self.key(), owner, self._lease):
+            self.contended = True
+            passed = time.time() - self._start
+            delay = random.uniform(backoff / 2, backoff)
+            if wait is not None:
+                delay = min(delay, max(wait - passed, 0) + VolatileMutex.backoff_min)
+            time.sleep(delay)
+            backoff = min(backoff * 2, VolatileMutex.backoff_max)
             passed = time.time() - self._start
             if wait is not None and passed > wait:
+                VolatileMutex._record(self.name, 'wait', passed)
                 logger.error('Lock for {0} could not be aquired. {1} sec > {2} sec'.format(self.key(), passed, wait))
                 raise RuntimeError('Could not aquire lock %s' % self.key())
         passed = time.time() - self._start
         if passed > 0.1:  # More than 100 ms is a long time to wait!
             logger.warning('Waited {0} sec for lock {1}'.format(passed, self.key()))
+        VolatileMutex._record(self.name, 'wait', passed)
+        self._fence = None
+        self._owner = owner
         self._start = time.time()
+        self._lease_start = self._start
         self._has_lock = True
         return True
 
+    @property
+    def fence(self):
+        """
+        Fencing token of the last acquisition, generated when it's first used. Fencing tokens are
+        millisecond timestamps at first, so they keep increasing when the counter expired
+        """
+        if self._fence is None and self._has_lock:
+            fence = self._volatile.incr(self._fence_key(), 1, int(time.time() * 1000), VolatileMutex.fence_timeout)
+            if self._volatile.get(self.key()) != self._owner:
+                # Someone else took the expired lock, and might already have a lower token
+                logger.warning('The lock on {0} was lost before a fencing token was generated'.format(self.key()))
+                return None
+            self._fence = fence
+        return self._fence
+
+    def renew(self):
+        """
+        Renews the lease of the lock. Returns False if the lock is no longer owned
+        """
+        if not self._has_lock:
+            return False
+        owner = self._owner
+        lease_start = time.time()
+        renewed = self._volatile.update(self.key(), lambda value: value if value == owner else None, None, self._lease)
+        if renewed is None:
+            logger.warning('The lock on {0} was lost before it could be renewed'.format(self.key()))
+            self._has_lock = False
+            return False
+        self._lease_start = lease_start
+        return True
+
     def release(self):
         """
         Releases the lock
         """
         if self._has_lock:
-            self._volatile.delete(self.key())
+            # The lease might have expired, so the lock is only deleted if it's still ours. Storing it with
+            # a negative timeout expires it right away, making this an atomic compare-and-delete
+            owner = self._owner
+            released = self._volatile.update(self.key(), lambda value: value if value == owner else None, None, -1)
+            if released is None:
+                logger.warning('The lock on {0} expired while it was held'.format(self.key()))
             passed = time.time() - self._start
             if passed > 0.25:  # More than 250 ms is a long time to hold a lock
                 logger.warning('A lock on {0} was kept for {1} sec'.format(self.key(), passed))
+            VolatileMutex._record(self.name, 'hold', passed)
             self._has_lock = False
 
     def key(self):
@@ -92,6 +170,65 @@ class VolatileMutex(object):
         """
         return 'ovs_lock_%s' % self.name
 
+    def _fence_key(self):
+        """
+        Fencing token key
+        """
+        return 'ovs_lock_fence_%s' % self.name
+
+    @staticmethod
+    def histogram_keys(lock_type, kind):
+        """
+        Returns the bucket labels and statistics keys of a given histogram ('wait' or 'hold') of a lock type
+        """
+        labels = [str(bucket) for bucket in VolatileMutex.histogram_buckets] + ['inf']
+        return [(label, 'ovs_stats_lock_{0}_{1}_{2}'.format(lock_type, kind, label)) for label in labels]
+
+    @staticmethod
+    def _record(name, kind, duration):
+        """
+        Records a wait or hold time in the process-local histograms, which are periodically added to the
+        statistics in the volatile store
+        """
+        lock_type = name.split('_')[0]
+        bucket = len(VolatileMutex.histogram_buckets)
+        for index, upper_bound in enumerate(VolatileMutex.histogram_buckets):
+            if duration <= upper_bound:
+                bucket = index
+                break
+        with VolatileMutex._histograms_lock:
+            histogram = VolatileMutex._histograms.setdefault((lock_type, kind), [0] * (len(VolatileMutex.histogram_buckets) + 1))
+            histogram[bucket] += 1
+            if time.time() - VolatileMutex._last_flush < VolatileMutex.flush_interval:
+                return
+            histograms = VolatileMutex._histograms
+            VolatileMutex._histograms = {}
+            VolatileMutex._last_flush = time.time()
+        VolatileMutex.flush_statistics(histograms)
+
+    @staticmethod
+    def flush_statistics(histograms=None):
+        """
+        Adds the recorded histograms to the statistics in the volatile store
+        """
+        if histograms is None:
+            with VolatileMutex._histograms_lock:
+                histograms = VolatileMutex._histograms
+                VolatileMutex._histograms = {}
+                VolatileMutex._last_flush = time.time()
+        if len(histograms) == 0:
+            return
+        volatile = VolatileFactory.get_client()
+        try:
+            for (lock_type, kind), histogram in histograms.iteritems():
+                for (_, key), count in zip(VolatileMutex.histogram_keys(lock_type, kind), histogram):
+                    if count > 0:
+                        volatile.incr(key, count)
+            lock_types = set(lock_type for lock_type, _ in histograms)
+            volatile.update('ovs_stats_lock_types', lambda types: sorted(set(types) | lock_types), [])
+        except Exception as exception:
+            logger.warning('Could not store lock statistics: {0}'.format(exception))
+
     def __del__(self):
         """
         __del__ hook, releasing the lock
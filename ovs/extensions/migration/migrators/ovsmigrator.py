@@ -29,6 +29,9 @@ from ovs.dal.hybrids.backendtype import BackendType
 from ovs.dal.hybrids.servicetype import ServiceType
 from ovs.dal.hybrids.branding import Branding
 from ovs.dal.lists.backendtypelist import BackendTypeList
+from ovs.dal.datalist import DataList
+from ovs.extensions.storage.persistentfactory import PersistentFactory
+from ovs.extensions.storage.exceptions import KeyNotFoundException
 
 
 class OVSMigrator(object):
@@ -165,8 +168,18 @@ class OVSMigrator(object):
 
         # Version 0.0.2 introduced:
         if working_version < 2:
-            # Execute some code that upgrades to version 2
-            # working_version = 2
-            pass
+            # List cache invalidation no longer uses a persistent map per object type
+            persistent = PersistentFactory.get_client()
+            keys = persistent.iter_prefix('{0}_'.format(DataList.cachelink))
+            for chunk in DataList.chunks(keys, DataList.partsize_pks):
+                with persistent.batch() as batch:
+                    results = [batch.delete(key) for key in chunk]
+                for result in results:
+                    try:
+                        result.result()
+                    except KeyNotFoundException:
+                        pass  # Keys that are already gone only fail their own delete
+
+            working_version = 2
 
         return working_version
@@ -0,0 +1,145 @@
+# Copyright 2014 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Batch module
+"""
+
+
+class BatchResult(object):
+    """
+    The result of an operation in a batch, available once the batch is executed
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty result
+        """
+        self._done = False
+        self._value = None
+        self._exception = None
+
+    def set_result(self, value):
+        """
+        Sets the operation's result
+        """
+        self._done = True
+        self._value = value
+        self._exception = None
+
+    def set_exception(self, exception):
+        """
+        Sets the exception the operation failed with
+        """
+        self._done = True
+        self._value = None
+        self._exception = exception
+
+    def done(self):
+        """
+        Returns whether the batch holding the operation was executed
+        """
+        return self._done
+
+    def result(self):
+        """
+        Returns the operation's result, or raises the exception the operation failed with
+        """
+        if self._done is False:
+            raise RuntimeError('The batch was not executed yet')
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+
+class Batch(object):
+    """
+    Collects independent persistent store operations, to be executed together when the store's batch
+    context is left:
+    > with persistent.batch() as batch:
+    >     first = batch.get('first')
+    >     batch.set('second', 2)
+    > print first.result()
+    Each operation returns a BatchResult. Operations fail individually, like they would when executed
+    one by one, but they're not atomic: use a transaction for that.
+    """
+
+    def __init__(self, executor):
+        """
+        Initializes an empty batch, to be executed by a given store function
+        """
+        self._executor = executor
+        self._operations = []
+
+    def get(self, key):
+        """
+        Retrieves the value for a given key
+        """
+        return self._add('get', key)
+
+    def get_multi(self, keys):
+        """
+        Retrieves the values for a list of keys, as a dictionary containing only the keys that were found
+        """
+        return self._add('get_multi', list(keys))
+
+    def exists(self, key):
+        """
+        Checks if a key exists
+        """
+        return self._add('exists', key)
+
+    def prefix(self, prefix, max_elements=10000):
+        """
+        Lists all keys starting with the given prefix
+        """
+        return self._add('prefix', prefix, max_elements)
+
+    def set(self, key, value):
+        """
+        Sets the value for a key to a given value
+        """
+        return self._add('set', key, value)
+
+    def delete(self, key):
+        """
+        Deletes a given key
+        """
+        return self._add('delete', key)
+
+    def apply_transaction(self, transaction):
+        """
+        Applies a given transaction
+        """
+        return self._add('apply_transaction', transaction)
+
+    def execute(self):
+        """
+        Executes all collected operations
+        """
+        operations = self._operations
+        self._operations = []
+        if len(operations) > 0:
+            self._executor(operations)
+
+    def __len__(self):
+        return len(self._operations)
+
+    def _add(self, operation, *args):
+        """
+        Adds an operation to the batch
+        """
+        result = BatchResult()
+        self._operations.append((operation, args, result))
+        return result
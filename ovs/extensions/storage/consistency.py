@@ -0,0 +1,31 @@
+# Copyright 2014 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Consistency module
+"""
+
+
+class Consistency(object):
+    """
+    The Consistency class provides enum-alike properties for the read consistency hints of the persistent stores
+    * CONSISTENT: Reads are served by the master and always return the latest value
+    * BOUNDED: Reads can be served by any up-to-date enough node. They return all writes made through the same
+      store, and all other writes older than the store's staleness bound
+    * DIRTY: Reads can be served by any node, and can return outdated values
+    Stores that can't relax consistency treat every hint as CONSISTENT
+    """
+    CONSISTENT = 'CONSISTENT'
+    BOUNDED = 'BOUNDED'
+    DIRTY = 'DIRTY'
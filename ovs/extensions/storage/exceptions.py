@@ -22,3 +22,17 @@ class KeyNotFoundException(Exception):
     Raised when a given key could not be found in the persistent storage
     """
     pass
+
+
+class AssertException(Exception):
+    """
+    Raised when an assert fails while applying a transaction on the persistent storage
+    """
+    pass
+
+
+class UpdateConflictException(Exception):
+    """
+    Raised when an update of a key in the volatile storage keeps conflicting with concurrent updates
+    """
+    pass
@@ -16,110 +16,456 @@
 Arakoon store module
 """
 
-import json
 import time
-from threading import Lock
+from contextlib import contextmanager
+from threading import Lock, Semaphore, local
 
 from ovs.extensions.db.arakoon.ArakoonManagement import ArakoonManagementEx
-from ovs.extensions.db.arakoon.arakoon.ArakoonExceptions import ArakoonNotFound, ArakoonSockReadNoBytes
-from ovs.extensions.storage.exceptions import KeyNotFoundException
+from ovs.extensions.db.arakoon.arakoon.ArakoonExceptions import ArakoonNotFound, ArakoonSockReadNoBytes, ArakoonAssertionFailed, \
+    ArakoonSocketException, ArakoonInconsistentRead, ArakoonNotSupportedException, ArakoonUnknownNode, ArakoonNotConnected, \
+    ArakoonNoMaster
+from ovs.extensions.db.arakoon.arakoon.Arakoon import ArakoonNodeBreaker
+from ovs.extensions.db.arakoon.arakoon.ArakoonProtocol import Sequence, Consistent, NoGuarantee, ArakoonClientConfig
+from ovs.extensions.generic.system import System
+from ovs.extensions.storage.batch import Batch
+from ovs.extensions.storage.consistency import Consistency
+from ovs.extensions.storage.exceptions import KeyNotFoundException, AssertException
+from ovs.extensions.storage.serializers import Serializer, JSONCodec
 
 
-def locked():
+class ArakoonClientPool(object):
     """
-    Locking decorator.
+    A pool of Arakoon clients, each having its own connection to the cluster's master. Clients are checked out
+    for a single call, so concurrent callers don't queue behind a single connection
     """
-    def wrap(f):
+
+    def __init__(self, factory, max_size=16, max_idle=300):
+        """
+        Initializes the pool. At most `max_size` clients are in use at the same time, idle clients are
+        closed after `max_idle` seconds
+        """
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self._factory = factory
+        self._idle = []
+        self._in_use = 0
+        self._statistics = {'created': 0,
+                            'evicted': 0,
+                            'discarded': 0,
+                            'waits': 0}
+        self._lock = Lock()
+        self._available = Semaphore(max_size)
+
+    @contextmanager
+    def checkout(self):
         """
-        Returns a wrapped function
+        Yields a client from the pool, returning it to the pool afterwards. A client that raised
+        a connection error is discarded instead
         """
-        def new_function(self, *args, **kw):
-            """
-            Executes the decorated function in a locked context
-            """
+        if not self._available.acquire(False):
             with self._lock:
-                return f(self, *args, **kw)
-        return new_function
-    return wrap
+                self._statistics['waits'] += 1
+            self._available.acquire()
+        try:
+            client = self._get_client()
+        except:
+            self._available.release()
+            raise
+        try:
+            yield client
+        except ArakoonSocketException:
+            self._discard(client)
+            raise
+        except Exception:
+            self._checkin(client)
+            raise
+        else:
+            self._checkin(client)
+
+    def statistics(self):
+        """
+        Returns the pool's occupancy
+        """
+        with self._lock:
+            statistics = dict(self._statistics)
+            statistics.update({'max_size': self.max_size,
+                               'in_use': self._in_use,
+                               'idle': len(self._idle)})
+            return statistics
+
+    def _get_client(self):
+        """
+        Returns the most recently used idle client, or a new one when none is idle
+        """
+        with self._lock:
+            self._evict()
+            self._in_use += 1
+            if len(self._idle) > 0:
+                return self._idle.pop()[0]
+            self._statistics['created'] += 1
+        try:
+            return self._factory()
+        except:
+            with self._lock:
+                self._in_use -= 1
+            raise
+
+    def _checkin(self, client):
+        """
+        Returns a client to the pool
+        """
+        with self._lock:
+            self._in_use -= 1
+            self._idle.append((client, time.time()))
+        self._available.release()
+
+    def _discard(self, client):
+        """
+        Closes a client that is no longer usable
+        """
+        with self._lock:
+            self._in_use -= 1
+            self._statistics['discarded'] += 1
+        self._available.release()
+        client.dropConnections()
+
+    def _evict(self):
+        """
+        Closes clients that were idle for too long. Must be called while holding the lock
+        """
+        threshold = time.time() - self.max_idle
+        while len(self._idle) > 0 and self._idle[0][1] < threshold:
+            self._idle.pop(0)[0].dropConnections()
+            self._statistics['evicted'] += 1
 
 
 class ArakoonStore(object):
     """
     Arakoon client wrapper:
-    * Uses json serialisation
+    * Uses a pluggable serializer (json by default, reading values written by any codec). The compact binary
+      format is opt-in, through the ovs.core.storage.persistent.codec setting
     * Raises generic exception
+    * Supports transactions: values read in a transaction are asserted when it's applied
+    * Uses a pool of clients, so it can be used by multiple threads concurrently
+    * Reads accept a consistency hint. Relaxed reads are served by the local node when it's part of the cluster
+    * Calls use short connect/read timeouts, which can be changed for specific calls (see timeouts)
+    * Independent calls can be batched, sending them to Arakoon in a single round trip (see batch)
     """
 
-    def __init__(self, cluster):
+    bounded_staleness = 1  # Maximum age (in seconds) of the master state BOUNDED reads have to catch up with
+    connect_timeout = 2
+    read_timeout = 30
+
+    def __init__(self, cluster, serializer=None, connect_timeout=None, read_timeout=None):
         """
         Initializes the client
         """
+        self._serializer = Serializer(JSONCodec) if serializer is None else serializer
         self._cluster = ArakoonManagementEx().getCluster(cluster)
-        self._client = self._cluster.getClient()
-        self._lock = Lock()
+        self._pool = ArakoonClientPool(self._create_client)
+        self._bounded = (None, 0)
+        self._timeouts = (ArakoonStore.connect_timeout if connect_timeout is None else connect_timeout,
+                          ArakoonStore.read_timeout if read_timeout is None else read_timeout)
+        self._call_timeouts = local()
 
-    @locked()
-    def get(self, key):
+    def get(self, key, transaction=None, consistency=None):
         """
-        Retrieves a certain value for a given key
+        Retrieves a certain value for a given key. When a transaction is given, the transaction will
+        only be applied if the value is still unchanged (or the key still doesn't exist) by then, so
+        the value is always read consistently
         """
+        if transaction is not None:
+            consistency = None
         try:
-            return json.loads(ArakoonStore._try(self._client.get, key))
-        except ValueError:
-            raise KeyNotFoundException('Could not parse JSON stored for {0}'.format(key))
+            value = self._try_read(consistency, 'get', key)
         except ArakoonNotFound as field:
+            if transaction is not None:
+                transaction.addAssert(key, None)
             raise KeyNotFoundException(field)
+        if transaction is not None:
+            transaction.addAssert(key, value)
+        try:
+            return self._serializer.loads(value)
+        except ValueError:
+            raise KeyNotFoundException('Could not parse data stored for {0}'.format(key))
+
+    def get_multi(self, keys, consistency=None):
+        """
+        Retrieves the values for a list of keys in a single call. Returns a dictionary containing
+        only the keys that were found
+        """
+        values = {}
+        for key, value in zip(keys, self._try_read(consistency, 'multiGetOption', list(keys))):
+            if value is not None:
+                try:
+                    values[key] = self._serializer.loads(value)
+                except ValueError:
+                    pass
+        return values
 
-    @locked()
-    def set(self, key, value):
+    def set(self, key, value, transaction=None):
         """
         Sets the value for a key to a given value
         """
-        return ArakoonStore._try(self._client.set, key, json.dumps(value))
+        if transaction is not None:
+            return transaction.addSet(key, self._serializer.dumps(value))
+        return self._try_write('set', key, self._serializer.dumps(value))
 
-    @locked()
-    def prefix(self, prefix, max_elements=10000):
+    def set_multi(self, values):
+        """
+        Sets the values for a dictionary of keys in a single (atomic) call
+        """
+        sequence = Sequence()
+        for key, value in values.iteritems():
+            sequence.addSet(key, self._serializer.dumps(value))
+        return self._try_write('sequence', sequence)
+
+    def prefix(self, prefix, max_elements=10000, consistency=None):
         """
         Lists all keys starting with the given prefix
         """
-        return ArakoonStore._try(self._client.prefix, prefix, maxElements=max_elements)
+        return self._try_read(consistency, 'prefix', prefix, maxElements=max_elements)
+
+    def iter_prefix(self, prefix, page_size=1000, consistency=None):
+        """
+        Iterates all keys starting with the given prefix. The keys are fetched in pages of `page_size` keys
+        using range queries, each page continuing after the last key of the previous one
+        """
+        end_key = ArakoonStore._prefix_end(prefix)
+        begin_key = prefix
+        begin_included = True
+        while True:
+            keys = self._try_read(consistency, 'range', begin_key, begin_included, end_key, False, page_size)
+            for key in keys:
+                if not key.startswith(prefix):
+                    return
+                yield key
+            if len(keys) < page_size:
+                return
+            begin_key = keys[-1]
+            begin_included = False
+
+    @staticmethod
+    def _prefix_end(prefix):
+        """
+        Returns the first key after all keys starting with the given prefix, or None if there is no such key
+        """
+        prefix = prefix.rstrip('\xff')
+        if prefix == '':
+            return None
+        return prefix[:-1] + chr(ord(prefix[-1]) + 1)
 
-    @locked()
-    def delete(self, key):
+    def delete(self, key, transaction=None):
         """
-        Deletes a given key from the store
+        Deletes a given key from the store. In a transaction, deleting a non-existing key is ignored
         """
+        if transaction is not None:
+            transaction.addSet(key, '')  # A delete of a non-existing key would fail the complete sequence
+            return transaction.addDelete(key)
         try:
-            return ArakoonStore._try(self._client.delete, key)
+            return self._try_write('delete', key)
         except ArakoonNotFound as field:
             raise KeyNotFoundException(field)
 
-    @locked()
     def nop(self):
         """
         Executes a nop command
         """
-        return ArakoonStore._try(self._client.nop)
+        return self._try('nop')
 
-    @locked()
-    def exists(self, key):
+    def exists(self, key, consistency=None):
         """
         Check if key exists
         """
-        return ArakoonStore._try(self._client.exists, key)
+        return self._try_read(consistency, 'exists', key)
 
-    @staticmethod
-    def _try(method, *args, **kwargs):
+    def begin_transaction(self):
+        """
+        Starts a new transaction, to be passed to the calls that should be part of it
+        """
+        return Sequence()
+
+    def apply_transaction(self, transaction):
+        """
+        Applies all updates of a given transaction in a single (atomic) call
+        """
+        try:
+            return self._try_write('sequence', transaction)
+        except ArakoonAssertionFailed as assertion:
+            raise AssertException(assertion)
+
+    @contextmanager
+    def batch(self):
+        """
+        Collects the operations on the yielded batch, and sends them pipelined when the context is left
+        without exceptions, so they cost about a single round trip
+        """
+        batch = Batch(self._execute_batch)
+        yield batch
+        batch.execute()
+
+    @contextmanager
+    def timeouts(self, connect_timeout=None, read_timeout=None):
         """
-        Tries to call a given method, retry-ing if Arakoon is temporary unavailable
+        Overrules the connect and/or read timeout for the calls made by the current thread within the context:
+        > with store.timeouts(read_timeout=300):
+        >     store.apply_transaction(transaction)
+        """
+        previous = getattr(self._call_timeouts, 'timeouts', None)
+        current = self._timeouts if previous is None else previous
+        self._call_timeouts.timeouts = (current[0] if connect_timeout is None else connect_timeout,
+                                        current[1] if read_timeout is None else read_timeout)
+        try:
+            yield
+        finally:
+            self._call_timeouts.timeouts = previous
+
+    def pool_statistics(self):
+        """
+        Returns the occupancy of the client pool
+        """
+        return self._pool.statistics()
+
+    def _create_client(self):
+        """
+        Creates a new client, serving relaxed reads from the local node if it's part of the cluster
+        """
+        client = self._cluster.getClient()
+        try:
+            client.setDirtyReadNode(System.get_my_machine_id())
+        except ArakoonUnknownNode:
+            pass
+        return client
+
+    def _get_consistency(self, consistency):
+        """
+        Translates a given consistency hint into an Arakoon consistency, or None if the master should be used
+        """
+        if consistency is None or consistency == Consistency.CONSISTENT:
+            return None
+        if consistency == Consistency.DIRTY:
+            return NoGuarantee()
+        if consistency == Consistency.BOUNDED:
+            bounded, expiry = self._bounded
+            if expiry < time.time():
+                try:
+                    bounded = self._try('get_txid')
+                except ArakoonNotSupportedException:
+                    bounded = Consistent()
+                self._bounded = (bounded, time.time() + ArakoonStore.bounded_staleness)
+            return bounded if bounded.isDirty() else None
+        raise ValueError('Unknown consistency: {0}'.format(consistency))
+
+    def _try_read(self, consistency, method, *args, **kwargs):
+        """
+        Calls a given reading client method with a given consistency hint. When the node serving relaxed
+        reads is unreachable or lagging too far behind, the read falls back to the master
+        """
+        consistency = self._get_consistency(consistency)
+        if consistency is None:
+            return self._try(method, *args, **kwargs)
+        try:
+            with self._checkout() as client:
+                if ArakoonNodeBreaker.isOpen(client._config.getClusterId(), client.getDirtyReadNode()):
+                    raise ArakoonNotConnected(client._config.getNodeLocations(client.getDirtyReadNode()))
+                client.setConsistency(consistency)
+                try:
+                    return getattr(client, method)(*args, **kwargs)
+                finally:
+                    client.setConsistency(Consistent())
+        except (ArakoonSocketException, ArakoonInconsistentRead, ArakoonNotConnected, ArakoonNoMaster):
+            return self._try(method, *args, **kwargs)
+
+    def _try_write(self, method, *args, **kwargs):
+        """
+        Calls a given writing client method. BOUNDED reads made afterwards will include the write
+        """
+        try:
+            return self._try(method, *args, **kwargs)
+        finally:
+            self._bounded = (None, 0)
+
+    def _try(self, method, *args, **kwargs):
+        """
+        Tries to call a given client method, retry-ing if Arakoon is temporary unavailable
         """
         last_exception = None
-        tries = 5
-        while tries > 0:
+        for attempt in xrange(5):
+            if attempt > 0:
+                time.sleep(ArakoonClientConfig.getRetryBackoff(attempt - 1))
             try:
-                return method(*args, **kwargs)
+                with self._checkout() as client:
+                    return getattr(client, method)(*args, **kwargs)
             except ArakoonSockReadNoBytes as exception:
                 last_exception = exception
-                tries -= 1
-                time.sleep(1)
         raise last_exception
+
+    def _execute_batch(self, operations):
+        """
+        Executes a given list of batch operations in a single pipeline
+        """
+        requests = []
+        try:
+            with self._checkout() as client:
+                pipeline = client.makePipeline()
+                for operation, args, result in operations:
+                    if operation == 'get':
+                        future = pipeline.get(args[0])
+                    elif operation == 'get_multi':
+                        future = pipeline.multiGetOption(args[0])
+                    elif operation == 'exists':
+                        future = pipeline.exists(args[0])
+                    elif operation == 'prefix':
+                        future = pipeline.prefix(args[0], args[1])
+                    elif operation == 'set':
+                        future = pipeline.set(args[0], self._serializer.dumps(args[1]))
+                    elif operation == 'delete':
+                        future = pipeline.delete(args[0])
+                    elif operation == 'apply_transaction':
+                        future = pipeline.sequence(args[0])
+                    else:
+                        raise NotImplementedError('Batch operation {0} is not implemented'.format(operation))
+                    requests.append((operation, args, future, result))
+                pipeline.execute()
+        finally:
+            self._bounded = (None, 0)
+        for operation, args, future, result in requests:
+            try:
+                value = future.result()
+            except ArakoonNotFound as field:
+                result.set_exception(KeyNotFoundException(field))
+                continue
+            except ArakoonAssertionFailed as assertion:
+                result.set_exception(AssertException(assertion))
+                continue
+            except Exception as exception:
+                result.set_exception(exception)
+                continue
+            if operation == 'get':
+                try:
+                    value = self._serializer.loads(value)
+                except ValueError:
+                    result.set_exception(KeyNotFoundException('Could not parse data stored for {0}'.format(args[0])))
+                    continue
+            elif operation == 'get_multi':
+                values = {}
+                for key, item in zip(args[0], value):
+                    if item is not None:
+                        try:
+                            values[key] = self._serializer.loads(item)
+                        except ValueError:
+                            pass
+                value = values
+            result.set_result(value)
+
+    @contextmanager
+    def _checkout(self):
+        """
+        Checks out a client from the pool, configured with the timeouts for the current call
+        """
+        timeouts = getattr(self._call_timeouts, 'timeouts', None)
+        if timeouts is None:
+            timeouts = self._timeouts
+        with self._pool.checkout() as client:
+            client.setTimeouts(*timeouts)
+            yield client
@@ -17,100 +17,187 @@ Dummy persistent module
 """
 
 import json
-from ovs.extensions.storage.exceptions import KeyNotFoundException
+from contextlib import contextmanager
+from threading import RLock
+from ovs.extensions.storage.batch import Batch
+from ovs.extensions.storage.exceptions import KeyNotFoundException, AssertException
 
 
 class DummyPersistentStore(object):
     """
-    This is a dummy persistent store that makes use of a local json file
+    This is a dummy persistent store that keeps its data in (process-local) memory. Values are stored
+    json-encoded, so they behave like values read from a real store (e.g. changing a loaded value doesn't
+    change the stored value). The data can explicitly be saved to and loaded from a json file.
     """
     _path = '/tmp/dummypersistent.json'
+    _data = {}
+    _lock = RLock()
 
     @staticmethod
     def clean():
         """
         Empties the store
         """
-        import os
+        with DummyPersistentStore._lock:
+            DummyPersistentStore._data.clear()
 
-        try:
-            os.remove(DummyPersistentStore._path)
-        except OSError:
-            pass
+    @staticmethod
+    def snapshot(path=None):
+        """
+        Saves the store's data to a json file
+        """
+        with DummyPersistentStore._lock:
+            data = dict((key, json.loads(value)) for key, value in DummyPersistentStore._data.iteritems())
+        with open(DummyPersistentStore._path if path is None else path, 'w') as snapshot:
+            snapshot.write(json.dumps(data, sort_keys=True, indent=2))
 
-    def _read(self):
+    @staticmethod
+    def restore(path=None):
         """
-        Reads the local json file
+        Replaces the store's data by the data saved in a json file
         """
-        try:
-            f = open(self._path, 'r')
-            data = json.loads(f.read())
-            f.close()
-        except IOError:
-            data = {}
-        return data
+        with open(DummyPersistentStore._path if path is None else path, 'r') as snapshot:
+            data = json.loads(snapshot.read())
+        with DummyPersistentStore._lock:
+            DummyPersistentStore._data.clear()
+            DummyPersistentStore._data.update((key, json.dumps(value)) for key, value in data.iteritems())
 
-    def get(self, key):
+    def get(self, key, transaction=None, consistency=None):
         """
-        Retrieves a certain value for a given key
+        Retrieves a certain value for a given key. When a transaction is given, the transaction will
+        only be applied if the value is still unchanged (or the key still doesn't exist) by then.
+        Reads are always consistent, so the consistency hint is ignored
         """
-        data = self._read()
-        if key in data:
-            return self._read()[key]
-        else:
+        _ = consistency
+        value = self._data.get(key)
+        if transaction is not None:
+            transaction.append(('assert', key, value, value is not None))
+        if value is None:
             raise KeyNotFoundException(key)
+        return json.loads(value)
+
+    def get_multi(self, keys, consistency=None):
+        """
+        Retrieves the values for a list of keys. Returns a dictionary containing only the keys that were found
+        """
+        _ = consistency
+        values = {}
+        for key in keys:
+            value = self._data.get(key)
+            if value is not None:
+                values[key] = json.loads(value)
+        return values
 
-    def prefix(self, key, max_elements=10000):
+    def prefix(self, key, max_elements=10000, consistency=None):
         """
         Lists all keys starting with the given prefix
         """
-        data = self._read()
-        entries = [k for k in data.keys() if k.startswith(key)]
+        _ = consistency
+        entries = [k for k in self._data.keys() if k.startswith(key)]
         if max_elements >= 0:
             return entries[:max_elements]
         else:
             return entries
 
-    def set(self, key, value):
+    def iter_prefix(self, key, page_size=1000, consistency=None):
+        """
+        Iterates all keys starting with the given prefix, in pages of `page_size` keys
+        """
+        _ = consistency
+        last_key = None
+        while True:
+            entries = sorted(k for k in self._data.keys() if k.startswith(key) and (last_key is None or k > last_key))
+            for entry in entries[:page_size]:
+                yield entry
+            if len(entries) <= page_size:
+                return
+            last_key = entries[page_size - 1]
+
+    def set(self, key, value, transaction=None):
         """
         Sets the value for a key to a given value
         """
-        data = self._read()
-        data[key] = value
-        self._save(data)
+        if transaction is not None:
+            return transaction.append(('set', key, json.dumps(value), None))
+        self._data[key] = json.dumps(value)
 
-    def delete(self, key):
+    def set_multi(self, values):
         """
-        Deletes a given key from the store
+        Sets the values for a dictionary of keys
         """
-        data = self._read()
-        if key in data:
-            del data[key]
-            self._save(data)
-        else:
-            raise KeyNotFoundException(key)
+        values = dict((key, json.dumps(value)) for key, value in values.iteritems())
+        with self._lock:
+            self._data.update(values)
+
+    def delete(self, key, transaction=None):
+        """
+        Deletes a given key from the store. In a transaction, deleting a non-existing key is ignored
+        """
+        if transaction is not None:
+            return transaction.append(('delete', key, None, None))
+        with self._lock:
+            if key in self._data:
+                del self._data[key]
+            else:
+                raise KeyNotFoundException(key)
 
-    def exists(self, key):
+    def exists(self, key, consistency=None):
         """
         Check if key exists
         """
-        try:
-            self.get(key)
-            return True
-        except KeyNotFoundException:
-            return False
+        _ = consistency
+        return key in self._data
 
-    def nop(self):
+    def begin_transaction(self):
         """
-        Executes a nop command
+        Starts a new transaction, to be passed to the calls that should be part of it
         """
         _ = self
-        pass
+        return []
+
+    def apply_transaction(self, transaction):
+        """
+        Applies all updates of a given transaction at once
+        """
+        with self._lock:
+            changes = {}
+            for action, key, value, exists in transaction:
+                current = changes[key] if key in changes else self._data.get(key)
+                if action == 'assert':
+                    if (current is not None) != exists or (exists and json.loads(current) != json.loads(value)):
+                        raise AssertException(key)
+                elif action == 'set':
+                    changes[key] = value
+                elif action == 'delete':
+                    changes[key] = None
+            for key, value in changes.iteritems():
+                if value is None:
+                    self._data.pop(key, None)
+                else:
+                    self._data[key] = value
+
+    @contextmanager
+    def batch(self):
+        """
+        Collects the operations on the yielded batch, and executes them when the context is left without exceptions
+        """
+        batch = Batch(self._execute_batch)
+        yield batch
+        batch.execute()
 
-    def _save(self, data):
+    def _execute_batch(self, operations):
         """
-        Saves the local json file
+        Executes a given list of batch operations one by one
         """
-        f = open(self._path, 'w+')
-        f.write(json.dumps(data, sort_keys=True, indent=2))
-        f.close()
+        for operation, args, result in operations:
+            try:
+                result.set_result(getattr(self, operation)(*args))
+            except Exception as exception:
+                result.set_exception(exception)
+
+    def nop(self):
+        """
+        Executes a nop command
+        """
+        _ = self
+        pass
@@ -15,6 +15,8 @@
 """
 Generic persistent factory.
 """
+from ConfigParser import NoSectionError, NoOptionError
+from ovs.extensions.storage.serializers import Serializer, JSONCodec
 from ovs.plugin.provider.configuration import Configuration
 from ovs.log.logHandler import LogHandler
 
@@ -40,7 +42,8 @@ class PersistentFactory(object):
             if client_type == 'arakoon':
                 from ovs.extensions.storage.persistent.arakoonstore import ArakoonStore
                 cluster = Configuration.get('ovs.core.db.arakoon.clusterid')
-                PersistentFactory.store = ArakoonStore(cluster)
+                codec = PersistentFactory._get_codec()
+                PersistentFactory.store = ArakoonStore(cluster, serializer=Serializer.by_name(codec, fallback=JSONCodec))
             if client_type == 'default':
                 from ovs.extensions.storage.persistent.dummystore import DummyPersistentStore
                 PersistentFactory.store = DummyPersistentStore()
@@ -48,3 +51,15 @@ class PersistentFactory(object):
         if PersistentFactory.store is None:
             raise RuntimeError('Invalid client_type specified')
         return PersistentFactory.store
+
+    @staticmethod
+    def _get_codec():
+        """
+        Returns the name of the codec values are written with. Nodes without this setting keep writing
+        JSON, which all versions can read
+        """
+        try:
+            codec = Configuration.get('ovs.core.storage.persistent.codec')
+        except (NoSectionError, NoOptionError):
+            codec = None
+        return 'json' if not codec else codec
@@ -0,0 +1,154 @@
+# Copyright 2014 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Serializers module
+"""
+import json
+import marshal
+import cPickle
+
+
+class JSONCodec(object):
+    """
+    Serializes values as JSON. JSON values are stored without header for backwards compatibility
+    """
+
+    header = None
+
+    @staticmethod
+    def dumps(value):
+        """
+        Serializes a given value
+        """
+        return json.dumps(value)
+
+    @staticmethod
+    def loads(data):
+        """
+        Deserializes given data
+        """
+        return json.loads(data)
+
+
+class MarshalCodec(object):
+    """
+    Serializes values in Python's compact binary marshal format. Unlike JSON, tuples and non-string
+    dictionary keys are read back as they were written, and dict subclasses (e.g. OrderedDict) can't be
+    serialized, so it's best combined with a JSON fallback
+    """
+
+    header = '\x01'
+
+    @staticmethod
+    def dumps(value):
+        """
+        Serializes a given value
+        """
+        return marshal.dumps(value, 2)
+
+    @staticmethod
+    def loads(data):
+        """
+        Deserializes given data
+        """
+        try:
+            return marshal.loads(data)
+        except (EOFError, TypeError) as exception:
+            raise ValueError('Could not unmarshal data: {0}'.format(exception))
+
+
+class PickleCodec(object):
+    """
+    Serializes values using pickle, supporting (almost) any Python object
+    """
+
+    header = '\x02'
+
+    @staticmethod
+    def dumps(value):
+        """
+        Serializes a given value
+        """
+        return cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def loads(data):
+        """
+        Deserializes given data
+        """
+        try:
+            return cPickle.loads(data)
+        except Exception as exception:
+            raise ValueError('Could not unpickle data: {0}'.format(exception))
+
+
+class Serializer(object):
+    """
+    Serializes values with a given codec, prefixing them with the codec's header byte. Data is deserialized
+    by the codec matching its header, so values written with another codec (or old JSON values, which have
+    no header) remain readable
+    """
+
+    codecs = dict((codec.header, codec) for codec in [MarshalCodec, PickleCodec])
+    names = {'json': JSONCodec,
+             'marshal': MarshalCodec,
+             'pickle': PickleCodec}
+
+    def __init__(self, codec=MarshalCodec, fallback=None):
+        """
+        Initializes the serializer, writing values using the given codec. Values the codec can't
+        serialize are serialized with the fallback codec, if any
+        """
+        self.codec = codec
+        self.fallback = fallback
+
+    @staticmethod
+    def by_name(name, fallback=None):
+        """
+        Returns a serializer writing values with the codec of a given name (json, marshal or pickle), e.g. as
+        configured for a store
+        """
+        if name not in Serializer.names:
+            raise ValueError('Unknown codec: {0}'.format(name))
+        return Serializer(Serializer.names[name], fallback=fallback)
+
+    def dumps(self, value):
+        """
+        Serializes a given value
+        """
+        try:
+            return Serializer._dumps(self.codec, value)
+        except (ValueError, TypeError):
+            if self.fallback is None:
+                raise
+            return Serializer._dumps(self.fallback, value)
+
+    def loads(self, data):
+        """
+        Deserializes given data. Raises a ValueError if the data can't be deserialized
+        """
+        codec = Serializer.codecs.get(data[:1])
+        if codec is None:
+            return JSONCodec.loads(data)
+        return codec.loads(data[1:])
+
+    @staticmethod
+    def _dumps(codec, value):
+        """
+        Serializes a given value with a given codec, prefixing the codec's header
+        """
+        if codec.header is None:
+            return codec.dumps(value)
+        return codec.header + codec.dumps(value)
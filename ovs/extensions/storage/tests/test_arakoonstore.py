@@ -0,0 +1,89 @@
+# Copyright 2015 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import socket
+import struct
+import time
+from threading import local
+from unittest import TestCase
+from ovs.extensions.db.arakoon.arakoon.Arakoon import ArakoonClient, ArakoonMasterCache, ArakoonNodeBreaker
+from ovs.extensions.db.arakoon.arakoon.ArakoonProtocol import ArakoonClientConfig
+from ovs.extensions.db.arakoon.tests.test_arakoonClient import Connection
+from ovs.extensions.storage.consistency import Consistency
+from ovs.extensions.storage.persistent.arakoonstore import ArakoonStore, ArakoonClientPool
+from ovs.extensions.storage.serializers import Serializer
+
+
+class TestArakoonStore(TestCase):
+    """
+    Tests the ArakoonStore against a cluster of which only the master is reachable
+    """
+
+    def setUp(self):
+        ArakoonMasterCache._masters.clear()
+        ArakoonNodeBreaker._nodes.clear()
+        self._sockets = []
+
+    def tearDown(self):
+        for sock in self._sockets:
+            sock.close()
+        ArakoonMasterCache._masters.clear()
+        ArakoonNodeBreaker._nodes.clear()
+
+    def _build_store(self):
+        """
+        Builds a store whose dirty read node is unreachable, while the master answers every read with 'value'
+        """
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        def _send_to_master(msg):
+            _ = msg
+            reader, writer = socket.socketpair()
+            reader.settimeout(5)
+            self._sockets += [reader, writer]
+            value = json.dumps('value')
+            writer.sendall(struct.pack('II', 0, len(value)) + value)
+            return Connection(reader)
+
+        def _create_client():
+            client = ArakoonClient(ArakoonClientConfig('cluster', {'node_1': (['127.0.0.1'], port)}))
+            client.setDirtyReadNode('node_1')
+            client._sendToMaster = _send_to_master
+            return client
+
+        store = ArakoonStore.__new__(ArakoonStore)
+        store._serializer = Serializer()
+        store._pool = ArakoonClientPool(_create_client)
+        store._bounded = (None, 0)
+        store._timeouts = (1, 1)
+        store._call_timeouts = local()
+        return store
+
+    def test_unreachabledirtynode(self):
+        """
+        Validates that relaxed reads fall back to the master right away when the dirty read node is unreachable
+        """
+        store = self._build_store()
+        for _ in xrange(ArakoonNodeBreaker.failureThreshold):
+            start = time.time()
+            self.assertEqual(store.get('key', consistency=Consistency.DIRTY), 'value', 'The read should be served by the master')
+            self.assertLess(time.time() - start, 1, 'The read should not wait for the unreachable node')
+        self.assertTrue(ArakoonNodeBreaker.isOpen('cluster', 'node_1'), 'The breaker of the unreachable node should be open')
+        start = time.time()
+        self.assertEqual(store.get('key', consistency=Consistency.DIRTY), 'value', 'The read should be served by the master')
+        self.assertLess(time.time() - start, 0.1, 'An open breaker should skip the dirty read node')
@@ -0,0 +1,87 @@
+# Copyright 2014 CloudFounders NV
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Serializer test module
+"""
+import json
+from collections import OrderedDict
+from unittest import TestCase
+from ovs.extensions.storage.serializers import Serializer, JSONCodec, MarshalCodec, PickleCodec
+
+
+class Serializers(TestCase):
+    """
+    Validates the serializers used by the stores
+    """
+
+    value = {'_version': 12,
+             'name': 'vdisk_0001',
+             'size': 53687091200.0,
+             'info': dict(('metadata_{0}'.format(i), {'ip': '10.100.1.{0}'.format(i), 'port': 26200 + i, 'enabled': i % 2 == 0})
+                          for i in xrange(100)),
+             'snapshots': [{'guid': '5e7a5bd5-0e0e-4cf3-8d5d-{0:012d}'.format(i), 'timestamp': 1420070400 + i, 'in_backend': True}
+                           for i in xrange(100)],
+             'vmachine': {'type': 'VMachine', 'guid': None}}
+
+    def test_roundtrip(self):
+        """
+        Validates whether all codecs can read back what they wrote
+        """
+        for codec in [JSONCodec, MarshalCodec, PickleCodec]:
+            serializer = Serializer(codec)
+            self.assertDictEqual(serializer.loads(serializer.dumps(Serializers.value)), Serializers.value,
+                                 'Data should survive a roundtrip with {0}'.format(codec.__name__))
+
+    def test_compatibility(self):
+        """
+        Validates whether existing JSON values and values written with other codecs can be read
+        """
+        serializer = Serializer()
+        self.assertDictEqual(serializer.loads(json.dumps(Serializers.value)), Serializers.value, 'JSON values should be readable')
+        self.assertDictEqual(serializer.loads(Serializer(PickleCodec).dumps(Serializers.value)), Serializers.value,
+                             'Values written with another codec should be readable')
+        self.assertEqual(serializer.dumps(1)[0], MarshalCodec.header, 'The codec should be identified by its header')
+        with self.assertRaises(ValueError):
+            serializer.loads(MarshalCodec.header)
+        with self.assertRaises(ValueError):
+            serializer.loads('invalid')
+
+    def test_fallback(self):
+        """
+        Validates whether values the codec can't handle are serialized by the fallback codec
+        """
+        value = {'object': Serializers}
+        with self.assertRaises(ValueError):
+            Serializer().dumps(value)
+        serializer = Serializer(fallback=PickleCodec)
+        data = serializer.dumps(value)
+        self.assertEqual(data[0], PickleCodec.header, 'The fallback codec should be used')
+        self.assertDictEqual(serializer.loads(data), value, 'Fallback values should be readable')
+        value = OrderedDict([('b', 1), ('a', 2)])
+        serializer = Serializer(MarshalCodec, fallback=JSONCodec)
+        data = serializer.dumps(value)
+        self.assertEqual(data, json.dumps(value), 'Values marshal can\'t handle should be stored as JSON')
+        self.assertDictEqual(serializer.loads(data), value, 'Fallback values should be readable')
+
+    def test_byname(self):
+        """
+        Validates whether serializers can be selected by the name of their codec, as configured per store
+        """
+        self.assertEqual(Serializer.by_name('json').dumps(1), '1', 'JSON values should be stored without header')
+        serializer = Serializer.by_name('marshal', fallback=JSONCodec)
+        self.assertEqual(serializer.dumps(1)[0], MarshalCodec.header, 'The named codec should be used')
+        self.assertIs(serializer.fallback, JSONCodec, 'The fallback codec should be used')
+        with self.assertRaises(ValueError):
+            Serializer.by_name('xml')
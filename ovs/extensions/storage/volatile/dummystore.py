@@ -17,100 +17,163 @@ Dummy volatile module
 """
 import time
 import json
+from threading import RLock
 
 
 class DummyVolatileStore(object):
     """
-    This is a dummy volatile store that makes use of a local json file
+    This is a dummy volatile store that keeps its data in (process-local) memory. Values are stored
+    json-encoded, so they behave like values read from a real store. The data can explicitly be saved
+    to and loaded from a json file.
     """
     _path = '/tmp/dummyvolatile.json'
     _storage = {}
     _timeout = {}
+    _lock = RLock()
 
     @staticmethod
     def clean():
         """
         Empties the store
         """
-        import os
+        with DummyVolatileStore._lock:
+            DummyVolatileStore._storage.clear()
+            DummyVolatileStore._timeout.clear()
 
-        try:
-            os.remove(DummyVolatileStore._path)
-        except OSError:
-            pass
+    @staticmethod
+    def snapshot(path=None):
+        """
+        Saves the store's data to a json file
+        """
+        with DummyVolatileStore._lock:
+            data = {'t': dict(DummyVolatileStore._timeout),
+                    's': dict((key, json.loads(value)) for key, value in DummyVolatileStore._storage.iteritems())}
+        with open(DummyVolatileStore._path if path is None else path, 'w') as snapshot:
+            snapshot.write(json.dumps(data, sort_keys=True, indent=2))
 
-    def _read(self):
+    @staticmethod
+    def restore(path=None):
         """
-        Reads the local json file
+        Replaces the store's data by the data saved in a json file
         """
-        try:
-            f = open(self._path, 'r')
-            data = json.loads(f.read())
-            f.close()
-        except IOError:
-            data = {'t': {}, 's': {}}
-        return data
+        with open(DummyVolatileStore._path if path is None else path, 'r') as snapshot:
+            data = json.loads(snapshot.read())
+        with DummyVolatileStore._lock:
+            DummyVolatileStore.clean()
+            DummyVolatileStore._timeout.update(data['t'])
+            DummyVolatileStore._storage.update((key, json.dumps(value)) for key, value in data['s'].iteritems())
 
     def get(self, key, default=None):
         """
         Retrieves a certain value for a given key
         """
-        data = self._read()
-        if key in data['t'] and data['t'][key] > time.time():
-            value = data['s'].get(key)
-            if 'ovs_primarykeys_' in key:
-                value[0] = set(value[0])
-            return value
-        return default
+        value = self._get(key, time.time())
+        return default if value is None else value
+
+    def get_multi(self, keys):
+        """
+        Retrieves the values for a list of keys. Returns a dictionary containing only the keys that were found
+        """
+        now = time.time()
+        values = {}
+        for key in keys:
+            value = self._get(key, now)
+            if value is not None:
+                values[key] = value
+        return values
 
     def set(self, key, value, timeout=99999999):
         """
         Sets the value for a key to a given value
         """
-        if 'ovs_primarykeys_' in key:
-            value[0] = list(value[0])
-        data = self._read()
-        data['s'][key] = value
-        data['t'][key] = time.time() + timeout
-        self._save(data)
+        value = DummyVolatileStore._encode(key, value)
+        with self._lock:
+            self._storage[key] = value
+            self._timeout[key] = time.time() + timeout
+
+    def set_multi(self, values, timeout=99999999):
+        """
+        Sets the values for a dictionary of keys
+        """
+        values = dict((key, DummyVolatileStore._encode(key, value)) for key, value in values.iteritems())
+        with self._lock:
+            expiry = time.time() + timeout
+            for key, value in values.iteritems():
+                self._storage[key] = value
+                self._timeout[key] = expiry
 
     def add(self, key, value, timeout=99999999):
         """
         Adds a given key to the store, expecting the key does not exists yet
         """
-        data = self._read()
-        if key not in data['s']:
-            self.set(key, value, timeout)
-            return True
-        else:
-            return False
+        with self._lock:
+            if self._get(key, time.time()) is None:
+                self.set(key, value, timeout)
+                return True
+            else:
+                return False
 
     def delete(self, key):
         """
         Deletes a given key from the store
         """
-        data = self._read()
-        if key in data['s']:
-            del data['s'][key]
-            del data['t'][key]
-            self._save(data)
+        with self._lock:
+            self._storage.pop(key, None)
+            self._timeout.pop(key, None)
 
-    def incr(self, key, delta=1):
+    def delete_multi(self, keys):
         """
-        Increments the value of the key, expecting it exists
+        Deletes a list of keys from the store
         """
-        data = self._read()
-        if key in data['s']:
-            data['s'][key] += delta
-            self._save(data)
-            return True
-        return False
+        with self._lock:
+            for key in keys:
+                self._storage.pop(key, None)
+                self._timeout.pop(key, None)
 
-    def _save(self, data):
+    def incr(self, key, delta=1, initial=None, timeout=99999999):
+        """
+        Increments the value of the key, creating it (with the `initial` value, defaulting to the delta,
+        expiring after `timeout` seconds) when it doesn't exist yet. Returns the new value
+        """
+        with self._lock:
+            value = self._get(key, time.time())
+            if value is not None:
+                value += delta
+                self._storage[key] = json.dumps(value)
+            else:
+                value = delta if initial is None else initial
+                self.set(key, value, timeout)
+            return value
+
+    def update(self, key, function, default=None, timeout=99999999, retries=20):
+        """
+        Updates the value of a key using a given function, returning the stored value
         """
-        Saves the local json file
+        _ = retries
+        with self._lock:
+            value = self.get(key)
+            new_value = function(default if value is None else value)
+            if new_value is not None:
+                self.set(key, new_value, timeout)
+            return new_value
+
+    def _get(self, key, now):
+        """
+        Returns the decoded value for a given key, or None if it doesn't exist or expired
         """
-        rawdata = json.dumps(data, sort_keys=True, indent=2)
-        f = open(self._path, 'w+')
-        f.write(rawdata)
-        f.close()
+        value = self._storage.get(key)
+        if value is None or self._timeout.get(key, 0) <= now:
+            return None
+        value = json.loads(value)
+        if 'ovs_primarykeys_' in key:
+            value[0] = set(value[0])
+        return value
+
+    @staticmethod
+    def _encode(key, value):
+        """
+        Encodes a given value for a given key
+        """
+        if 'ovs_primarykeys_' in key:
+            value = [list(value[0])] + list(value[1:])
+        return json.dumps(value)
@@ -18,15 +18,17 @@ Memcache store module
 import memcache
 import re
 
-from threading import Lock
+from threading import local
+from ovs.extensions.storage.exceptions import UpdateConflictException
+from ovs.extensions.storage.serializers import Serializer, PickleCodec
 from ovs.log.logHandler import LogHandler
 
 logger = LogHandler('extensions', 'memcache store')
 
 
-def locked():
+def shared_state():
     """
-    Locking decorator.
+    Dead server synchronization decorator.
     """
     def wrap(f):
         """
@@ -34,16 +36,14 @@ def locked():
         """
         def new_function(self, *args, **kwargs):
             """
-            Executes the decorated function in a locked context
+            Executes the decorated function, sharing the dead server state of the thread's client
+            with the other threads
             """
-            lock = kwargs.get('lock', True)
-            if 'lock' in kwargs:
-                del kwargs['lock']
-            if lock:
-                with self._lock:
-                    return f(self, *args, **kwargs)
-            else:
+            self._sync_dead_servers()
+            try:
                 return f(self, *args, **kwargs)
+            finally:
+                self._sync_dead_servers()
         return new_function
     return wrap
 
@@ -52,17 +52,40 @@ class MemcacheStore(object):
     """
     Memcache client wrapper:
     * stringifies the keys
+    * serializes the values using a pluggable serializer (compact binary by default, falling back to pickle)
+    * uses a client per thread, sharing the state of dead servers
     """
 
-    def __init__(self, nodes):
+    def __init__(self, nodes, serializer=None):
         """
         Initializes the client
         """
+        self._serializer = Serializer(fallback=PickleCodec) if serializer is None else serializer
         self._nodes = nodes
-        self._client = memcache.Client(self._nodes, cache_cas=True)
-        self._lock = Lock()
+        self._local = local()
+        self._dead_servers = {}
         self._validate = True
 
+    @property
+    def _client(self):
+        """
+        Returns the memcache client of the calling thread
+        """
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = memcache.Client(self._nodes, cache_cas=True)
+            self._local.client = client
+        return client
+
+    def _sync_dead_servers(self):
+        """
+        Shares the servers marked as dead between the clients of all threads
+        """
+        for server in self._client.servers:
+            dead_until = max(server.deaduntil, self._dead_servers.get(server.address, 0))
+            self._dead_servers[server.address] = dead_until
+            server.deaduntil = dead_until
+
     def _get(self, action, key, default=None):
         """
         Retrieves a certain value for a given key (get or gets)
@@ -72,9 +95,13 @@ class MemcacheStore(object):
             data = self._client.get(key)
         else:
             data = self._client.gets(key)
+        data = self._decode(data)
         if data is None:
             # Cache miss
             return default
+        if isinstance(data, (int, long)):
+            # Counters are stored natively
+            return data
         if self._validate:
             if data['key'] == key:
                 return data['value']
@@ -84,84 +111,164 @@ class MemcacheStore(object):
         else:
             return data
 
-    @locked()
+    @shared_state()
     def get(self, key, default=None):
         """
         Retrieves a certain value for a given key (get)
         """
         return self._get('get', key, default=default)
 
-    @locked()
+    @shared_state()
     def gets(self, key, default=None):
         """
         Retrieves a certain value for a given key (gets)
         """
         return self._get('gets', key, default=default)
 
+    @shared_state()
+    def get_multi(self, keys):
+        """
+        Retrieves the values for a list of keys in a single call. Returns a dictionary containing
+        only the keys that were found
+        """
+        clean_keys = dict((MemcacheStore._clean_key(key), key) for key in keys)
+        values = {}
+        for clean_key, data in self._client.get_multi(clean_keys.keys()).iteritems():
+            data = self._decode(data)
+            if data is None:
+                continue
+            if self._validate and not isinstance(data, (int, long)):
+                if data['key'] != clean_key:
+                    logger.exception('Invalid data received: Got key {0} instead of {1}'.format(data['key'], clean_key))
+                    raise RuntimeError('Invalid data received')
+                data = data['value']
+            values[clean_keys[clean_key]] = data
+        return values
+
     def _set(self, action, key, value, time=0):
         """
         Sets the value for a key to a given value
         """
         key = MemcacheStore._clean_key(key)
-        if self._validate:
-            data = {'value': value,
-                    'key': key}
-        else:
-            data = value
+        data = self._encode(key, value)
         if action == 'set':
             return self._client.set(key, data, time)
         return self._client.cas(key, data, time)
 
-    @locked()
+    @shared_state()
     def set(self, key, value, time=0):
         """
         Sets the value for a key to a given value (set)
         """
         return self._set('set', key, value, time=time)
 
-    @locked()
+    @shared_state()
+    def set_multi(self, values, time=0):
+        """
+        Sets the values for a dictionary of keys in a single call
+        """
+        data = {}
+        for key, value in values.iteritems():
+            key = MemcacheStore._clean_key(key)
+            data[key] = self._encode(key, value)
+        return self._client.set_multi(data, time)
+
+    @shared_state()
     def cas(self, key, value, time=0):
         """
         Sets the value for a key to a given value (cas)
         """
         return self._set('cas', key, value, time=time)
 
-    @locked()
+    @shared_state()
     def add(self, key, value, time=0):
         """
         Adds a given key to the store, expecting the key does not exists yet
         """
         key = MemcacheStore._clean_key(key)
-        if self._validate:
-            data = {'value': value,
-                    'key': key}
-        else:
-            data = value
-        return self._client.add(key, data, time)
+        return self._client.add(key, self._encode(key, value), time)
 
-    @locked()
-    def incr(self, key, delta=1):
+    @shared_state()
+    def incr(self, key, delta=1, initial=None, time=0):
         """
-        Increments the value of the key, expecting it exists
+        Atomically increments the value of the key, creating it (with the `initial` value, defaulting to
+        the delta, expiring after `time` seconds) when it doesn't exist yet. Returns the new value.
+        Counters are stored natively, so they can be incremented by memcache itself
         """
-        if self._validate:
-            value = self.get(key, lock=False)
+        key = MemcacheStore._clean_key(key)
+        initial = delta if initial is None else initial
+        try:
+            value = self._client.incr(key, delta)
             if value is not None:
-                value += delta
+                return value
+        except ValueError:
+            # The key contains a non-native value, e.g. a counter stored by an older version
+            self._client.set(key, initial, time)
+            return initial
+        if self._client.add(key, initial, time):
+            return initial
+        return self._client.incr(key, delta)
+
+    @shared_state()
+    def update(self, key, function, default=None, time=0, retries=20):
+        """
+        Atomically updates the value of a key. The function is called with the current value (or the default
+        if the key doesn't exist) and returns the new value, which is only stored if no other client changed
+        the key in the meantime. Otherwise, the function is called again with the new value.
+        Returns the stored value, or None if the function returned None (in which case nothing is stored)
+        """
+        clean_key = MemcacheStore._clean_key(key)
+        for _ in xrange(retries):
+            value = self._get('gets', key)
+            if value is None:
+                new_value = function(default)
+                if new_value is None:
+                    return None
+                if self._client.add(clean_key, self._encode(clean_key, new_value), time):
+                    return new_value
             else:
-                value = 1
-            self.set(key, value, 60, lock=False)
-            return True
-        else:
-            return self._client.incr(MemcacheStore._clean_key(key), delta)
+                new_value = function(value)
+                if new_value is None:
+                    return None
+                if self._client.cas(clean_key, self._encode(clean_key, new_value), time):
+                    return new_value
+        raise UpdateConflictException('Could not update {0} after {1} attempts'.format(key, retries))
 
-    @locked()
+    @shared_state()
     def delete(self, key):
         """
         Deletes a given key from the store
         """
         return self._client.delete(MemcacheStore._clean_key(key))
 
+    @shared_state()
+    def delete_multi(self, keys):
+        """
+        Deletes a list of keys from the store in a single call
+        """
+        return self._client.delete_multi([MemcacheStore._clean_key(key) for key in keys])
+
+    def _encode(self, key, value):
+        """
+        Wraps and serializes a value to be stored
+        """
+        if self._validate:
+            return self._serializer.dumps({'value': value,
+                                           'key': key})
+        return value
+
+    def _decode(self, data):
+        """
+        Deserializes stored data. Data stored by older versions is unpickled by the memcache client already
+        """
+        if self._validate and isinstance(data, str):
+            try:
+                return self._serializer.loads(data)
+            except ValueError:
+                logger.exception('Could not deserialize data')
+                return None
+        return data
+
     @staticmethod
     def _clean_key(key):
         return re.sub('[^\x21-\x7e\x80-\xff]', '', str(key))
@@ -16,7 +16,8 @@
 Generic volatile factory.
 """
 import os
-from ConfigParser import RawConfigParser
+from ConfigParser import RawConfigParser, NoSectionError, NoOptionError
+from ovs.extensions.storage.serializers import Serializer, PickleCodec
 from ovs.plugin.provider.configuration import Configuration
 
 
@@ -46,7 +47,8 @@ class VolatileFactory(object):
                 for node in nodes:
                     location = memcache_config.get(node, 'location')
                     memcache_servers.append(location)
-                VolatileFactory.store = MemcacheStore(memcache_servers)
+                codec = VolatileFactory._get_codec()
+                VolatileFactory.store = MemcacheStore(memcache_servers, serializer=Serializer.by_name(codec, fallback=PickleCodec))
             if client_type == 'default':
                 from ovs.extensions.storage.volatile.dummystore import DummyVolatileStore
                 VolatileFactory.store = DummyVolatileStore()
@@ -54,3 +56,14 @@ class VolatileFactory(object):
         if VolatileFactory.store is None:
             raise RuntimeError('Invalid client_type specified')
         return VolatileFactory.store
+
+    @staticmethod
+    def _get_codec():
+        """
+        Returns the name of the codec values are written with, defaulting to the compact binary format
+        """
+        try:
+            codec = Configuration.get('ovs.core.storage.volatile.codec')
+        except (NoSectionError, NoOptionError):
+            codec = None
+        return 'marshal' if not codec else codec
@@ -118,18 +118,17 @@ class MessageController(object):
         return messages, last_message_id
 
     @staticmethod
-    @synchronized()
     def fire(message_type, body):
         """
         Adds a new message to the messaging queue
         """
-        last_message_id = max([m['id'] for m in _cache.get('msg_messages', [])] + [0])
-        message = {'id'  : last_message_id + 1,
-                   'type': message_type,
-                   'body': body}
-        messages = _cache.get('msg_messages', [])
-        messages.append(message)
-        _cache.set('msg_messages', messages, MessageController.TIMEOUT)
+        def _append(messages):
+            last_message_id = max([m['id'] for m in messages] + [0])
+            return messages + [{'id'  : last_message_id + 1,
+                                'type': message_type,
+                                'body': body}]
+
+        _cache.update('msg_messages', _append, [], MessageController.TIMEOUT)
 
     @staticmethod
     def last_message_id():
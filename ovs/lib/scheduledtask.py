@@ -240,6 +240,6 @@ class ScheduledTaskController(object):
         """
         days = int(Configuration.get('ovs.core.audittrails.keep'))
         mark = time.time() - days * 24 * 60 * 60
-        for log in LogList.get_logs():
+        for log in LogList.iter_logs():
             if log.time < mark:
                 log.delete()
@@ -38,7 +38,7 @@ from ovs.log.logHandler import LogHandler
 from ovs.lib.mdsservice import MDSServiceController
 from ovs.extensions.generic.sshclient import SSHClient
 from ovs.extensions.generic.system import System
-from ovs.extensions.generic.volatilemutex import VolatileMutex
+from ovs.extensions.generic.persistentmutex import PersistentMutex
 from ovs.extensions.openstack.oscinder import OpenStackCinder
 from volumedriver.storagerouter.storagerouterclient import MDSMetaDataBackendConfig, MDSNodeConfig
 
@@ -79,7 +79,7 @@ class VDiskController(object):
         _ = storagedriver_id  # For logging purposes
         disk = VDiskList.get_vdisk_by_volume_id(volumename)
         if disk is not None:
-            mutex = VolatileMutex('{}_{}'.format(volumename, disk.devicename))
+            mutex = PersistentMutex('{}_{}'.format(volumename, disk.devicename))
             try:
                 mutex.acquire(wait=20)
                 pmachine = None
@@ -123,7 +123,7 @@ class VDiskController(object):
         storagedriver = StorageDriverList.get_by_storagedriver_id(storagedriver_id)
         hypervisor = Factory.get(pmachine)
         volumepath = hypervisor.clean_backing_disk_filename(volumepath)
-        mutex = VolatileMutex('{}_{}'.format(volumename, volumepath))
+        mutex = PersistentMutex('{}_{}'.format(volumename, volumepath))
         try:
             mutex.acquire(wait=30)
             disk = VDiskList.get_vdisk_by_volume_id(volumename)
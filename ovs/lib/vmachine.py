@@ -31,7 +31,7 @@ from ovs.lib.vdisk import VDiskController
 from ovs.lib.messaging import MessageController
 from ovs.lib.mdsservice import MDSServiceController
 from ovs.log.logHandler import LogHandler
-from ovs.extensions.generic.volatilemutex import VolatileMutex
+from ovs.extensions.generic.persistentmutex import PersistentMutex
 
 logger = LogHandler('lib', name='vmachine')
 
@@ -511,7 +511,7 @@ class VMachineController(object):
             else:
                 vpool = None
             pmachine = PMachineList.get_by_storagedriver_id(storagedriver_id)
-            mutex = VolatileMutex('{}_{}'.format(name, vpool.guid if vpool is not None else 'none'))
+            mutex = PersistentMutex('{}_{}'.format(name, vpool.guid if vpool is not None else 'none'))
             try:
                 mutex.acquire(wait=5)
                 limit = 5
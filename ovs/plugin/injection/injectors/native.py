@@ -17,6 +17,7 @@ Native Injector module
 """
 import os
 from ConfigParser import RawConfigParser
+from threading import Lock
 from subprocess import check_output, CalledProcessError
 
 
@@ -35,19 +36,48 @@ class Injector(object):
     @staticmethod
     def inject_configuration(provider):
         """ Injects the Config module """
+        cache = {}
+        lock = Lock()
+
+        def _stat(filename):
+            try:
+                stat = os.stat(filename)
+                return stat.st_ino, stat.st_size, stat.st_mtime
+            except OSError:
+                return None
+
+        def _load(filename):
+            """
+            Returns the parsed configuration file, re-reading it only when it changed on disk
+            """
+            stat = _stat(filename)
+            entry = cache.get(filename)
+            if entry is None or entry[0] != stat:
+                config = RawConfigParser()
+                config.read(filename)
+                entry = (stat, config)
+                cache[filename] = entry
+            return entry[1]
+
         def _get(key):
             filename, section, item = key.split('.', 2)
-            config = RawConfigParser()
-            config.read('/opt/OpenvStorage/config/{0}.cfg'.format(filename))
+            config = _load('/opt/OpenvStorage/config/{0}.cfg'.format(filename))
             return config.get(section, item)
 
         def _set(key, value):
             filename, section, item = key.split('.', 2)
-            config = RawConfigParser()
-            config.read('/opt/OpenvStorage/config/{0}.cfg'.format(filename))
-            config.set(section, item, value)
-            with open('/opt/OpenvStorage/config/{0}.cfg'.format(filename), 'w') as config_file:
-                config.write(config_file)
+            filename = '/opt/OpenvStorage/config/{0}.cfg'.format(filename)
+            with lock:
+                config = RawConfigParser()
+                config.read(filename)
+                config.set(section, item, value)
+                temp_filename = '{0}.{1}.tmp'.format(filename, os.getpid())
+                with open(temp_filename, 'w') as config_file:
+                    config.write(config_file)
+                    config_file.flush()
+                    os.fsync(config_file.fileno())
+                os.rename(temp_filename, filename)
+                cache[filename] = (_stat(filename), config)
 
         def _get_int(key):
             return int(_get(key))
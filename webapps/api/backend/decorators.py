@@ -32,7 +32,7 @@ from ovs.dal.exceptions import ObjectNotFoundException
 from backend.serializers.serializers import FullSerializer
 from ovs.log.logHandler import LogHandler
 from ovs.extensions.storage.volatilefactory import VolatileFactory
-from ovs.extensions.generic.volatilemutex import VolatileMutex
+from ovs.extensions.storage.exceptions import UpdateConflictException
 from ovs.dal.hybrids.log import Log
 
 
@@ -317,26 +317,26 @@ def limit(amount, per, timeout):
                 request.META['HTTP_X_REAL_IP']
             )
             client = VolatileFactory.get_client()
-            mutex = VolatileMutex(key)
-            try:
-                mutex.acquire()
-                rate_info = client.get(key, {'calls': [],
-                                             'timeout': None})
+
+            def _register_call(rate_info):
                 active_timeout = rate_info['timeout']
                 if active_timeout is not None:
                     if active_timeout > now:
-                        raise Throttled(wait=active_timeout - now)
-                    else:
-                        rate_info['timeout'] = None
+                        return rate_info
+                    rate_info['timeout'] = None
                 rate_info['calls'] = [call for call in rate_info['calls'] if call > (now - per)] + [now]
-                calls = len(rate_info['calls'])
-                if calls > amount:
+                if len(rate_info['calls']) > amount:
                     rate_info['timeout'] = now + timeout
-                    client.set(key, rate_info)
-                    raise Throttled(wait=timeout)
-                client.set(key, rate_info)
-            finally:
-                mutex.release()
+                return rate_info
+
+            try:
+                rate_info = client.update(key, _register_call, {'calls': [],
+                                                                'timeout': None})
+            except UpdateConflictException:
+                # Too many concurrent calls to register them all: the caller is throttled
+                raise Throttled(wait=1)
+            if rate_info['timeout'] is not None:
+                raise Throttled(wait=rate_info['timeout'] - now)
             return f(self, request, *args, **kwargs)
 
         new_function.__name__ = f.__name__
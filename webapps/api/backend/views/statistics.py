@@ -24,6 +24,7 @@ from backend.decorators import required_roles, load, log
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from ovs.extensions.generic.volatilemutex import VolatileMutex
 from ovs.extensions.storage.volatilefactory import VolatileFactory
 from ovs.plugin.provider.configuration import Configuration
 
@@ -84,6 +85,18 @@ class MemcacheViewSet(viewsets.ViewSet):
             for hittype in ['hit', 'miss']:
                 cachekey = 'ovs_stats_cache_%s_%s' % (key, hittype)
                 stats['%s_%s' % (key, hittype)] = client.get(cachekey, default=0)
+        keys = ['reverseindex']
+        for key in keys:
+            for locktype in ['contended', 'uncontended']:
+                lockkey = 'ovs_stats_lock_%s_%s' % (key, locktype)
+                stats['lock_%s_%s' % (key, locktype)] = client.get(lockkey, default=0)
+        stats['lock_histograms'] = {}
+        for lock_type in client.get('ovs_stats_lock_types', default=[]):
+            stats['lock_histograms'][lock_type] = {}
+            for kind in ['wait', 'hold']:
+                buckets = VolatileMutex.histogram_keys(lock_type, kind)
+                counts = client.get_multi([key for _, key in buckets])
+                stats['lock_histograms'][lock_type][kind] = dict((label, counts.get(key, 0)) for label, key in buckets)
         return stats
 
     @log()
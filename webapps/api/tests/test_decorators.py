@@ -30,6 +30,7 @@ from ovs.extensions.storage.persistent.dummystore import DummyPersistentStore
 from ovs.extensions.storage.volatile.dummystore import DummyVolatileStore
 from ovs.extensions.storage.persistentfactory import PersistentFactory
 from ovs.extensions.storage.volatilefactory import VolatileFactory
+from ovs.extensions.storage.exceptions import UpdateConflictException
 from ovs.dal.hybrids.user import User
 from ovs.dal.hybrids.group import Group
 from ovs.dal.hybrids.role import Role
@@ -236,6 +237,20 @@ class Decorators(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.content, '6')
 
+        def _update(*args, **kwargs):
+            _ = args, kwargs
+            raise UpdateConflictException()
+
+        time.sleep(5)
+        VolatileFactory.store.update = _update  # A burst of concurrent calls keeps the update from succeeding
+        try:
+            with self.assertRaises(Throttled) as context:
+                the_function(7, request)
+        finally:
+            del VolatileFactory.store.update
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertEqual(output['value'], 6)
+
     def test_required_roles(self):
         """
         Validates whether the required_roles decorator works